@@ -19,7 +19,11 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.insert(0, parent_dir)
 
+from mechanisms.concurrency import max_concurrency
+from mechanisms.profiling import patterns_from_environment
+from mechanisms.scheduling import SHARD_MIN_PAGES
 from mechanisms.watermark_processor import WatermarkProcessor
+from mechanisms.worker_pool import WorkerPool
 from ui.dialog_windows import DialogWindows
 from ui.app_ui import AppUI
 from ui.app_styles import AppStyles
@@ -50,21 +54,36 @@ class WatermarkRemoverApp:
         
         # Initialize modules
         self.styles = AppStyles(root)
-        self.watermark_processor = WatermarkProcessor()
+        # One worker pool for the whole session, warmed up while the
+        # legal dialogs are displayed; sized for adaptive batches, fixed
+        # ones only use default_worker_count() lanes of it
+        self.worker_pool = WorkerPool(max_concurrency())
+        self.worker_pool.warm_up()
+        self.watermark_processor = WatermarkProcessor(
+            profile_patterns=patterns_from_environment(),
+            worker_pool=self.worker_pool,
+            shard_min_pages=SHARD_MIN_PAGES if (os.cpu_count() or 1) > 1 else 0,
+        )
         self.dialog_windows = DialogWindows(root)
         self.ui = AppUI(root, self.watermark_processor)
         
         # Set callbacks (Uniquement l'aide et le "À propos")
         self.ui.set_show_help_callback(self.dialog_windows.show_help)
         self.ui.set_show_about_callback(self.show_about)
+        self.ui.set_shutdown_callback(self.shutdown)
         
         # Create UI components
         self.ui.create_ui()
         
         # Check terms before proceeding
         if not self.dialog_windows.show_terms_and_conditions():
+            self.shutdown()
             sys.exit(0)
     
+    def shutdown(self) -> None:
+        """Release the session-wide worker pool."""
+        self.worker_pool.shutdown()
+
     def show_about(self):
         """Display the about dialog with version info."""
         self.dialog_windows.show_about()
\ No newline at end of file
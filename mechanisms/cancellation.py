@@ -0,0 +1,36 @@
+"""
+Cooperative Cancellation Module.
+
+Provides a small token object shared between the UI thread and the
+processing thread.  The engine polls the token between pages and
+between files, so a cancellation request stops work at the next safe
+point instead of killing the thread mid-write.
+"""
+
+import threading
+
+
+class ProcessingCancelled(Exception):
+    """Raised by the engine when a cancellation request is observed."""
+
+
+class CancellationToken:
+    """Thread-safe flag used to request cooperative cancellation."""
+
+    def __init__(self) -> None:
+        """Initialise a token in the non-cancelled state."""
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        """Request cancellation; safe to call from any thread."""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """True once :meth:`cancel` has been called."""
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        """Raise :class:`ProcessingCancelled` if cancellation was requested."""
+        if self._event.is_set():
+            raise ProcessingCancelled()
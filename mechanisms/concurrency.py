@@ -0,0 +1,311 @@
+"""
+Adaptive Concurrency Module.
+
+Optional controller that adjusts, while a batch runs, how many files are
+processed at the same time.  The batch starts as many lanes as the
+machine could use; every lane passes through an :class:`AdaptiveLimiter`
+before each file, and a controller thread samples the system once per
+interval:
+
+* free memory and the memory each running file costs (growth of the
+  engine's resident set since the batch started, divided by the files
+  in progress) — the limit drops as soon as memory runs short, and only
+  grows when one more file fits,
+* CPU utilisation — the limit grows while cores are idle and drops when
+  the machine is oversubscribed,
+* I/O wait — files waiting on a slow disk or share leave the CPU idle,
+  so more of them are run concurrently, up to :func:`max_concurrency`
+  (twice the number of cores).
+
+Every adjustment is logged with the measurements behind it (and ends up
+in the telemetry log when it is enabled), so limits can be tuned.
+Measurements come from ``/proc`` on Linux and from the Win32 API on
+Windows (no I/O wait there); signals a platform does not provide are
+simply not used.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+from mechanisms.isolation import process_rss
+
+logger = logging.getLogger("watermark_app.concurrency")
+
+SAMPLE_INTERVAL = 1.0
+MEMORY_RESERVE_MB = 512
+CPU_HIGH = 0.95
+CPU_LOW = 0.75
+IOWAIT_HIGH = 0.20
+# Files per core an adaptive batch may reach while files wait on I/O
+OVERSUBSCRIPTION = 2
+
+
+def max_concurrency() -> int:
+    """Default upper bound of the limit: lanes beyond the cores only
+    fill in while files wait on I/O, and CPU saturation takes them back."""
+    return OVERSUBSCRIPTION * (os.cpu_count() or 1)
+
+
+class SystemSample:
+    """One measurement of the machine's load."""
+
+    def __init__(
+        self,
+        cpu_busy: Optional[float],
+        iowait: Optional[float],
+        free_bytes: Optional[int],
+    ) -> None:
+        self.cpu_busy = cpu_busy
+        self.iowait = iowait
+        self.free_bytes = free_bytes
+
+
+class SystemMonitor:
+    """Samples CPU utilisation, I/O wait and free memory."""
+
+    def __init__(self) -> None:
+        """Take the first CPU reading; utilisation is measured between samples."""
+        self._last_times = self._cpu_times()
+
+    @staticmethod
+    def _cpu_times() -> Optional[tuple[float, float, float]]:
+        """``(total, idle, iowait)`` CPU time counters since boot."""
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            idle, kernel, user = wintypes.FILETIME(), wintypes.FILETIME(), wintypes.FILETIME()
+            if not ctypes.windll.kernel32.GetSystemTimes(
+                ctypes.byref(idle), ctypes.byref(kernel), ctypes.byref(user)
+            ):
+                return None
+
+            def ticks(value) -> float:
+                return float((value.dwHighDateTime << 32) | value.dwLowDateTime)
+
+            # Kernel time includes idle time
+            return ticks(kernel) + ticks(user), ticks(idle), 0.0
+        try:
+            with open("/proc/stat", encoding="ascii") as fh:
+                fields = [float(value) for value in fh.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        return sum(fields[:8]), fields[3], fields[4] if len(fields) > 4 else 0.0
+
+    @staticmethod
+    def _free_memory() -> Optional[int]:
+        """Memory available to new allocations, in bytes."""
+        if sys.platform == "win32":
+            import ctypes
+
+            class _MemoryStatus(ctypes.Structure):
+                _fields_ = [
+                    ("dwLength", ctypes.c_ulong),
+                    ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong),
+                    ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong),
+                    ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong),
+                    ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+                ]
+
+            status = _MemoryStatus()
+            status.dwLength = ctypes.sizeof(status)
+            if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return None
+            return status.ullAvailPhys
+        try:
+            with open("/proc/meminfo", encoding="ascii") as fh:
+                for line in fh:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def sample(self) -> SystemSample:
+        """Load since the previous sample, and free memory now."""
+        times = self._cpu_times()
+        cpu_busy = iowait = None
+        if times is not None and self._last_times is not None:
+            total = times[0] - self._last_times[0]
+            if total > 0:
+                idle = times[1] - self._last_times[1]
+                waiting = times[2] - self._last_times[2]
+                cpu_busy = max(0.0, min(1.0, 1.0 - (idle + waiting) / total))
+                iowait = waiting / total if sys.platform != "win32" else None
+        self._last_times = times
+        return SystemSample(cpu_busy, iowait, self._free_memory())
+
+
+class AdaptiveLimiter:
+    """Gate limiting how many files run at once, tuned by a controller thread.
+
+    Lanes call :meth:`slot` around each file.  Call :meth:`start` before
+    the batch and :meth:`stop` after it.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        initial: int,
+        memory_in_use: Optional[Callable[[], Optional[int]]] = None,
+        interval: float = SAMPLE_INTERVAL,
+        memory_reserve_mb: int = MEMORY_RESERVE_MB,
+    ) -> None:
+        """Prepare the gate.
+
+        Args:
+            max_workers: Upper bound of the limit (number of lanes).
+            initial: Limit when the batch starts.
+            memory_in_use: Resident memory of everything processing the
+                batch; the current process when omitted.
+            interval: Seconds between two samples.
+            memory_reserve_mb: Free memory left to the rest of the system.
+        """
+        self.max_workers = max(1, max_workers)
+        self.limit = max(1, min(initial, self.max_workers))
+        self.interval = interval
+        self.reserve = memory_reserve_mb * 1024 * 1024
+        self.adjustments: list[tuple[float, int, int, str]] = []
+        self._memory_in_use = memory_in_use or (lambda: process_rss(os.getpid()))
+        self._monitor = SystemMonitor()
+        self._baseline = self._memory_in_use()
+        self._active = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = time.monotonic()
+
+    # ── Gate ──────────────────────────────────────────────────────
+
+    def acquire(self) -> None:
+        """Wait for a free slot under the current limit."""
+        with self._condition:
+            self._waiting += 1
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._waiting -= 1
+            self._active += 1
+
+    def release(self) -> None:
+        """Give a slot back."""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def slot(self) -> "_Slot":
+        """Context manager holding one slot for the duration of a file."""
+        return _Slot(self)
+
+    # ── Controller ────────────────────────────────────────────────
+
+    def start(self) -> None:
+        """Start sampling the system in a background thread."""
+        self._thread = threading.Thread(
+            target=self._run, name="watermark-concurrency", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the controller thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self._adjust(self._monitor.sample())
+            except Exception as exc:  # never let sampling break a batch
+                logger.warning("Concurrency sampling failed: %s", exc)
+
+    def _adjust(self, sample: SystemSample) -> None:
+        with self._condition:
+            active, waiting, limit = self._active, self._waiting, self.limit
+
+        per_file = None
+        in_use = self._memory_in_use()
+        if in_use is not None and self._baseline is not None and active:
+            per_file = max(0, in_use - self._baseline) / active
+        headroom = None
+        if sample.free_bytes is not None:
+            headroom = sample.free_bytes - self.reserve
+
+        new_limit, reason = limit, ""
+        if headroom is not None and headroom < 0 and limit > 1:
+            new_limit, reason = limit - 1, "mémoire libre insuffisante"
+        elif (
+            sample.cpu_busy is not None and sample.cpu_busy > CPU_HIGH
+            and limit > (os.cpu_count() or 1)
+            and (sample.iowait is None or sample.iowait < IOWAIT_HIGH)
+        ):
+            new_limit, reason = limit - 1, "processeur saturé"
+        elif waiting and limit < self.max_workers and active >= limit:
+            fits = headroom is None or per_file is None or headroom > 2 * per_file
+            if fits and sample.iowait is not None and sample.iowait > IOWAIT_HIGH:
+                new_limit, reason = limit + 1, "attente d'entrées/sorties élevée"
+            elif fits and sample.cpu_busy is not None and sample.cpu_busy < CPU_LOW:
+                new_limit, reason = limit + 1, "processeur disponible"
+
+        if new_limit == limit:
+            return
+        with self._condition:
+            self.limit = new_limit
+            self._condition.notify_all()
+        self.adjustments.append((time.monotonic() - self._started, limit, new_limit, reason))
+        logger.info(
+            "Concurrency %d -> %d: %s (cpu %s, iowait %s, free %s MB, %s MB per file)",
+            limit, new_limit, reason,
+            _percent(sample.cpu_busy), _percent(sample.iowait),
+            _megabytes(sample.free_bytes), _megabytes(per_file),
+            extra={
+                "event": "concurrency",
+                "previous": limit,
+                "limit": new_limit,
+                "reason": reason,
+                "active": active,
+                "waiting": waiting,
+                "cpu_busy": sample.cpu_busy,
+                "iowait": sample.iowait,
+                "free_bytes": sample.free_bytes,
+                "bytes_per_file": per_file,
+            },
+        )
+
+    def summary(self) -> str:
+        """One-line human-readable summary."""
+        if not self.adjustments:
+            return f"Parallélisme : {self.limit} fichier(s) à la fois, sans ajustement."
+        lowest = min(min(old, new) for _, old, new, _ in self.adjustments)
+        highest = max(max(old, new) for _, old, new, _ in self.adjustments)
+        return (
+            f"Parallélisme : entre {lowest} et {highest} fichier(s) à la fois "
+            f"({len(self.adjustments)} ajustement(s))."
+        )
+
+
+class _Slot:
+    def __init__(self, limiter: AdaptiveLimiter) -> None:
+        self._limiter = limiter
+
+    def __enter__(self) -> None:
+        self._limiter.acquire()
+
+    def __exit__(self, *_exc) -> None:
+        self._limiter.release()
+
+
+def _percent(value: Optional[float]) -> str:
+    return "?" if value is None else f"{value:.0%}"
+
+
+def _megabytes(value: Optional[float]) -> str:
+    return "?" if value is None else f"{value / 1048576:.0f}"
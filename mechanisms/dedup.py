@@ -0,0 +1,207 @@
+"""
+Output Deduplication Module.
+
+Archives often contain byte-identical copies of the same PDF in several
+folders.  This module groups a batch by content hash so each unique
+document is processed once, then materialises the other outputs from
+the first one with a reflink, a hard link or, as a last resort, a copy.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+from mechanisms.cancellation import CancellationToken
+
+logger = logging.getLogger("watermark_app.dedup")
+
+_HASH_CHUNK = 1024 * 1024
+_FICLONE = 0x40049409  # Linux ioctl: share extents with another file (btrfs, XFS)
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file's contents, read in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DuplicateGroup:
+    """Files of a batch that share the same content."""
+
+    def __init__(self, primary: tuple[str, str], size: int) -> None:
+        """Start a group whose *primary* pair will actually be processed."""
+        self.primary = primary
+        self.duplicates: list[tuple[str, str]] = []
+        self.size = size
+
+
+class DedupStats:
+    """What deduplication saved on one batch."""
+
+    def __init__(self) -> None:
+        """Start with nothing saved."""
+        self.unique = 0
+        self.duplicates = 0
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+        self.methods: dict[str, int] = {}
+
+    def summary(self) -> str:
+        """One-line human-readable summary."""
+        methods = ", ".join(f"{count} {name}" for name, count in sorted(self.methods.items()))
+        return (
+            f"Doublons : {self.duplicates} fichier(s) identique(s) non retraité(s)"
+            f"{f' ({methods})' if methods else ''}, "
+            f"{self.bytes_saved / 1e6:.1f} Mo et ~{self.seconds_saved:.1f}s économisés."
+        )
+
+
+def find_duplicates(pairs: list[tuple[str, str]]) -> list[DuplicateGroup]:
+    """Group ``(input, output)`` pairs by identical input content.
+
+    Files are first bucketed by size so only size collisions are hashed.
+    Unreadable files end up in their own group and fail later as usual.
+    Group order follows the first appearance of each document.
+    """
+    sizes: dict[str, int] = {}
+    by_size: dict[int, int] = {}
+    for input_path, _ in pairs:
+        try:
+            size = os.path.getsize(input_path)
+        except OSError:
+            size = -1
+        sizes[input_path] = size
+        by_size[size] = by_size.get(size, 0) + 1
+
+    groups: list[DuplicateGroup] = []
+    by_key: dict[tuple[int, str], DuplicateGroup] = {}
+    for pair in pairs:
+        input_path = pair[0]
+        size = sizes[input_path]
+        key = None
+        if size >= 0 and by_size[size] > 1:
+            try:
+                key = (size, hash_file(input_path))
+            except OSError as exc:
+                logger.warning("Cannot hash %s: %s", input_path, exc)
+
+        if key is not None and key in by_key:
+            by_key[key].duplicates.append(pair)
+            continue
+
+        group = DuplicateGroup(pair, max(size, 0))
+        groups.append(group)
+        if key is not None:
+            by_key[key] = group
+    return groups
+
+
+def _reflink(source: str, target: str) -> None:
+    if not sys.platform.startswith("linux"):
+        raise OSError("reflinks are only supported on Linux")
+    import fcntl
+
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+
+
+def link_or_copy(source: str, target: str) -> str:
+    """Materialise *target* as a copy of *source*, as cheaply as possible.
+
+    Tries a copy-on-write reflink, then a hard link, then a plain copy.
+    Note that hard-linked outputs share storage: editing one edits all.
+    The new file is made under a temporary name in the target's folder
+    and renamed over *target*, so an existing output is only replaced
+    once its successor is complete, and kept if every method fails.
+
+    Returns:
+        The method used: ``"reflink"``, ``"lien physique"`` or ``"copie"``.
+    """
+    if os.path.abspath(source) == os.path.abspath(target):
+        return "copie"
+    folder, name = os.path.split(os.path.abspath(target))
+    temp = os.path.join(folder, f".{name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        method = _materialize(source, temp)
+        os.replace(temp, target)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+    return method
+
+
+def _materialize(source: str, target: str) -> str:
+    """Create the new file *target* from *source*; see :func:`link_or_copy`."""
+    if os.path.lexists(target):
+        os.remove(target)  # leftover of a crashed attempt
+    try:
+        _reflink(source, target)
+        return "reflink"
+    except OSError:
+        pass
+    try:
+        os.link(source, target)
+        return "lien physique"
+    except OSError:
+        pass
+    shutil.copy2(source, target)
+    return "copie"
+
+
+def materialize_duplicates(
+    groups: list[DuplicateGroup],
+    succeeded_inputs: set[str],
+    on_file_done: Callable[[str, bool], None],
+    seconds_per_unique: float = 0.0,
+    cancel_token: Optional[CancellationToken] = None,
+) -> DedupStats:
+    """Create the outputs of every duplicate from its processed primary.
+
+    Duplicates of a primary that failed are reported as failed too;
+    duplicates of a primary that never ran (cancellation) are skipped.
+    The time saved is estimated as *seconds_per_unique* per duplicate,
+    minus the time spent linking.
+    """
+    started = time.monotonic()
+    stats = DedupStats()
+    stats.unique = len(groups)
+    for group in groups:
+        primary_input, primary_output = group.primary
+        for input_path, output_path in group.duplicates:
+            if primary_input not in succeeded_inputs:
+                if cancel_token is not None and cancel_token.cancelled:
+                    continue
+                on_file_done(input_path, False)
+                continue
+            try:
+                method = link_or_copy(primary_output, output_path)
+            except OSError as exc:
+                logger.error("Cannot materialise %s: %s", output_path, exc)
+                on_file_done(input_path, False)
+                continue
+            stats.duplicates += 1
+            stats.bytes_saved += group.size
+            stats.methods[method] = stats.methods.get(method, 0) + 1
+            on_file_done(input_path, True)
+
+    spent = time.monotonic() - started
+    stats.seconds_saved = max(0.0, seconds_per_unique * stats.duplicates - spent)
+    logger.info(stats.summary())
+    return stats
+
@@ -0,0 +1,125 @@
+"""
+Document I/O Module.
+
+How the engine opens its inputs and writes its outputs.
+
+Inputs can be *memory-mapped*: the file is mapped read-only and MuPDF
+parses it straight from the mapping, without copying it into a Python
+buffer and without issuing its own small reads.  Pages are faulted in by
+the operating system as MuPDF touches them, which pays off on large files
+and on network mounts where each read is a round trip.  The mapping is
+released as soon as the document is closed, so the file can be replaced
+afterwards (Windows refuses to replace a mapped file).
+
+Outputs are saved with garbage collection, stream compression and
+cleaned content streams as before, optionally with:
+
+* object streams — objects are packed into compressed streams, which
+  makes structure-heavy documents noticeably smaller,
+* linearisation ("fast web view") — the first page can be displayed
+  before the whole file is downloaded.  Recent MuPDF releases dropped
+  linearisation; there the output is saved without it and a warning is
+  logged once.
+"""
+
+import logging
+import mmap
+import threading
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger("watermark_app.document_io")
+
+_linearize_supported: Optional[bool] = None
+_linearize_lock = threading.Lock()
+
+
+class MappedFile:
+    """Read-only memory mapping of a file, handed to MuPDF as a buffer."""
+
+    def __init__(self, path: str) -> None:
+        """Map *path*.
+
+        Raises:
+            OSError: If the file cannot be opened.
+            ValueError: If the file is empty (empty files cannot be mapped).
+        """
+        with open(path, "rb") as fh:
+            self._mapping = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view: Optional[memoryview] = memoryview(self._mapping)
+
+    def close(self) -> None:
+        """Release the mapping; the documents opened on it must be closed first."""
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+            self._mapping.close()
+
+
+def open_document(path: str, mapped: bool = False) -> tuple["fitz.Document", Optional[MappedFile]]:
+    """Open the PDF at *path*, through a memory mapping when *mapped*.
+
+    Returns:
+        The document and its mapping (None when opened from the path,
+        also used as a fallback for files that cannot be mapped).  Close
+        the document, then the mapping.
+    """
+    if mapped:
+        try:
+            mapping = MappedFile(path)
+        except (OSError, ValueError) as exc:
+            logger.debug("Cannot map %s, opening it from its path: %s", path, exc)
+        else:
+            try:
+                return fitz.open(stream=mapping.view, filetype="pdf"), mapping
+            except Exception:
+                mapping.close()
+                raise
+    return fitz.open(path), None
+
+
+def save_options(object_streams: bool = False, linearize: bool = False) -> dict:
+    """Keyword arguments of ``Document.save`` / ``tobytes`` for the engine's outputs."""
+    options = {"garbage": 4, "deflate": True, "clean": True}
+    if object_streams:
+        options["use_objstms"] = 1
+    if linearize and _linearize_supported is not False:
+        options["linear"] = True
+    return options
+
+
+def save_document(
+    doc: "fitz.Document",
+    path: Optional[str] = None,
+    object_streams: bool = False,
+    linearize: bool = False,
+) -> Optional[bytes]:
+    """Save *doc* to *path*, or return its bytes when *path* is None.
+
+    When MuPDF rejects linearisation, the document is saved without it
+    and later saves no longer ask for it.
+    """
+    global _linearize_supported
+    options = save_options(object_streams, linearize)
+    try:
+        data = doc.tobytes(**options) if path is None else doc.save(path, **options)
+    except Exception as exc:
+        if not options.pop("linear", False):
+            raise
+        with _linearize_lock:
+            if _linearize_supported is None:
+                logger.warning(
+                    "Linearisation unavailable with MuPDF %s, outputs are saved "
+                    "without it: %s", fitz.VersionFitz, exc,
+                )
+            _linearize_supported = False
+        return doc.tobytes(**options) if path is None else doc.save(path, **options)
+    if "linear" in options:
+        _linearize_supported = True
+    return data
+
+
+def linearize_supported() -> Optional[bool]:
+    """Whether MuPDF accepted linearisation so far (None until tried)."""
+    return _linearize_supported
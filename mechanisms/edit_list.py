@@ -0,0 +1,66 @@
+"""
+Stream Edit List Module.
+
+Rules no longer rewrite a content stream each time they fire.  They
+record *edits* (offset, length, replacement) against the original bytes,
+and the stream is rebuilt once, with a single join, after every rule
+has run.  Rewriting is therefore linear in the stream size, only one new
+copy of the stream is ever built, and each edit touches exactly the
+bytes a rule matched instead of every occurrence of the same snippet.
+"""
+
+from array import array
+
+
+class EditList:
+    """Non-destructive edits against one byte string.
+
+    Offsets and lengths are kept in flat ``array('q')`` buffers and the
+    replacements in a parallel list, so recording an edit costs two
+    integer appends.
+    """
+
+    __slots__ = ("starts", "lengths", "replacements")
+
+    def __init__(self) -> None:
+        """Start with no edits."""
+        self.starts = array("q")
+        self.lengths = array("q")
+        self.replacements: list[bytes] = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, start: int, end: int, replacement: bytes = b"") -> None:
+        """Replace ``content[start:end]`` with *replacement*."""
+        self.starts.append(start)
+        self.lengths.append(end - start)
+        self.replacements.append(replacement)
+
+    def apply(self, content: bytes) -> bytes:
+        """Build the edited copy of *content*.
+
+        Overlapping edits are resolved in favour of the one starting
+        first (the widest one when two start together); an edit that
+        overlaps an edit already kept is dropped, so an enclosing rule
+        (a whole red ``BT … ET`` block) wins over the smaller hits
+        inside it.
+        """
+        if not self.starts:
+            return content
+        order = sorted(
+            range(len(self.starts)),
+            key=lambda i: (self.starts[i], -self.lengths[i]),
+        )
+        view = memoryview(content)  # slices without copying
+        parts = []
+        position = 0
+        for i in order:
+            start = self.starts[i]
+            if start < position:
+                continue  # overlaps an edit already applied
+            parts.append(view[position:start])
+            parts.append(self.replacements[i])
+            position = start + self.lengths[i]
+        parts.append(view[position:])
+        return b"".join(parts)
@@ -0,0 +1,442 @@
+"""
+Process Isolation Module.
+
+Optional batch mode for untrusted or malformed documents: every file is
+processed in a separate worker *process* watched by a supervisor thread,
+with three limits:
+
+* a time limit per file,
+* a time limit per page (the worker reports each page and each image it
+  cleans, so a single huge or looping content stream is caught long
+  before the file limit; phases that do not work page by page, such as
+  saving, are only bound by the file limit),
+* a memory limit on the worker's resident set.
+
+A worker that exceeds a limit, runs out of memory or crashes is killed
+and replaced, and the offending document is *quarantined*: a copy goes to
+a ``_quarantaine`` folder next to the outputs, with the reason in
+``raisons.txt``.  Other files keep running on the other workers, and each
+worker process is reused from one file to the next, so well-behaved
+batches only pay the process start-up once per worker.
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Optional
+
+from mechanisms.cancellation import CancellationToken
+from mechanisms.scratch import ScratchSpace, reserve_output_path
+from mechanisms.verification import OutputVerifier
+
+logger = logging.getLogger("watermark_app.isolation")
+
+QUARANTINE_FOLDER = "_quarantaine"
+QUARANTINE_LOG = "raisons.txt"
+STARTUP_TIMEOUT = 60.0
+POLL_INTERVAL = 0.25
+# Engine phases that report every page or image; the page limit only
+# applies while one of them runs
+PAGED_PHASES = ("rules", "forms", "raster")
+
+# Spawned rather than forked: same behaviour on every platform, and safe
+# in a process that already runs Tk and worker threads
+_context = multiprocessing.get_context("spawn")
+
+
+class IsolationLimits:
+    """Per-file limits enforced on isolated workers."""
+
+    def __init__(
+        self,
+        file_seconds: float = 300.0,
+        page_seconds: float = 30.0,
+        memory_mb: int = 2048,
+    ) -> None:
+        """Describe the limits; ``0`` disables the corresponding one."""
+        self.file_seconds = file_seconds
+        self.page_seconds = page_seconds
+        self.memory_mb = memory_mb
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.memory_mb * 1024 * 1024
+
+
+def process_rss(pid: int) -> Optional[int]:
+    """Resident memory of process *pid* in bytes, when the platform tells."""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class _Counters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000 | 0x0010, False, pid)  # QUERY_LIMITED | VM_READ
+        if not handle:
+            return None
+        try:
+            counters = _Counters()
+            counters.cb = ctypes.sizeof(counters)
+            if not kernel32.K32GetProcessMemoryInfo(
+                handle, ctypes.byref(counters), counters.cb
+            ):
+                return None
+            return counters.WorkingSetSize
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# ── Worker process ────────────────────────────────────────────────
+
+
+class _Heartbeat:
+    """Progress variable of the worker: each update tells the supervisor."""
+
+    def __init__(self, conn) -> None:
+        self._conn = conn
+
+    def set(self, value) -> None:
+        self._conn.send(("page", value))
+
+    def phase(self, name: str) -> None:
+        """Engine heartbeat: a phase started, or one of its pages or images."""
+        self._conn.send(("phase", name))
+
+
+class _ErrorCapture(logging.Handler):
+    """Remembers the last error logged by the engine in the worker."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.ERROR)
+        self.last: Optional[logging.LogRecord] = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.last = record
+
+    def out_of_memory(self) -> bool:
+        if self.last is None:
+            return False
+        if self.last.exc_info and isinstance(self.last.exc_info[1], MemoryError):
+            return True
+        message = self.last.getMessage().lower()
+        return "out of memory" in message or "malloc" in message
+
+
+def _limit_address_space(memory_bytes: int) -> None:
+    """Hard memory cap for platforms where the supervisor cannot read RSS."""
+    if not memory_bytes or process_rss(os.getpid()) is not None:
+        return
+    try:
+        import resource
+
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, hard))
+    except (ImportError, ValueError, OSError) as exc:
+        logger.debug("Cannot limit worker memory: %s", exc)
+
+
+def _worker_main(conn, settings: dict, memory_bytes: int) -> None:
+    """Entry point of an isolated worker process."""
+    from mechanisms.watermark_processor import WatermarkProcessor
+
+    _limit_address_space(memory_bytes)
+    capture = _ErrorCapture()
+    logging.getLogger("watermark_app").addHandler(capture)
+    processor = WatermarkProcessor(**settings)
+    verifiers: dict[tuple[str, str], OutputVerifier] = {}
+    conn.send(("ready",))
+    with ScratchSpace() as scratch:  # one per worker, reused for every file
+        _serve(conn, processor, verifiers, capture, scratch)
+
+
+def _serve(conn, processor, verifiers: dict, capture: _ErrorCapture, scratch: ScratchSpace) -> None:
+    """Process the files sent by the supervisor until it says stop."""
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        input_path, output_path, name_pattern, footer_pattern, raster, verify = task
+
+        verifier = None
+        if verify:
+            # One verifier per pattern pair, so its page cache spans files
+            verifier = verifiers.setdefault(
+                (name_pattern, footer_pattern),
+                OutputVerifier(name_pattern, footer_pattern),
+            )
+            checked, hits, seconds = (
+                verifier.pages_checked, verifier.cache_hits, verifier.seconds
+            )
+        capture.last = None
+        heartbeat = _Heartbeat(conn)
+        success = processor.remove_watermark_by_structure(
+            input_path, output_path, name_pattern, footer_pattern,
+            progress_var=heartbeat, notify=False, verifier=verifier,
+            raster=raster, heartbeat=heartbeat.phase, scratch=scratch,
+        )
+        verification = None
+        if verifier is not None and success:
+            verification = (
+                verifier.failures.pop(output_path, []),
+                verifier.pages_checked - checked,
+                verifier.cache_hits - hits,
+                verifier.seconds - seconds,
+            )
+        conn.send(("done", success, success or not capture.out_of_memory(), verification))
+
+
+# ── Supervisor side ───────────────────────────────────────────────
+
+
+class WorkerCrashed(Exception):
+    """The worker process died or stopped answering."""
+
+
+class _Worker:
+    """One worker process and the supervisor end of its pipe."""
+
+    def __init__(self, settings: dict, limits: IsolationLimits) -> None:
+        self.conn, child_conn = _context.Pipe()
+        self.process = _context.Process(
+            target=_worker_main,
+            args=(child_conn, settings, limits.memory_bytes),
+            name="watermark-isolated",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        if not self.conn.poll(STARTUP_TIMEOUT):
+            self.kill()
+            raise WorkerCrashed("le processus de traitement n'a pas démarré")
+        try:
+            self.conn.recv()  # ("ready",)
+        except EOFError:
+            self.kill()
+            raise WorkerCrashed("le processus de traitement n'a pas démarré")
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self) -> None:
+        """Ask the worker to exit after its current file."""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self) -> None:
+        """Terminate the worker at once."""
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class Quarantine:
+    """Documents set aside by isolated batches, with the reason why."""
+
+    def __init__(self) -> None:
+        """Start with no quarantined documents."""
+        self.entries: list[tuple[str, str]] = []
+        self._lock = threading.Lock()
+
+    def add(self, input_path: str, output_path: str, reason: str) -> None:
+        """Copy *input_path* to the quarantine folder next to *output_path*.
+
+        Inputs sharing a name (from different folders of a manifest or
+        multi-file job) get a numbered copy instead of overwriting each
+        other; ``raisons.txt`` lists the copy next to its source path.
+        """
+        folder = os.path.join(os.path.dirname(os.path.abspath(output_path)), QUARANTINE_FOLDER)
+        copy = reserve_output_path(os.path.join(folder, os.path.basename(input_path)))
+        with self._lock:
+            self.entries.append((os.path.basename(copy), reason))
+            try:
+                os.makedirs(folder, exist_ok=True)
+                shutil.copy2(input_path, copy)
+                with open(os.path.join(folder, QUARANTINE_LOG), "a", encoding="utf-8") as fh:
+                    fh.write(
+                        f"{time.strftime('%Y-%m-%d %H:%M:%S')}\t{os.path.basename(copy)}"
+                        f"\t{input_path}\t{reason}\n"
+                    )
+            except OSError as exc:
+                logger.warning("Cannot quarantine %s: %s", input_path, exc)
+        logger.warning("Quarantined %s: %s", input_path, reason)
+
+    def summary(self) -> str:
+        """One-line human-readable summary."""
+        return f"{len(self.entries)} fichier(s) mis en quarantaine ({QUARANTINE_FOLDER})."
+
+
+class IsolatedRunner:
+    """Runs files in supervised worker processes, one process per lane.
+
+    :meth:`process` is called from the batch's worker threads; each
+    thread keeps its own worker process between files.  Call
+    :meth:`close` when the batch is over.
+    """
+
+    def __init__(
+        self,
+        settings: dict,
+        limits: Optional[IsolationLimits] = None,
+        verifier: Optional[OutputVerifier] = None,
+    ) -> None:
+        """Prepare the runner.
+
+        Args:
+            settings: ``WatermarkProcessor`` keyword arguments for the
+                engine inside each worker process.
+            limits: Time and memory limits; the defaults when omitted.
+            verifier: Batch verifier that receives the results of the
+                verification done inside the workers.
+        """
+        # Workers are daemonic processes, which may not start the shard
+        # pool: each one cleans its document by itself
+        self.settings = dict(settings, shard_min_pages=0)
+        self.limits = limits or IsolationLimits()
+        self.verifier = verifier
+        self.quarantine = Quarantine()
+        self._local = threading.local()
+        self._workers: list[_Worker] = []
+        self._lock = threading.Lock()
+
+    def _worker(self) -> _Worker:
+        worker = getattr(self._local, "worker", None)
+        if worker is None or not worker.alive:
+            worker = _Worker(self.settings, self.limits)
+            self._local.worker = worker
+            with self._lock:
+                self._workers.append(worker)
+        return worker
+
+    def _discard_worker(self) -> None:
+        worker = self._local.worker
+        self._local.worker = None
+        worker.kill()
+        with self._lock:
+            self._workers.remove(worker)
+
+    def process(
+        self,
+        input_path: str,
+        output_path: str,
+        name_pattern: str,
+        footer_pattern: str,
+        raster: bool = False,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> Optional[bool]:
+        """Process one file in this thread's worker process.
+
+        Returns:
+            True on success, False on failure (quarantined or not), None
+            when the batch was cancelled while the file was running.
+        """
+        try:
+            worker = self._worker()
+        except WorkerCrashed as exc:
+            logger.error("Cannot start isolated worker: %s", exc)
+            return False
+
+        limits = self.limits
+        worker.conn.send((
+            input_path, output_path, name_pattern, footer_pattern,
+            raster, self.verifier is not None,
+        ))
+        started = last_beat = time.monotonic()
+        phase = "open"
+        reason = None
+        while reason is None:
+            try:
+                ready = worker.conn.poll(POLL_INTERVAL)
+                message = worker.conn.recv() if ready else None
+            except (EOFError, OSError):
+                worker.process.join(timeout=5)
+                reason = f"processus arrêté brutalement (code {worker.process.exitcode})"
+                break
+
+            if message is not None and message[0] == "page":
+                last_beat = time.monotonic()
+            elif message is not None and message[0] == "phase":
+                phase = message[1]
+                last_beat = time.monotonic()
+            elif message is not None:
+                _, success, clean_failure, verification = message
+                if verification is not None and self.verifier is not None:
+                    self.verifier.record(output_path, *verification)
+                if not clean_failure:
+                    self._discard_worker()
+                    self.quarantine.add(
+                        input_path, output_path,
+                        f"mémoire insuffisante (limite {limits.memory_mb} Mo)",
+                    )
+                return success
+
+            if cancel_token is not None and cancel_token.cancelled:
+                # Nothing was committed: the scratch directory of the killed
+                # worker is removed by the next process writing to that folder
+                self._discard_worker()
+                return None
+            now = time.monotonic()
+            if limits.file_seconds and now - started > limits.file_seconds:
+                reason = f"délai par fichier dépassé ({limits.file_seconds:g} s)"
+            elif (
+                limits.page_seconds and phase in PAGED_PHASES
+                and now - last_beat > limits.page_seconds
+            ):
+                reason = f"page bloquée plus de {limits.page_seconds:g} s"
+            elif limits.memory_mb:
+                rss = process_rss(worker.process.pid)
+                if rss is not None and rss > limits.memory_bytes:
+                    reason = f"mémoire dépassée ({rss / 1048576:.0f} Mo, limite {limits.memory_mb} Mo)"
+
+        self._discard_worker()
+        self.quarantine.add(input_path, output_path, reason)
+        return False
+
+    def memory_in_use(self) -> Optional[int]:
+        """Resident memory of this process and of every live worker."""
+        with self._lock:
+            pids = [worker.process.pid for worker in self._workers]
+        total = process_rss(os.getpid())
+        if total is None:
+            return None
+        for pid in pids:
+            total += process_rss(pid) or 0
+        return total
+
+    def close(self) -> None:
+        """Stop every worker process of the batch."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
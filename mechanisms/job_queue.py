@@ -0,0 +1,387 @@
+"""
+Job Queue Module.
+
+Schedules independent watermark-removal jobs (a single file, a list of
+files or a whole folder, each with its own patterns) onto a shared worker pool, and
+tracks per-job status, progress and throughput for the UI.
+"""
+
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from mechanisms.cancellation import CancellationToken
+from mechanisms.manifest import ManifestEntry
+from mechanisms.scratch import reserve_output_path
+from mechanisms.verification import OutputVerifier
+
+logger = logging.getLogger("watermark_app.jobs")
+
+# Job states (user-facing labels)
+PENDING = "En attente"
+RUNNING = "En cours"
+DONE = "Terminé"
+FAILED = "Erreur"
+CANCELLED = "Annulé"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+def default_output_path(input_path: str, stamp: int, folder: str = "") -> str:
+    """Output path used when a file is processed outside of folder mode.
+
+    The name is reserved, so jobs started in the same second on the same
+    file get distinct outputs instead of overwriting each other.
+    """
+    base, ext = os.path.splitext(os.path.basename(input_path))
+    return reserve_output_path(os.path.join(
+        folder or os.path.dirname(input_path),
+        f"{base}_sans_filigrane_{stamp}{ext}",
+    ))
+
+
+class _JobVar:
+    """Minimal stand-in for a Tk variable that forwards writes to a job."""
+
+    def __init__(self, on_set: Callable[[object], None]) -> None:
+        self._on_set = on_set
+        self._value = None
+
+    def set(self, value) -> None:
+        self._value = value
+        self._on_set(value)
+
+    def get(self):
+        return self._value
+
+
+class Job:
+    """One queued unit of work: a single PDF, a list of PDFs or a folder."""
+
+    _ids = itertools.count(1)
+
+    def __init__(
+        self,
+        input_path: str,
+        output_path: str,
+        name_pattern: str,
+        footer_pattern: str = "DOCUMENT NON APPLICABLE",
+        single_file: bool = False,
+        files: Optional[list[str]] = None,
+        pipelined: bool = False,
+        deduplicate: bool = False,
+        verify: bool = False,
+        raster: bool = False,
+        isolate: bool = False,
+        adaptive: bool = False,
+        entries: Optional[list[ManifestEntry]] = None,
+        settings: Optional[dict] = None,
+    ) -> None:
+        """Describe a job; nothing runs until it is submitted to a queue.
+
+        When *files* is given the job is a multi-file batch: *input_path*
+        is only used as a label and *output_path* is the destination
+        folder (empty to write each result next to its source).
+        *pipelined* selects the prefetch / write-behind batch mode and
+        *deduplicate* processes byte-identical inputs only once and
+        *verify* re-scans modified pages of the outputs afterwards;
+        *raster* also cleans watermark pixels from scanned page images;
+        *isolate* runs each file of a batch in a supervised process with
+        time and memory limits (ignored for a single file), and
+        *adaptive* lets the engine tune how many files run at once.
+        When *entries* is given the job runs a manifest: *input_path* is
+        the manifest file and each entry carries its own patterns.
+        *settings* are engine options (stamp, I/O) fixed when the job is
+        created; see :meth:`WatermarkProcessor.configured`.
+        """
+        self.job_id = next(Job._ids)
+        self.input_path = input_path
+        self.output_path = output_path
+        self.name_pattern = name_pattern
+        self.footer_pattern = footer_pattern
+        self.single_file = single_file
+        self.files = list(files) if files else []
+        self.pipelined = pipelined
+        self.deduplicate = deduplicate
+        self.verify = verify
+        self.raster = raster
+        self.isolate = isolate
+        self.adaptive = adaptive
+        self.entries = list(entries) if entries else []
+        self.settings = dict(settings) if settings else {}
+        self.pairs: list[tuple[str, str]] = []
+
+        self.status = PENDING
+        self.progress = 0
+        self.message = ""
+        self.total_bytes = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_token = CancellationToken()
+
+    @property
+    def label(self) -> str:
+        """Short display name for the job."""
+        if self.entries:
+            return (
+                f"Manifeste {os.path.basename(self.input_path)} "
+                f"({len(self.entries)} fichiers)"
+            )
+        if self.files:
+            return f"{len(self.files)} fichiers PDF"
+        return os.path.basename(os.path.normpath(self.input_path)) or self.input_path
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def elapsed(self) -> float:
+        """Seconds spent running so far (or in total once finished)."""
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return max(0.0, end - self.started_at)
+
+    def throughput(self) -> float:
+        """Estimated input throughput in MB/s, based on progress so far."""
+        elapsed = self.elapsed()
+        if elapsed <= 0 or not self.total_bytes:
+            return 0.0
+        return self.total_bytes * (self.progress / 100.0) / elapsed / 1e6
+
+    def measure_input(self) -> None:
+        """Record the total size of the PDFs this job will read."""
+        if self.entries:
+            paths = [entry.input_path for entry in self.entries]
+        elif self.files:
+            paths = self.files
+        elif self.single_file:
+            paths = [self.input_path]
+        else:
+            try:
+                paths = [
+                    os.path.join(self.input_path, f)
+                    for f in os.listdir(self.input_path)
+                    if f.lower().endswith(".pdf")
+                ]
+            except OSError:
+                paths = []
+        total = 0
+        for path in paths:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        self.total_bytes = total
+
+    def output_pairs(self) -> list[tuple[str, str]]:
+        """``(input, output)`` pairs for a multi-file job.
+
+        Files sharing a name but coming from different folders get a
+        numbered suffix instead of overwriting each other.
+        """
+        stamp = int(time.time())
+        used: set[str] = set()
+        pairs = []
+        for path in self.files:
+            if self.output_path:
+                base, ext = os.path.splitext(os.path.basename(path))
+                candidate = os.path.join(self.output_path, base + ext)
+                counter = 2
+                while os.path.normcase(candidate) in used:
+                    candidate = os.path.join(self.output_path, f"{base} ({counter}){ext}")
+                    counter += 1
+            else:
+                candidate = default_output_path(path, stamp)
+            used.add(os.path.normcase(candidate))
+            pairs.append((path, candidate))
+        return pairs
+
+    def preview_pairs(self) -> list[tuple[str, str]]:
+        """``(input, output)`` pairs whose output exists, for the preview."""
+        if self.entries:
+            pairs = [entry.pair for entry in self.entries]
+        elif self.files:
+            pairs = self.pairs
+        elif self.single_file:
+            pairs = [(self.input_path, self.output_path)]
+        else:
+            try:
+                names = sorted(
+                    f for f in os.listdir(self.input_path) if f.lower().endswith(".pdf")
+                )
+            except OSError:
+                names = []
+            pairs = [
+                (os.path.join(self.input_path, f), os.path.join(self.output_path, f))
+                for f in names
+            ]
+        return [(src, dst) for src, dst in pairs if os.path.isfile(dst)]
+
+
+class JobQueue:
+    """Runs jobs concurrently on a shared pool of worker threads.
+
+    *on_update* is called with the job whenever its status, progress or
+    message changes.  It is invoked from worker threads, so UI callers
+    must marshal it back to the Tk main loop themselves.
+    """
+
+    def __init__(
+        self,
+        watermark_processor,
+        max_workers: int = 2,
+        on_update: Optional[Callable[[Job], None]] = None,
+    ) -> None:
+        """Create the pool; worker threads are started lazily on submit."""
+        self.watermark_processor = watermark_processor
+        self.on_update = on_update
+        self.jobs: list[Job] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="watermark-job"
+        )
+
+    def submit(self, job: Job) -> Job:
+        """Enqueue *job*; it starts as soon as a worker is free."""
+        with self._lock:
+            self.jobs.append(job)
+        self._notify(job)
+        self._executor.submit(self._run, job)
+        return job
+
+    def cancel(self, job: Job) -> None:
+        """Cancel a pending or running job."""
+        if job.finished:
+            return
+        job.cancel_token.cancel()
+        if job.status == PENDING:
+            self._finish(job, CANCELLED, "Annulé avant démarrage.")
+
+    def cancel_all(self) -> None:
+        """Cancel every job that has not finished yet."""
+        for job in self.active_jobs():
+            self.cancel(job)
+
+    def active_jobs(self) -> list[Job]:
+        """Jobs that are pending or running."""
+        with self._lock:
+            return [job for job in self.jobs if not job.finished]
+
+    def clear_finished(self) -> list[Job]:
+        """Forget finished jobs and return them."""
+        with self._lock:
+            finished = [job for job in self.jobs if job.finished]
+            self.jobs = [job for job in self.jobs if not job.finished]
+        return finished
+
+    def shutdown(self) -> None:
+        """Cancel outstanding work and stop accepting new jobs."""
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ── Internals ─────────────────────────────────────────────────
+
+    def _notify(self, job: Job) -> None:
+        if self.on_update is not None:
+            try:
+                self.on_update(job)
+            except Exception as exc:
+                logger.warning("Job update callback failed: %s", exc)
+
+    def _finish(self, job: Job, status: str, message: str) -> None:
+        job.status = status
+        job.message = message
+        job.finished_at = time.monotonic()
+        self._notify(job)
+
+    def _set_progress(self, job: Job, value) -> None:
+        job.progress = int(value)
+        self._notify(job)
+
+    def _set_message(self, job: Job, value) -> None:
+        job.message = str(value)
+        self._notify(job)
+
+    def _run(self, job: Job) -> None:
+        if job.finished:
+            return  # cancelled while pending
+
+        job.status = RUNNING
+        job.started_at = time.monotonic()
+        job.measure_input()
+        self._notify(job)
+
+        progress_var = _JobVar(lambda value: self._set_progress(job, value))
+        status_var = _JobVar(lambda value: self._set_message(job, value))
+
+        try:
+            processor = self.watermark_processor.configured(**job.settings)
+            if job.entries:
+                success = processor.process_manifest(
+                    job.entries, progress_var, status_var,
+                    cancel_token=job.cancel_token, pipelined=job.pipelined,
+                    deduplicate=job.deduplicate, verify=job.verify,
+                    raster=job.raster, isolate=job.isolate,
+                    adaptive=job.adaptive,
+                )
+            elif job.files:
+                job.pairs = job.output_pairs()
+                success = processor.process_files(
+                    job.pairs, job.name_pattern,
+                    job.footer_pattern, progress_var, status_var,
+                    cancel_token=job.cancel_token, pipelined=job.pipelined,
+                    deduplicate=job.deduplicate, verify=job.verify,
+                    raster=job.raster, isolate=job.isolate,
+                    adaptive=job.adaptive,
+                )
+            elif job.single_file:
+                status_var.set(f"Traitement de {job.label}…")
+                verifier = (
+                    OutputVerifier(job.name_pattern, job.footer_pattern)
+                    if job.verify else None
+                )
+                success = processor.remove_watermark_by_structure(
+                    job.input_path, job.output_path, job.name_pattern,
+                    job.footer_pattern, progress_var,
+                    cancel_token=job.cancel_token, verifier=verifier,
+                    raster=job.raster,
+                )
+                if success and verifier is not None:
+                    status_var.set(verifier.summary())
+            else:
+                success = processor.process_folder(
+                    job.input_path, job.output_path, job.name_pattern,
+                    job.footer_pattern, progress_var, status_var,
+                    cancel_token=job.cancel_token, pipelined=job.pipelined,
+                    deduplicate=job.deduplicate, verify=job.verify,
+                    raster=job.raster, isolate=job.isolate,
+                    adaptive=job.adaptive,
+                )
+        except Exception as exc:
+            logger.error("Job %d failed: %s", job.job_id, exc, exc_info=True)
+            self._finish(job, FAILED, f"Erreur : {exc}")
+            return
+
+        if job.cancel_token.cancelled:
+            message = job.message if not job.single_file else (
+                "Traitement annulé : aucun fichier écrit."
+            )
+            self._finish(job, CANCELLED, message)
+        elif success:
+            job.progress = 100
+            message = job.message
+            if job.single_file and not job.verify:
+                message = "Suppression des filigranes terminée !"
+            self._finish(job, DONE, message)
+        else:
+            self._finish(job, FAILED, job.message or "Le traitement a échoué.")
+
+        logger.info(
+            "Job %d (%s) %s in %.1fs",
+            job.job_id, job.label, job.status, job.elapsed(),
+        )
@@ -0,0 +1,189 @@
+"""
+Batch Manifest Module.
+
+A manifest lists the files of one batch together with their own
+parameters, so documents of several clients (each with its own name and
+footer) run as a single job on one worker pool.  Two formats are read:
+
+* CSV, with a header row (``,`` or ``;`` separated, as Excel writes it),
+* JSON Lines, one object per line.
+
+Recognised fields are ``input`` and ``output`` (required; relative paths
+are resolved from the manifest's folder), ``name`` and ``footer`` (the
+watermark patterns; ``footer`` defaults to the application's default
+when the field is absent, an empty value disables it) and ``priority``
+(an integer, higher runs first, 0 by default).
+
+Entries are grouped by parameter set: each set's compiled rules are
+shared by its files, duplicates are only searched within a set, and the
+batch summary lists the sets.
+"""
+
+import csv
+import json
+import logging
+import os
+from typing import Optional
+
+from mechanisms.page_classifier import needle_regex
+
+logger = logging.getLogger("watermark_app.manifest")
+
+DEFAULT_FOOTER = "DOCUMENT NON APPLICABLE"
+FIELDS = ("input", "output", "name", "footer", "priority")
+
+
+class ManifestError(ValueError):
+    """Raised when a manifest cannot be read or one of its entries is invalid."""
+
+
+class ManifestEntry:
+    """One file of a manifest and the parameters it is processed with."""
+
+    def __init__(
+        self,
+        input_path: str,
+        output_path: str,
+        name_pattern: str = "",
+        footer_pattern: str = DEFAULT_FOOTER,
+        priority: int = 0,
+    ) -> None:
+        self.input_path = input_path
+        self.output_path = output_path
+        self.name_pattern = name_pattern
+        self.footer_pattern = footer_pattern
+        self.priority = priority
+
+    @property
+    def pair(self) -> tuple[str, str]:
+        return self.input_path, self.output_path
+
+    @property
+    def parameters(self) -> tuple[str, str]:
+        """``(name_pattern, footer_pattern)``, the key of the entry's group."""
+        return self.name_pattern, self.footer_pattern
+
+
+def _rows(path: str) -> list[tuple[int, dict]]:
+    """``(line number, fields)`` of every non-empty record of *path*."""
+    rows = []
+    with open(path, encoding="utf-8-sig", newline="") as fh:
+        if path.lower().endswith((".jsonl", ".json")):
+            for line_number, line in enumerate(fh, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise ManifestError(f"ligne {line_number} : JSON invalide ({exc.msg})")
+                if not isinstance(record, dict):
+                    raise ManifestError(f"ligne {line_number} : un objet JSON est attendu")
+                rows.append((line_number, record))
+            return rows
+
+        sample = fh.read(4096)
+        fh.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(fh, dialect=dialect)
+        if reader.fieldnames is None:
+            return rows
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for record in reader:
+            if any(value and value.strip() for value in record.values() if isinstance(value, str)):
+                rows.append((reader.line_num, record))
+    return rows
+
+
+def load_manifest(path: str) -> list[ManifestEntry]:
+    """Read and validate the manifest at *path*.
+
+    Raises:
+        ManifestError: If the file cannot be read, a required field is
+            missing, a priority is not an integer or two entries share
+            an output.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    try:
+        rows = _rows(path)
+    except OSError as exc:
+        raise ManifestError(f"Impossible de lire le manifeste {path} : {exc}")
+    except ManifestError as exc:
+        raise ManifestError(f"{os.path.basename(path)}, {exc}")
+
+    entries = []
+    outputs: dict[str, int] = {}
+    for line_number, record in rows:
+        where = f"{os.path.basename(path)}, ligne {line_number}"
+        fields = {str(key).strip().lower(): value for key, value in record.items() if key}
+        unknown = sorted(set(fields) - set(FIELDS))
+        if unknown:
+            logger.warning("%s: ignored field(s) %s", where, ", ".join(unknown))
+
+        input_path = str(fields.get("input") or "").strip()
+        output_path = str(fields.get("output") or "").strip()
+        if not input_path or not output_path:
+            raise ManifestError(f"{where} : « input » et « output » sont obligatoires")
+        input_path = os.path.normpath(os.path.join(base, input_path))
+        output_path = os.path.normpath(os.path.join(base, output_path))
+
+        key = os.path.normcase(output_path)
+        if key in outputs:
+            raise ManifestError(
+                f"{where} : même fichier de sortie qu'à la ligne {outputs[key]}"
+            )
+        outputs[key] = line_number
+
+        priority = fields.get("priority")
+        try:
+            priority = int(priority) if str(priority or "").strip() else 0
+        except (TypeError, ValueError):
+            raise ManifestError(f"{where} : priorité « {priority} » invalide")
+
+        footer = fields.get("footer", DEFAULT_FOOTER)
+        entries.append(ManifestEntry(
+            input_path, output_path,
+            name_pattern=str(fields.get("name") or "").strip(),
+            footer_pattern=str(footer if footer is not None else "").strip(),
+            priority=priority,
+        ))
+    if not entries:
+        raise ManifestError(f"{os.path.basename(path)} : aucun fichier à traiter")
+    return entries
+
+
+def group_by_parameters(
+    entries: list[ManifestEntry],
+) -> dict[tuple[str, str], list[ManifestEntry]]:
+    """Entries per ``(name_pattern, footer_pattern)``, in manifest order."""
+    groups: dict[tuple[str, str], list[ManifestEntry]] = {}
+    for entry in entries:
+        groups.setdefault(entry.parameters, []).append(entry)
+    return groups
+
+
+def prepare_groups(entries: list[ManifestEntry]) -> dict[tuple[str, str], list[ManifestEntry]]:
+    """Group *entries* and compile each group's rules once, before dispatch."""
+    groups = group_by_parameters(entries)
+    for name_pattern, footer_pattern in groups:
+        needle_regex(name_pattern, footer_pattern)
+    logger.info(
+        "Manifest of %d file(s) in %d parameter set(s): %s",
+        len(entries), len(groups),
+        ", ".join(str(len(group)) for group in groups.values()),
+    )
+    return groups
+
+
+def summary(entries: Optional[list[ManifestEntry]]) -> str:
+    """One-line human-readable description of the parameter sets."""
+    if not entries:
+        return ""
+    groups = group_by_parameters(entries)
+    priorities = {entry.priority for entry in entries}
+    text = f"Manifeste : {len(groups)} jeu(x) de paramètres"
+    if len(priorities) > 1:
+        text += f", priorités de {min(priorities)} à {max(priorities)}"
+    return text + "."
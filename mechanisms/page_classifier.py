@@ -0,0 +1,149 @@
+"""
+Page Classification Module.
+
+Fast pre-pass that decides which pages can possibly carry a watermark
+before any rule runs.  Every content stream is scanned once with a
+single compiled pattern that matches all rule triggers at the same time
+(name, footer, "Document non tenu" text and hex forms, red colour
+operators).  The resulting per-page feature vectors are stored in NumPy
+arrays and the pages to rewrite are selected in one vectorised step.
+
+NumPy is optional: without it, :func:`classify_pages` returns None and
+the engine simply processes every page as before.
+"""
+
+import functools
+import logging
+import re
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # classification is an optimisation, not a requirement
+    np = None
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger("watermark_app.classifier")
+
+DATE_WATERMARK = b"Document non tenu"
+HEX_PATTERNS = (
+    b"44 6f 63 75 6d 65 6e 74 20 6e 6f 6e 20 74 65 6e 75",  # "Document non tenu"
+    b"6f 63 75 6d 65 6e 74 20 6e 6f 6e 20 74 65 6e 75",     # "ocument non tenu"
+    b"44 6f 63 75 6d",                                      # "Docum"
+    b"6e 6f 6e 20 74 65 6e 75",                             # "non tenu"
+)
+RED_MARKERS = (b"1 0 0 rg", b"0.8 0 0 rg", b"1 0 0 RG")
+
+# Feature columns, in order
+FEATURES = ("streams", "stream_bytes", "name", "footer", "date", "hex", "red")
+_NEEDLE_COLUMNS = slice(2, None)
+# Decoded streams of selected pages kept for the rule pass; past this,
+# the rule pass decompresses them again instead of holding the document
+CACHE_BYTES = 64 * 1024 * 1024
+
+
+class PageClassification:
+    """Per-page features of one document and the pages selected for rewriting."""
+
+    def __init__(self, features, selected, contents: dict[int, bytes]) -> None:
+        """Wrap the feature matrix, the selected page indices and stream cache."""
+        self.features = features      # int64 array, shape (pages, len(FEATURES))
+        self.selected = selected      # int64 array of page indices
+        # xref -> raw stream of selected pages, up to CACHE_BYTES; the
+        # rule pass pops each entry as it rewrites the page
+        self.contents = contents
+
+    @property
+    def page_count(self) -> int:
+        return int(self.features.shape[0])
+
+    def column(self, name: str):
+        """Feature column *name* for every page."""
+        return self.features[:, FEATURES.index(name)]
+
+    def summary(self) -> str:
+        """Page-level statistics for logs and reports."""
+        hits = self.features[:, _NEEDLE_COLUMNS].sum(axis=0)
+        per_rule = ", ".join(
+            f"{name}={int(count)}" for name, count in zip(FEATURES[2:], hits)
+        )
+        return (
+            f"{len(self.selected)}/{self.page_count} page(s) à traiter, "
+            f"{int(self.column('stream_bytes').sum())} octets de flux ({per_rule})"
+        )
+
+
+@functools.lru_cache(maxsize=128)
+def needle_regex(name_pattern: str, footer_pattern: str) -> "re.Pattern[bytes]":
+    """One alternation with a named group per feature column.
+
+    Compiled patterns are cached, so batches and jobs reusing the same
+    parameters (and warmed-up worker threads) skip compilation.
+    """
+    groups = []
+    for column, needles in (
+        ("name", [name_pattern.encode("utf-8")] if name_pattern else []),
+        ("footer", [footer_pattern.encode("utf-8")] if footer_pattern else []),
+        ("date", [DATE_WATERMARK]),
+        ("hex", HEX_PATTERNS),
+        ("red", RED_MARKERS),
+    ):
+        if needles:
+            alternatives = b"|".join(re.escape(n) for n in needles)
+            groups.append(b"(?P<" + column.encode() + b">" + alternatives + b")")
+    return re.compile(b"|".join(groups))
+
+
+def classify_pages(
+    doc: "fitz.Document", name_pattern: str, footer_pattern: str
+) -> Optional[PageClassification]:
+    """Extract per-page features and select the pages any rule could modify.
+
+    A page is selected when at least one of its content streams contains
+    a rule trigger, so skipping the others never changes the output.
+    Streams of selected pages are kept, up to :data:`CACHE_BYTES`, so the
+    rule pass does not have to decompress them a second time; streams of
+    other pages are dropped as soon as their page is scanned.
+
+    Returns:
+        The classification, or None when NumPy is not available.
+    """
+    if np is None:
+        return None
+
+    regex = needle_regex(name_pattern, footer_pattern)
+    columns = {name: index for index, name in enumerate(FEATURES)}
+    features = np.zeros((len(doc), len(FEATURES)), dtype=np.int64)
+    contents: dict[int, bytes] = {}
+    cached_bytes = 0
+    scanned: dict[int, tuple[int, ...]] = {}  # xref -> counts, for shared streams
+
+    for page_num, page in enumerate(doc):
+        streams = []
+        row = features[page_num]
+        for xref in page.get_contents():
+            content = doc.xref_stream(xref)
+            if not content:
+                continue
+            streams.append((xref, content))
+            counts = scanned.get(xref)
+            if counts is None:
+                hits = [0] * len(FEATURES)
+                for match in regex.finditer(content):
+                    hits[columns[match.lastgroup]] += 1
+                counts = tuple(hits)
+                scanned[xref] = counts
+            row += counts
+            row[columns["streams"]] += 1
+            row[columns["stream_bytes"]] += len(content)
+        if row[_NEEDLE_COLUMNS].any():
+            for xref, content in streams:
+                if xref not in contents and cached_bytes + len(content) <= CACHE_BYTES:
+                    contents[xref] = content
+                    cached_bytes += len(content)
+
+    selected = np.flatnonzero(features[:, _NEEDLE_COLUMNS].any(axis=1))
+    classification = PageClassification(features, selected, contents)
+    logger.debug("Page classification: %s", classification.summary())
+    return classification
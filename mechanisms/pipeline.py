@@ -0,0 +1,259 @@
+"""
+Pipelined Batch Module.
+
+Splits a batch into three stages connected by bounded queues:
+
+* a reader thread prefetches the next files into memory,
+* the processing stage opens each document from bytes and cleans it,
+* a writer thread flushes finished documents to disk in the background.
+
+On slow storage (network shares) the processing stage no longer waits
+for I/O, and the per-stage metrics show where the time actually goes.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+import fitz  # PyMuPDF
+
+from mechanisms import telemetry
+from mechanisms.cancellation import CancellationToken, ProcessingCancelled
+from mechanisms.document_io import save_document
+from mechanisms.scratch import ScratchSpace
+from mechanisms.verification import OutputVerifier
+
+logger = logging.getLogger("watermark_app.pipeline")
+
+_DONE = object()  # end-of-stream sentinel
+
+
+class StageMetrics:
+    """Time and volume accounting for one pipeline stage."""
+
+    def __init__(self, name: str) -> None:
+        """Start empty counters for the stage called *name*."""
+        self.name = name
+        self.items = 0
+        self.bytes = 0
+        self.busy_seconds = 0.0   # doing its own work
+        self.wait_seconds = 0.0   # blocked on an empty input / full output queue
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}: {self.items} fichier(s), {self.bytes / 1e6:.1f} Mo, "
+            f"actif {self.busy_seconds:.2f}s, attente {self.wait_seconds:.2f}s"
+        )
+
+
+class PipelineMetrics:
+    """Metrics for a whole pipelined batch."""
+
+    def __init__(self) -> None:
+        """Create counters for the read, process and write stages."""
+        self.read = StageMetrics("lecture")
+        self.process = StageMetrics("traitement")
+        self.write = StageMetrics("écriture")
+        self.wall_seconds = 0.0
+
+    @property
+    def stages(self) -> tuple[StageMetrics, StageMetrics, StageMetrics]:
+        return self.read, self.process, self.write
+
+    def bottleneck(self) -> str:
+        """Name of the stage that was busy the longest."""
+        return max(self.stages, key=lambda stage: stage.busy_seconds).name
+
+    def summary(self) -> str:
+        """One-line human-readable summary of where time was spent."""
+        parts = "; ".join(str(stage) for stage in self.stages)
+        return (
+            f"Pipeline {self.wall_seconds:.2f}s ({parts}). "
+            f"Étape limitante : {self.bottleneck()}."
+        )
+
+
+def _timed_put(q: queue.Queue, item, stage: StageMetrics) -> None:
+    started = time.perf_counter()
+    q.put(item)
+    stage.wait_seconds += time.perf_counter() - started
+
+
+def _timed_get(q: queue.Queue, stage: StageMetrics):
+    started = time.perf_counter()
+    item = q.get()
+    stage.wait_seconds += time.perf_counter() - started
+    return item
+
+
+def run_pipeline(
+    processor,
+    pairs: list[tuple[str, str]],
+    name_pattern: str,
+    footer_pattern: str,
+    on_file_done: Callable[[str, bool], None],
+    cancel_token: Optional[CancellationToken] = None,
+    prefetch: int = 4,
+    verifier: Optional[OutputVerifier] = None,
+    raster: bool = False,
+    scratch: Optional[ScratchSpace] = None,
+    parameters: Optional[dict[str, tuple[str, str]]] = None,
+) -> PipelineMetrics:
+    """Process *pairs* through the read → process → write pipeline.
+
+    Args:
+        processor: The :class:`WatermarkProcessor` whose rules are applied.
+        pairs: ``(input_path, output_path)`` tuples.
+        on_file_done: Called with ``(input_path, success)`` once per file
+            that ran to completion (written or failed).
+        cancel_token: Stops reading and processing; documents already
+            processed are still flushed by the writer.
+        prefetch: Capacity of each bounded queue, i.e. how many files may
+            be held in memory ahead of / behind the processing stage.
+        verifier: Optional output verifier, run by the writer stage right
+            after each file is flushed.
+        raster: Also clean watermark pixels from page images (scans).
+        scratch: Scratch space the writer stages outputs in before moving
+            them into place; a private one is used when omitted.
+        parameters: ``(name_pattern, footer_pattern)`` per output path,
+            overriding the batch patterns (files of a manifest).
+
+    Returns:
+        Per-stage metrics for the batch.
+    """
+    own_scratch = scratch is None
+    if own_scratch:
+        scratch = ScratchSpace()
+    metrics = PipelineMetrics()
+    read_q: queue.Queue = queue.Queue(maxsize=max(1, prefetch))
+    write_q: queue.Queue = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()  # set on cancellation so the reader stops early
+    started = time.perf_counter()
+
+    def patterns(output_path: str) -> tuple[str, str]:
+        if parameters and output_path in parameters:
+            return parameters[output_path]
+        return name_pattern, footer_pattern
+
+    def cancelled() -> bool:
+        return stop.is_set() or (cancel_token is not None and cancel_token.cancelled)
+
+    def reader() -> None:
+        try:
+            for input_path, output_path in pairs:
+                if cancelled():
+                    break
+                t0 = time.perf_counter()
+                try:
+                    with open(input_path, "rb") as fh:
+                        data = fh.read()
+                except OSError as exc:
+                    logger.error("Cannot read %s: %s", input_path, exc)
+                    data = None
+                metrics.read.busy_seconds += time.perf_counter() - t0
+                if data is not None:
+                    metrics.read.items += 1
+                    metrics.read.bytes += len(data)
+                _timed_put(read_q, (input_path, output_path, data), metrics.read)
+        finally:
+            read_q.put(_DONE)
+
+    def writer() -> None:
+        while True:
+            item = _timed_get(write_q, metrics.write)
+            if item is _DONE:
+                return
+            input_path, output_path, data, report, file_started = item
+            t0 = time.perf_counter()
+            try:
+                scratch.write(data, output_path)
+                if verifier is not None:
+                    verifier.verify(
+                        output_path, report.modified_pages,
+                        OutputVerifier.patterns_for(*patterns(output_path)),
+                    )
+                success = True
+            except Exception as exc:
+                logger.error("Failed to write output to %s: %s", output_path, exc)
+                success = False
+            metrics.write.busy_seconds += time.perf_counter() - t0
+            metrics.write.items += 1
+            metrics.write.bytes += len(data)
+            telemetry.record_file(
+                input_path, output_path, file_started, success, report,
+                bytes_out=len(data), mode="pipeline",
+            )
+            on_file_done(input_path, success)
+
+    reader_thread = threading.Thread(target=reader, name="watermark-reader", daemon=True)
+    writer_thread = threading.Thread(target=writer, name="watermark-writer", daemon=True)
+    reader_thread.start()
+    writer_thread.start()
+
+    item = None
+    try:
+        while True:
+            item = _timed_get(read_q, metrics.process)
+            if item is _DONE:
+                break
+            input_path, output_path, data = item
+            if data is None:
+                on_file_done(input_path, False)
+                continue
+            if cancelled():
+                continue  # drain the queue so the reader can finish
+
+            profiler = processor.begin_document(
+                input_path, output_path, scope="lecture et écriture du pipeline"
+            )
+            t0 = time.perf_counter()
+            output = None
+            report = None
+            try:
+                doc = fitz.open(stream=data, filetype="pdf")
+                try:
+                    opened = time.perf_counter()
+                    report = processor.process_document(
+                        doc, *patterns(output_path), cancel_token=cancel_token,
+                        raster=raster,
+                    )
+                    report.phase_seconds["open"] += opened - t0
+                    phase_started = time.perf_counter()
+                    output = save_document(
+                        doc, None, processor.object_streams, processor.linearize
+                    )
+                    report.lap("save", phase_started)
+                finally:
+                    doc.close()
+            except ProcessingCancelled:
+                logger.info("Processing of %s cancelled", input_path)
+            except Exception as exc:
+                logger.error("Error processing %s: %s", input_path, exc, exc_info=True)
+                telemetry.record_file(input_path, output_path, t0, False, mode="pipeline")
+                on_file_done(input_path, False)
+            processor.end_document(profiler, report)
+            metrics.process.busy_seconds += time.perf_counter() - t0
+
+            if output is not None:
+                metrics.process.items += 1
+                metrics.process.bytes += len(data)
+                _timed_put(
+                    write_q,
+                    (input_path, output_path, output, report, t0),
+                    metrics.process,
+                )
+    finally:
+        stop.set()
+        while item is not _DONE:  # abnormal exit: unblock the reader
+            item = read_q.get()
+        write_q.put(_DONE)
+        reader_thread.join()
+        writer_thread.join()
+        if own_scratch:
+            scratch.close()
+
+    metrics.wall_seconds = time.perf_counter() - started
+    logger.info(metrics.summary())
+    return metrics
@@ -0,0 +1,261 @@
+"""
+Document Profiling Module.
+
+Diagnostic mode for documents that are much slower than their peers.
+Files whose name matches one of the configured patterns are processed
+under :mod:`cProfile` and :mod:`tracemalloc`, and three reports are
+written next to the output:
+
+* ``<output>.pstats`` – raw profile, for ``pstats`` or snakeviz,
+* ``<output>.alloc.txt`` – top allocation sites,
+* ``<output>.profile.json`` – time per engine phase and per rule.
+
+The summary viewer prints which phase and rule dominated::
+
+    python -m mechanisms.profiling sortie.pdf [autre.pdf …]
+
+Profiles are global to the interpreter (tracemalloc always, cProfile on
+recent Python versions), so a profiled document runs alone: it waits
+for the files in progress to finish, and other files wait for it.  In
+the pipelined mode the reader and writer threads keep running, and the
+report says so.
+Profiling can also be enabled with ``WATERMARK_PROFILE=<motif>[;<motif>…]``.
+"""
+
+import cProfile
+import fnmatch
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Optional
+
+logger = logging.getLogger("watermark_app.profiling")
+
+PROFILE_ENV = "WATERMARK_PROFILE"
+TOP_ALLOCATIONS = 25
+TOP_FUNCTIONS = 10
+
+# Files in progress, and whether one of them is being profiled
+_gate = threading.Condition()
+_running = 0
+_profiling = False
+_waiting = 0  # profiled documents waiting for the others to finish
+
+
+def patterns_from_environment() -> Optional[list[str]]:
+    """File name patterns listed in ``WATERMARK_PROFILE``, if any."""
+    value = os.environ.get(PROFILE_ENV, "").strip()
+    if not value:
+        return None
+    return [pattern.strip() for pattern in value.split(";") if pattern.strip()]
+
+
+def matches(path: str, patterns: Optional[list[str]]) -> bool:
+    """Whether the file name of *path* matches one of *patterns*."""
+    if not patterns:
+        return False
+    name = os.path.basename(path).lower()
+    return any(fnmatch.fnmatch(name, pattern.lower()) for pattern in patterns)
+
+
+def begin_document(
+    input_path: str, output_path: str, patterns: Optional[list[str]], scope: str = ""
+) -> Optional["DocumentProfiler"]:
+    """Register the start of a file; call :func:`end_document` when it is done.
+
+    Waits while a document is profiled.  When *input_path* matches
+    *patterns*, also waits for every other file to finish and returns
+    the started profiler; *scope* describes what else runs meanwhile.
+    """
+    global _running
+    if matches(input_path, patterns):
+        profiler = DocumentProfiler(input_path, output_path, scope)
+        profiler.start()
+        return profiler
+    with _gate:
+        while _profiling or _waiting:
+            _gate.wait()
+        _running += 1
+    return None
+
+
+def end_document(profiler: Optional["DocumentProfiler"], report=None) -> None:
+    """Counterpart of :func:`begin_document`; writes the reports if profiled."""
+    global _running
+    if profiler is not None:
+        profiler.stop(report)
+        return
+    with _gate:
+        _running -= 1
+        _gate.notify_all()
+
+
+class DocumentProfiler:
+    """cProfile + tracemalloc session around the processing of one file."""
+
+    def __init__(self, input_path: str, output_path: str, scope: str = "") -> None:
+        """Prepare a session whose reports are written next to *output_path*.
+
+        *scope* is noted in the reports when other work of the process
+        runs during the session.
+        """
+        self.input_path = input_path
+        self.output_path = output_path
+        self.scope = scope
+        self._profile = cProfile.Profile()
+        self._started = 0.0
+        self._stopped = False
+
+    def start(self) -> None:
+        """Begin profiling once no other file of the process is in progress."""
+        global _profiling, _waiting
+        with _gate:
+            _waiting += 1
+            while _profiling or _running:
+                _gate.wait()
+            _waiting -= 1
+            _profiling = True
+        tracemalloc.start(10)
+        self._started = time.perf_counter()
+        self._profile.enable()
+
+    def stop(self, report=None) -> None:
+        """End profiling and write the reports.
+
+        Args:
+            report: The engine's ``DocumentReport``, for the per-phase
+                and per-rule timings; omitted when the document failed
+                before the rules ran.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        try:
+            self._profile.disable()
+            elapsed = time.perf_counter() - self._started
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            self._release()
+
+        try:
+            self._write_reports(elapsed, snapshot, peak, report)
+        except OSError as exc:
+            logger.warning("Cannot write profile of %s: %s", self.input_path, exc)
+
+    @staticmethod
+    def _release() -> None:
+        global _profiling
+        with _gate:
+            _profiling = False
+            _gate.notify_all()
+
+    def _write_reports(self, elapsed: float, snapshot, peak: int, report) -> None:
+        self._profile.dump_stats(self.output_path + ".pstats")
+
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        with open(self.output_path + ".alloc.txt", "w", encoding="utf-8") as fh:
+            fh.write(f"{self.input_path}\nPic mémoire : {peak / 1e6:.1f} Mo\n")
+            if self.scope:
+                fh.write(f"Inclut aussi : {self.scope}\n")
+            fh.write("\n")
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                fh.write(f"{stat}\n")
+
+        stats = pstats.Stats(self._profile)
+        functions = sorted(
+            stats.stats.items(), key=lambda item: item[1][3], reverse=True
+        )[:TOP_FUNCTIONS]
+        summary = {
+            "input": self.input_path,
+            "seconds": round(elapsed, 4),
+            "peak_bytes": peak,
+            "scope": self.scope,
+            "phases": {},
+            "rules": {},
+            "rule_hits": {},
+            "pages": None,
+            "functions": [
+                {
+                    "function": pstats.func_std_string(func),
+                    "calls": calls,
+                    "cumulative": round(cumulative, 4),
+                }
+                for func, (_, calls, _, cumulative, _) in functions
+            ],
+        }
+        if report is not None:
+            summary["phases"] = {k: round(v, 4) for k, v in report.phase_seconds.items()}
+            summary["rules"] = {k: round(v, 4) for k, v in report.rule_seconds.items()}
+            summary["rule_hits"] = dict(report.rule_hits)
+            summary["pages"] = report.page_count
+        with open(self.output_path + ".profile.json", "w", encoding="utf-8") as fh:
+            json.dump(summary, fh, ensure_ascii=False, indent=2)
+        logger.info("Profile of %s written next to %s", self.input_path, self.output_path)
+
+
+def _dominant(timings: dict) -> str:
+    if not timings:
+        return "—"
+    name, seconds = max(timings.items(), key=lambda item: item[1])
+    return f"{name} ({seconds:.3f}s)"
+
+
+def format_summary(output_path: str) -> str:
+    """Human-readable digest of the profile written for *output_path*."""
+    if output_path.endswith(".profile.json"):
+        output_path = output_path[:-len(".profile.json")]
+    with open(output_path + ".profile.json", encoding="utf-8") as fh:
+        summary = json.load(fh)
+
+    out = io.StringIO()
+    out.write(
+        f"{summary['input']} : {summary['seconds']:.3f}s, "
+        f"{summary['pages'] or '?'} page(s), pic mémoire {summary['peak_bytes'] / 1e6:.1f} Mo\n"
+    )
+    if summary.get("scope"):
+        out.write(f"  Inclut aussi : {summary['scope']}\n")
+    out.write(f"  Phase dominante : {_dominant(summary['phases'])}\n")
+    out.write(f"  Règle dominante : {_dominant(summary['rules'])}\n")
+    for title, timings in (("Phases", summary["phases"]), ("Règles", summary["rules"])):
+        if timings:
+            out.write(f"  {title} :\n")
+            for name, seconds in sorted(timings.items(), key=lambda item: -item[1]):
+                hits = summary["rule_hits"].get(name) if title == "Règles" else None
+                suffix = f", {hits} application(s)" if hits else ""
+                out.write(f"    {name:<16}{seconds:9.4f}s{suffix}\n")
+    out.write("  Fonctions (temps cumulé) :\n")
+    for entry in summary["functions"]:
+        out.write(
+            f"    {entry['cumulative']:8.3f}s {entry['calls']:>7}  {entry['function']}\n"
+        )
+    return out.getvalue()
+
+
+def main(argv: list[str]) -> int:
+    """Print the summary of every output given on the command line."""
+    if not argv:
+        print("Usage : python -m mechanisms.profiling sortie.pdf [autre.pdf …]")
+        return 2
+    status = 0
+    for output_path in argv:
+        try:
+            print(format_summary(output_path))
+        except (OSError, ValueError, KeyError) as exc:
+            print(f"{output_path} : profil illisible ({exc})", file=sys.stderr)
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,184 @@
+"""
+Raster Watermark Module.
+
+Optional cleaning path for scanned documents, where the red diagonal
+and blue footer watermarks are part of the page images rather than
+text.  Each embedded image is decoded once, pixels whose colour is
+dominated by red or blue are painted white, and the cleaned image is
+written back into the same image object: JPEG scans are re-encoded as
+JPEG (a lossless re-embed would multiply their size), other images are
+stored Flate-compressed, and the rest of the image dictionary — soft
+mask included — is kept.
+
+Masks are computed tile by tile (horizontal bands), so the temporary
+arrays stay bounded regardless of the scan resolution.  PyMuPDF calls
+stay on the calling thread; the NumPy work, which releases the GIL,
+runs on a small thread pool so several images are cleaned in parallel.
+
+NumPy is optional: without it the raster pass is skipped with a warning.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # raster mode is unavailable without NumPy
+    np = None
+
+import fitz  # PyMuPDF
+
+from mechanisms.cancellation import CancellationToken
+
+logger = logging.getLogger("watermark_app.raster")
+
+# A pixel is watermark ink when one channel exceeds both others by this much
+COLOUR_DELTA = 60
+# Rows per tile: bounds the int16 temporaries to TILE_ROWS * width * 3 values
+TILE_ROWS = 256
+# Images smaller than this (icons, logos) are left alone
+MIN_IMAGE_PIXELS = 64 * 64
+# Quality of re-encoded JPEG scans
+JPEG_QUALITY = 85
+
+
+def _clean_samples(samples: bytearray, width: int, height: int, channels: int) -> int:
+    """Whiten red- and blue-dominated pixels in place, one band at a time.
+
+    Returns:
+        Number of pixels changed.
+    """
+    pixels = np.frombuffer(samples, dtype=np.uint8).reshape(height, width, channels)
+    changed = 0
+    for top in range(0, height, TILE_ROWS):
+        tile = pixels[top:top + TILE_ROWS, :, :3]
+        rgb = tile.astype(np.int16)
+        red, green, blue = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+        mask = (red - np.maximum(green, blue) > COLOUR_DELTA) | (
+            blue - np.maximum(red, green) > COLOUR_DELTA
+        )
+        count = int(np.count_nonzero(mask))
+        if count:
+            tile[mask] = 255
+            changed += count
+    return changed
+
+
+def _load_rgb(doc: "fitz.Document", xref: int) -> Optional["fitz.Pixmap"]:
+    """Decode image *xref* as an RGB pixmap without alpha, or None to skip it."""
+    pix = fitz.Pixmap(doc, xref)
+    if pix.width * pix.height < MIN_IMAGE_PIXELS:
+        return None
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.colorspace is None or pix.colorspace.n == 1:
+        return None  # masks and greyscale scans carry no coloured watermark
+    if pix.colorspace.n != 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return pix
+
+
+def _store(doc: "fitz.Document", xref: int, pix: "fitz.Pixmap", samples: bytearray) -> None:
+    """Write the cleaned *samples* of *pix* back into image object *xref*."""
+    cleaned = fitz.Pixmap(fitz.csRGB, pix.width, pix.height, bytes(samples), False)
+    kind, value = doc.xref_get_key(xref, "Filter")
+    if kind != "null" and "DCTDecode" in value:
+        doc.update_stream(xref, cleaned.tobytes("jpeg", jpg_quality=JPEG_QUALITY), compress=False)
+        doc.xref_set_key(xref, "Filter", "/DCTDecode")
+    else:
+        doc.update_stream(xref, cleaned.samples, compress=True)
+    # The samples are now 8-bit RGB; /SMask, /Width, /Height, /Intent stay
+    for key in ("DecodeParms", "Decode"):
+        if doc.xref_get_key(xref, key)[0] != "null":
+            doc.xref_set_key(xref, key, "null")
+    doc.xref_set_key(xref, "BitsPerComponent", "8")
+    if not _is_rgb(doc, xref):
+        doc.xref_set_key(xref, "ColorSpace", "/DeviceRGB")
+
+
+def _is_rgb(doc: "fitz.Document", xref: int) -> bool:
+    """Whether image *xref* already declares a plain three-component colour space."""
+    kind, value = doc.xref_get_key(xref, "ColorSpace")
+    if kind == "name":
+        return value == "/DeviceRGB"
+    if kind == "xref":
+        value = doc.xref_object(int(value.split()[0]), compressed=True)
+    return "/ICCBased" in value and "/Indexed" not in value and _icc_components(doc, value) == 3
+
+
+def _icc_components(doc: "fitz.Document", source: str) -> int:
+    """``/N`` of the ICC profile stream referenced by a ``[/ICCBased n 0 R]`` array."""
+    try:
+        profile = int(source.split("/ICCBased", 1)[1].split()[0])
+        kind, value = doc.xref_get_key(profile, "N")
+        return int(value) if kind == "int" else 0
+    except (IndexError, ValueError):
+        return 0
+
+
+def clean_raster_pages(
+    doc: "fitz.Document",
+    pages: Optional[list[int]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    max_workers: int = 4,
+    heartbeat: Optional[Callable[[str], None]] = None,
+) -> list[int]:
+    """Remove coloured watermarks from the images of *pages* (default: all).
+
+    Images shared by several pages are cleaned once.  At most
+    *max_workers* decoded images are held in memory at a time.
+    *heartbeat* is called with ``"raster"`` as each image is decoded and
+    written back.
+
+    Returns:
+        Indices of the pages whose images were modified.
+    """
+    if np is None:
+        logger.warning("Raster mode requires NumPy; skipping image cleaning")
+        return []
+
+    page_numbers = list(range(len(doc))) if pages is None else pages
+    work: list[tuple[int, int]] = []  # (page_num, xref), each xref once
+    seen: set[int] = set()
+    for page_num in page_numbers:
+        for image in doc[page_num].get_images(full=True):
+            xref = image[0]
+            if xref not in seen:
+                seen.add(xref)
+                work.append((page_num, xref))
+
+    modified: set[int] = set()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="watermark-raster") as pool:
+        for start in range(0, len(work), max_workers):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
+            # Decode a window of images on this thread (PyMuPDF), clean
+            # them in parallel (NumPy), then re-embed on this thread again
+            window = []
+            for page_num, xref in work[start:start + max_workers]:
+                if heartbeat is not None:
+                    heartbeat("raster")
+                try:
+                    pix = _load_rgb(doc, xref)
+                except Exception as exc:
+                    logger.warning("Cannot decode image %d: %s", xref, exc)
+                    continue
+                if pix is not None:
+                    window.append((page_num, xref, pix, bytearray(pix.samples)))
+
+            counts = pool.map(
+                lambda item: _clean_samples(item[3], item[2].width, item[2].height, item[2].n),
+                window,
+            )
+            for (page_num, xref, pix, samples), changed in zip(window, counts):
+                if not changed:
+                    continue
+                if heartbeat is not None:
+                    heartbeat("raster")
+                _store(doc, xref, pix, samples)
+                modified.add(page_num)
+                logger.debug("Image %d on page %d: %d pixel(s) cleaned", xref, page_num + 1, changed)
+
+    return sorted(modified)
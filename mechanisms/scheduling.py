@@ -0,0 +1,238 @@
+"""
+Batch Scheduling Module.
+
+Files of a batch are dispatched largest first: the cost of a document is
+estimated from its size (a ``stat``, nothing is opened), so a huge PDF
+found last in the folder no longer runs alone while every other worker
+sits idle.  The batch records how long each file took and reports how
+close the run came to the best possible makespan.
+
+Documents with many pages can also be *sharded*: their pages are split
+into groups that share no content stream, each group is cleaned by a
+separate process, and the parent applies the cleaned streams to its own
+copy of the document before saving it.  Pages sharing a stream always
+land in the same group, in page order, so the result is the same as a
+serial run.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger("watermark_app.scheduling")
+
+# Pages to clean from which the application shards a document, on
+# machines with more than one core
+SHARD_MIN_PAGES = 1000
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def estimate_cost(path: str) -> int:
+    """Relative cost of processing *path*: its size in bytes."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def largest_first(pairs: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """*pairs* ordered by decreasing input cost (stable for equal costs)."""
+    return sorted(pairs, key=lambda pair: estimate_cost(pair[0]), reverse=True)
+
+
+class ScheduleStats:
+    """Per-file durations of a batch and the resulting efficiency."""
+
+    def __init__(self, workers: int) -> None:
+        """Start measuring a batch run by *workers* concurrent lanes."""
+        self.workers = workers
+        self.durations: list[float] = []
+        self.makespan = 0.0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Account for one file that took *seconds*."""
+        with self._lock:
+            self.durations.append(seconds)
+
+    def finish(self) -> None:
+        """Stop the clock at the end of the batch."""
+        self.makespan = time.monotonic() - self._started
+
+    @property
+    def lower_bound(self) -> float:
+        """Shortest possible makespan: the longest file, or perfect balance."""
+        if not self.durations:
+            return 0.0
+        return max(max(self.durations), sum(self.durations) / self.workers)
+
+    @property
+    def efficiency(self) -> float:
+        """How close the makespan came to its lower bound (1.0 is optimal)."""
+        if not self.makespan or not self.durations:
+            return 1.0
+        return min(1.0, self.lower_bound / self.makespan)
+
+    @property
+    def utilisation(self) -> float:
+        """Fraction of the workers' time spent processing files."""
+        if not self.makespan or not self.durations:
+            return 1.0
+        return min(1.0, sum(self.durations) / (self.workers * self.makespan))
+
+    def summary(self) -> str:
+        """One-line human-readable summary."""
+        return (
+            f"Ordonnancement : {self.makespan:.1f}s pour un minimum de "
+            f"{self.lower_bound:.1f}s (efficacité {self.efficiency:.0%}, "
+            f"occupation {self.utilisation:.0%})."
+        )
+
+
+# ── Page sharding ─────────────────────────────────────────────────
+
+
+def split_pages(doc: "fitz.Document", pages: list[int], shards: int) -> list[list[int]]:
+    """Split *pages* into at most *shards* groups sharing no content stream.
+
+    Pages connected by a shared stream form one unit; units are assigned
+    greedily to the least loaded group (by page count), and every group
+    keeps its pages in document order.
+    """
+    owner: dict[int, int] = {}  # xref -> unit
+    parent = list(range(len(pages)))
+
+    def find(unit: int) -> int:
+        while parent[unit] != unit:
+            parent[unit] = parent[parent[unit]]
+            unit = parent[unit]
+        return unit
+
+    for unit, page_num in enumerate(pages):
+        for xref in doc[page_num].get_contents():
+            if xref in owner:
+                parent[find(unit)] = find(owner[xref])
+            else:
+                owner[xref] = unit
+
+    units: dict[int, list[int]] = {}
+    for unit, page_num in enumerate(pages):
+        units.setdefault(find(unit), []).append(page_num)
+
+    groups: list[list[int]] = [[] for _ in range(max(1, shards))]
+    for unit_pages in sorted(units.values(), key=len, reverse=True):
+        min(groups, key=len).extend(unit_pages)
+    return [sorted(group) for group in groups if group]
+
+
+def _clean_shard(path: str, pages: list[int], name_bytes: bytes, footer_bytes: bytes):
+    """Worker side: clean the streams of *pages* of the document at *path*."""
+    from mechanisms.watermark_processor import DocumentReport, clean_stream
+
+    doc = fitz.open(path)
+    try:
+        report = DocumentReport(len(doc))
+        current: dict[int, bytes] = {}
+        updated: set[int] = set()
+        for page_num in pages:
+            modified = False
+            for xref in doc[page_num].get_contents():
+                content = current.get(xref)
+                if content is None:
+                    content = doc.xref_stream(xref)
+                if not content:
+                    continue
+                cleaned = clean_stream(content, name_bytes, footer_bytes, report)
+                if cleaned is not None:
+                    # Later pages of the shard see the cleaned stream
+                    current[xref] = cleaned
+                    updated.add(xref)
+                    modified = True
+            if modified:
+                report.modified_pages.append(page_num)
+        return (
+            {xref: current[xref] for xref in updated},
+            report.modified_pages,
+            dict(report.rule_hits),
+            dict(report.rule_seconds),
+        )
+    finally:
+        doc.close()
+
+
+def _shard_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=max(1, os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+@atexit.register
+def shutdown_shards() -> None:
+    """Stop the shard processes, if any were started."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def clean_sharded(
+    doc: "fitz.Document",
+    pages: list[int],
+    name_bytes: bytes,
+    footer_bytes: bytes,
+    report,
+    shards: int,
+    cancel_token=None,
+    path: Optional[str] = None,
+) -> None:
+    """Clean *pages* of *doc* across *shards* processes.
+
+    *doc* must have been opened from a file, *path* (its name by
+    default; give it for memory-mapped documents).  Cleaned streams are
+    written into *doc* and the shard results merged into *report*.
+
+    Raises:
+        ProcessingCancelled: If *cancel_token* is cancelled meanwhile.
+    """
+    path = path or doc.name
+    groups = split_pages(doc, pages, shards)
+    logger.info(
+        "Sharding %s: %d page(s) in %d group(s)", path, len(pages), len(groups)
+    )
+    executor = _shard_executor()
+    futures = [
+        executor.submit(_clean_shard, path, group, name_bytes, footer_bytes)
+        for group in groups
+    ]
+    modified: set[int] = set()
+    try:
+        for future in futures:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            updates, modified_pages, hits, seconds = future.result()
+            for xref, content in updates.items():
+                doc.update_stream(xref, content)
+            modified.update(modified_pages)
+            report.rule_hits.update(Counter(hits))
+            report.rule_seconds.update(Counter(seconds))
+    finally:
+        for future in futures:
+            future.cancel()
+    report.modified_pages.extend(sorted(modified))
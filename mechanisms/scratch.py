@@ -0,0 +1,233 @@
+"""
+Scratch Space Module.
+
+Collision-free temporary and output file handling.  Every job gets its
+own scratch directory *inside the destination folder*, so finished
+files are moved into place with an atomic ``os.replace`` on the same
+filesystem instead of being copied from the system temp dir.  Scratch
+directory names carry the host and process id; directories left behind
+by a crashed process are removed the first time a process writes to the
+same folder (once per folder and process, so a long batch does not list
+its destination again for every file), and the ones of the current
+process are removed at exit.
+"""
+
+import atexit
+import logging
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import weakref
+
+logger = logging.getLogger("watermark_app.scratch")
+
+SCRATCH_PREFIX = ".filigrane-tmp-"
+# Scratch directories of other hosts cannot be checked for liveness;
+# they are only considered abandoned after this long without changes
+STALE_AFTER = 24 * 3600
+
+_HOST = socket.gethostname().replace("-", "_") or "localhost"
+_live_spaces: "weakref.WeakSet[ScratchSpace]" = weakref.WeakSet()
+_reserved: set[str] = set()
+_reserved_lock = threading.Lock()
+_swept: set[str] = set()  # folders already cleaned up by this process
+_swept_lock = threading.Lock()
+
+
+def _pid_alive(pid: int) -> bool:
+    """Whether process *pid* still runs on this machine."""
+    if pid == os.getpid():
+        return True
+    if sys.platform == "win32":
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+def _is_abandoned(path: str, name: str) -> bool:
+    try:
+        host, pid, _ = name[len(SCRATCH_PREFIX):].rsplit("-", 2)
+        pid = int(pid)
+    except ValueError:
+        return False  # not one of ours
+    if host == _HOST:
+        return not _pid_alive(pid)
+    try:
+        return time.time() - os.path.getmtime(path) > STALE_AFTER
+    except OSError:
+        return False
+
+
+def cleanup_stale(folder: str) -> int:
+    """Remove scratch directories left in *folder* by crashed processes.
+
+    Returns:
+        Number of directories removed.
+    """
+    removed = 0
+    try:
+        entries = os.listdir(folder)
+    except OSError:
+        return 0
+    for name in entries:
+        if not name.startswith(SCRATCH_PREFIX):
+            continue
+        path = os.path.join(folder, name)
+        if os.path.isdir(path) and _is_abandoned(path, name):
+            shutil.rmtree(path, ignore_errors=True)
+            if not os.path.exists(path):
+                removed += 1
+                logger.info("Removed abandoned scratch directory %s", path)
+    return removed
+
+
+def _cleanup_once(folder: str) -> None:
+    """:func:`cleanup_stale` for the first scratch directory in *folder*."""
+    key = os.path.normcase(folder)
+    with _swept_lock:
+        if key in _swept:
+            return
+        _swept.add(key)
+    cleanup_stale(folder)
+
+
+def reserve_output_path(path: str) -> str:
+    """Claim *path*, or the first free ``name (n).ext`` variant of it.
+
+    Reservations are process-wide, so two jobs asking for the same name
+    in the same second get distinct outputs even before either of them
+    has written anything.
+    """
+    base, ext = os.path.splitext(path)
+    candidate = path
+    counter = 2
+    with _reserved_lock:
+        while os.path.normcase(candidate) in _reserved or os.path.lexists(candidate):
+            candidate = f"{base} ({counter}){ext}"
+            counter += 1
+        _reserved.add(os.path.normcase(candidate))
+    return candidate
+
+
+class ScratchSpace:
+    """Scratch directories of one job, one per destination folder.
+
+    Thread-safe: the workers of a batch share a single instance.  Use it
+    as a context manager, or call :meth:`close` when the job ends.
+    """
+
+    def __init__(self) -> None:
+        """Start without any directory; they are created on first use."""
+        self._dirs: dict[str, str] = {}
+        self._lock = threading.Lock()
+        _live_spaces.add(self)
+
+    def __enter__(self) -> "ScratchSpace":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    def _dir_for(self, output_path: str) -> str:
+        folder = os.path.dirname(os.path.abspath(output_path))
+        with self._lock:
+            scratch = self._dirs.get(folder)
+            if scratch is None:
+                _cleanup_once(folder)
+                prefix = f"{SCRATCH_PREFIX}{_HOST}-{os.getpid()}-"
+                try:
+                    scratch = tempfile.mkdtemp(prefix=prefix, dir=folder)
+                except OSError as exc:
+                    # Unwritable destination: process anyway so the result
+                    # can be recovered from the system temp dir
+                    logger.warning("Cannot create scratch directory in %s: %s", folder, exc)
+                    scratch = tempfile.mkdtemp(prefix=prefix)
+                self._dirs[folder] = scratch
+            return scratch
+
+    def temp_path(self, output_path: str) -> str:
+        """Unique, already created file path for the work copy of *output_path*."""
+        fd, path = tempfile.mkstemp(
+            dir=self._dir_for(output_path),
+            suffix=f"_{os.path.basename(output_path)}",
+        )
+        os.close(fd)
+        return path
+
+    def commit(self, temp_path: str, output_path: str) -> None:
+        """Atomically move *temp_path* to *output_path*.
+
+        Replacing the directory entry never writes through an existing
+        output, so outputs hard-linked by deduplication stay untouched.
+        """
+        os.replace(temp_path, output_path)
+
+    def write(self, data: bytes, output_path: str) -> None:
+        """Write *data* to a work copy, then move it into place atomically.
+
+        Readers never observe a half-written PDF, and a crash leaves at
+        most a stray file in the scratch directory.
+        """
+        temp = self.temp_path(output_path)
+        try:
+            with open(temp, "wb") as fh:
+                fh.write(data)
+            self.commit(temp, output_path)
+        except BaseException:
+            self.discard(temp)
+            raise
+
+    def discard(self, temp_path: str) -> None:
+        """Remove a work copy that will not be committed."""
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.warning("Could not remove temp file %s: %s", temp_path, exc)
+
+    def preserve(self, temp_path: str) -> str:
+        """Move an uncommitted work copy out of scratch so it survives cleanup.
+
+        Returns:
+            Where the work copy can now be found.
+        """
+        kept = os.path.join(
+            os.path.dirname(os.path.dirname(temp_path)), os.path.basename(temp_path)
+        )
+        try:
+            os.replace(temp_path, kept)
+        except OSError as exc:
+            logger.warning("Could not move %s out of scratch: %s", temp_path, exc)
+            return temp_path
+        return kept
+
+    def close(self) -> None:
+        """Remove every scratch directory of the job."""
+        with self._lock:
+            dirs, self._dirs = list(self._dirs.values()), {}
+        for scratch in dirs:
+            shutil.rmtree(scratch, ignore_errors=True)
+        _live_spaces.discard(self)
+
+
+@atexit.register
+def _close_live_spaces() -> None:
+    for space in list(_live_spaces):
+        space.close()
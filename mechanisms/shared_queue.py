@@ -0,0 +1,542 @@
+"""
+Shared Work Queue Module.
+
+Distributed batch mode without a central service: the queue is a plain
+directory on a shared mount, and any number of hosts run the headless
+engine against it.
+
+::
+
+    <file d'attente>/
+        tasks/<id>.json    one file to process (paths, patterns, options)
+        leases/<id>.lease  claim of a worker, renewed while it works
+        done/<id>.json     result reported by the worker
+
+A worker claims a task by creating its lease with ``O_CREAT | O_EXCL``,
+which succeeds for exactly one host.  Leases are renewed (``mtime``
+touched) by a heartbeat thread; a lease that has not been renewed for
+:data:`LEASE_SECONDS` belongs to a dead worker, and the first host that
+manages to rename it away takes the task over.  Lease ages are measured
+against the clock of the shared filesystem, not of each host.  Each
+lease records a token unique to the claim: a worker that stalled past
+expiry sees that its lease now belongs to someone else and neither
+renews nor removes it.  Results are written with an atomic rename, like
+outputs.
+
+Locking is done with plain files rather than SQLite, whose locks are
+unreliable on SMB and NFS mounts.  Usage::
+
+    python -m mechanisms.shared_queue submit FILE_D_ATTENTE ENTREE SORTIE --name "NOM"
+    python -m mechanisms.shared_queue work FILE_D_ATTENTE [--workers N]
+    python -m mechanisms.shared_queue status FILE_D_ATTENTE
+
+Several ``work`` processes pointed at one local directory behave exactly
+like several hosts.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from mechanisms.scratch import ScratchSpace
+
+logger = logging.getLogger("watermark_app.shared_queue")
+
+LEASE_SECONDS = 120.0
+IDLE_POLL = 2.0
+
+_HOST = socket.gethostname() or "localhost"
+
+
+def _write_json(path: str, data: dict) -> None:
+    """Write *data* next to *path*, then rename it into place atomically."""
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, ensure_ascii=False)
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+class Task:
+    """One file of a shared queue."""
+
+    def __init__(self, task_id: str, data: dict) -> None:
+        self.task_id = task_id
+        self.input_path: str = data["input"]
+        self.output_path: str = data["output"]
+        self.name_pattern: str = data.get("name", "")
+        self.footer_pattern: str = data.get("footer", "")
+        self.raster: bool = data.get("raster", False)
+        self.verify: bool = data.get("verify", False)
+
+
+class QueueStatus:
+    """Counts of the tasks of a shared queue, by state."""
+
+    def __init__(self) -> None:
+        self.pending = 0
+        self.leased = 0
+        self.expired = 0
+        self.succeeded = 0
+        self.failed: list[tuple[str, str]] = []  # (input, host)
+
+    @property
+    def unfinished(self) -> int:
+        return self.pending + self.leased + self.expired
+
+    def summary(self) -> str:
+        """One-line human-readable summary."""
+        return (
+            f"{self.succeeded} traité(s), {len(self.failed)} en erreur, "
+            f"{self.leased} en cours, {self.expired} bail(s) expiré(s), "
+            f"{self.pending} en attente."
+        )
+
+
+class SharedQueue:
+    """A work queue stored in a (shared) directory."""
+
+    def __init__(self, root: str, lease_seconds: float = LEASE_SECONDS) -> None:
+        """Open the queue in *root*, creating its folders if needed."""
+        self.root = root
+        self.lease_seconds = lease_seconds
+        self.tasks_dir = os.path.join(root, "tasks")
+        self.leases_dir = os.path.join(root, "leases")
+        self.done_dir = os.path.join(root, "done")
+        for folder in (self.tasks_dir, self.leases_dir, self.done_dir):
+            os.makedirs(folder, exist_ok=True)
+        self._held: dict[str, str] = {}  # task id -> token of our lease
+        # Leases of this process found taken over, or given back too late
+        # to survive another host's claim
+        self.lease_conflicts = 0
+        self._finished: set[str] = set()  # results never go away
+        self._lock = threading.Lock()
+
+    # ── Paths and clock ───────────────────────────────────────────
+
+    def _task_path(self, task_id: str) -> str:
+        return os.path.join(self.tasks_dir, task_id + ".json")
+
+    def _lease_path(self, task_id: str) -> str:
+        return os.path.join(self.leases_dir, task_id + ".lease")
+
+    def _done_path(self, task_id: str) -> str:
+        return os.path.join(self.done_dir, task_id + ".json")
+
+    def _now(self) -> float:
+        """Current time according to the shared filesystem."""
+        clock = os.path.join(self.root, ".clock")
+        with open(clock, "a"):
+            pass
+        os.utime(clock, None)
+        return os.path.getmtime(clock)
+
+    def _task_ids(self) -> list[str]:
+        try:
+            names = os.listdir(self.tasks_dir)
+        except OSError:
+            return []
+        return sorted(name[:-5] for name in names if name.endswith(".json"))
+
+    # ── Submitting ────────────────────────────────────────────────
+
+    def submit(
+        self,
+        pairs: list[tuple[str, str]],
+        name_pattern: str,
+        footer_pattern: str = "DOCUMENT NON APPLICABLE",
+        raster: bool = False,
+        verify: bool = False,
+    ) -> int:
+        """Add one task per ``(input_path, output_path)`` pair.
+
+        Task ids derive from the paths, so submitting the same files
+        twice does not queue them twice.
+
+        Returns:
+            Number of tasks added.
+        """
+        added = 0
+        for input_path, output_path in pairs:
+            input_path, output_path = os.path.abspath(input_path), os.path.abspath(output_path)
+            task_id = hashlib.sha1(f"{input_path}\0{output_path}".encode("utf-8")).hexdigest()[:20]
+            path = self._task_path(task_id)
+            if os.path.exists(path):
+                continue
+            _write_json(path, {
+                "input": input_path,
+                "output": output_path,
+                "name": name_pattern,
+                "footer": footer_pattern,
+                "raster": raster,
+                "verify": verify,
+                "submitted": time.time(),
+            })
+            added += 1
+        logger.info("Submitted %d task(s) to %s", added, self.root)
+        return added
+
+    # ── Claiming ──────────────────────────────────────────────────
+
+    def _try_lease(self, task_id: str) -> bool:
+        try:
+            fd = os.open(self._lease_path(task_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        token = uuid.uuid4().hex
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(
+                {"host": _HOST, "pid": os.getpid(), "claimed": time.time(), "token": token}, fh
+            )
+        with self._lock:
+            self._held[task_id] = token
+        return True
+
+    def _owns(self, task_id: str, token: str) -> bool:
+        """Whether the lease of *task_id* is still the one we created."""
+        return (_read_json(self._lease_path(task_id)) or {}).get("token") == token
+
+    def _lost(self, task_id: str) -> None:
+        with self._lock:
+            self._held.pop(task_id, None)
+            self.lease_conflicts += 1
+        logger.warning("Lease of task %s was taken over by another worker", task_id)
+
+    def _lease_expired(self, task_id: str, now: float) -> bool:
+        try:
+            return now - os.path.getmtime(self._lease_path(task_id)) > self.lease_seconds
+        except FileNotFoundError:
+            return False
+
+    def _break_lease(self, task_id: str) -> bool:
+        """Remove an expired lease; only one of several racing hosts wins."""
+        lease = self._lease_path(task_id)
+        stale = f"{lease}.expired-{_HOST}-{os.getpid()}"
+        try:
+            os.rename(lease, stale)
+        except OSError:
+            return False  # someone else got there first
+        try:
+            renewed = self._now() - os.path.getmtime(stale) <= self.lease_seconds
+        except OSError:
+            renewed = False
+        if renewed:
+            # Another host broke the lease and claimed the task between
+            # our expiry check and the rename: give the fresh lease back
+            try:
+                os.link(stale, lease)
+            except OSError as exc:
+                # A third host claimed the task meanwhile: the holder of
+                # the lease we renamed has lost it and will notice when
+                # renewing; two workers may now process the same file
+                holder = _read_json(stale) or {}
+                with self._lock:
+                    self.lease_conflicts += 1
+                logger.warning(
+                    "Could not give back the lease of task %s held by %s (pid %s): %s",
+                    task_id, holder.get("host", "?"), holder.get("pid", "?"), exc,
+                )
+            os.remove(stale)
+            return False
+        holder = _read_json(stale) or {}
+        logger.warning(
+            "Lease of task %s held by %s (pid %s) expired, taking it over",
+            task_id, holder.get("host", "?"), holder.get("pid", "?"),
+        )
+        os.remove(stale)
+        return True
+
+    def claim(self) -> Optional[Task]:
+        """Lease the next pending task, or one whose lease expired."""
+        now = None
+        for task_id in self._task_ids():
+            if task_id in self._finished:
+                continue
+            if os.path.exists(self._done_path(task_id)):
+                self._finished.add(task_id)
+                continue
+            if not self._try_lease(task_id):
+                if now is None:
+                    now = self._now()
+                if not (self._lease_expired(task_id, now) and self._break_lease(task_id)):
+                    continue
+                if not self._try_lease(task_id):
+                    continue
+            if os.path.exists(self._done_path(task_id)):
+                self.release(task_id)  # finished while we were claiming it
+                continue
+            data = _read_json(self._task_path(task_id))
+            if data is None:
+                self.release(task_id)
+                continue
+            return Task(task_id, data)
+        return None
+
+    def renew(self) -> None:
+        """Touch the leases this process still holds."""
+        with self._lock:
+            held = list(self._held.items())
+        for task_id, token in held:
+            if not self._owns(task_id, token):
+                self._lost(task_id)
+                continue
+            try:
+                os.utime(self._lease_path(task_id), None)
+            except FileNotFoundError:
+                self._lost(task_id)
+
+    def release(self, task_id: str) -> None:
+        """Drop our lease of *task_id* without reporting a result.
+
+        A lease that was taken over by another worker is left alone.
+        """
+        with self._lock:
+            token = self._held.pop(task_id, None)
+        if token is None:
+            return
+        lease = self._lease_path(task_id)
+        mine = f"{lease}.released-{_HOST}-{os.getpid()}-{token[:8]}"
+        try:
+            os.rename(lease, mine)
+        except FileNotFoundError:
+            return
+        if (_read_json(mine) or {}).get("token") == token:
+            os.remove(mine)
+            return
+        # Renamed someone else's lease: put it back
+        try:
+            os.link(mine, lease)
+        except OSError as exc:
+            logger.warning("Could not give back the lease of task %s: %s", task_id, exc)
+        os.remove(mine)
+        with self._lock:
+            self.lease_conflicts += 1
+        logger.warning("Lease of task %s was taken over by another worker", task_id)
+
+    # ── Reporting ─────────────────────────────────────────────────
+
+    def complete(self, task: Task, success: bool, seconds: float, **details) -> None:
+        """Record the result of *task* and release its lease."""
+        _write_json(self._done_path(task.task_id), {
+            "input": task.input_path,
+            "output": task.output_path,
+            "success": success,
+            "seconds": round(seconds, 4),
+            "host": _HOST,
+            "pid": os.getpid(),
+            "finished": time.time(),
+            **details,
+        })
+        self.release(task.task_id)
+
+    def status(self) -> QueueStatus:
+        """Count tasks by state."""
+        status = QueueStatus()
+        now = self._now()
+        for task_id in self._task_ids():
+            result = _read_json(self._done_path(task_id))
+            if result is not None:
+                if result.get("success"):
+                    status.succeeded += 1
+                else:
+                    status.failed.append((result.get("input", task_id), result.get("host", "?")))
+            elif not os.path.exists(self._lease_path(task_id)):
+                status.pending += 1
+            elif self._lease_expired(task_id, now):
+                status.expired += 1
+            else:
+                status.leased += 1
+        return status
+
+
+class QueueWorker:
+    """Headless engine processing the tasks of a :class:`SharedQueue`."""
+
+    def __init__(self, queue: SharedQueue, processor, workers: Optional[int] = None) -> None:
+        """Prepare a worker running *workers* files at a time with *processor*."""
+        from mechanisms.worker_pool import default_worker_count
+
+        self.queue = queue
+        self.processor = processor
+        self.workers = workers or default_worker_count()
+        self.processed = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._verifiers: dict = {}
+        self._scratch: Optional[ScratchSpace] = None
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            self.queue.renew()
+
+    def _verifier_for(self, task: Task):
+        from mechanisms.verification import OutputVerifier
+
+        key = (task.name_pattern, task.footer_pattern)
+        with self._lock:
+            verifier = self._verifiers.get(key)
+            if verifier is None:
+                verifier = self._verifiers[key] = OutputVerifier(*key)
+        return verifier
+
+    def _run_task(self, task: Task) -> None:
+        logger.info("Processing %s", task.input_path)
+        started = time.perf_counter()
+        verifier = self._verifier_for(task) if task.verify else None
+        try:
+            os.makedirs(os.path.dirname(task.output_path), exist_ok=True)
+            success = self.processor.remove_watermark_by_structure(
+                task.input_path, task.output_path, task.name_pattern,
+                task.footer_pattern, notify=False, verifier=verifier,
+                raster=task.raster, scratch=self._scratch,
+            )
+        except Exception as exc:  # keep the worker alive for other tasks
+            logger.error("Task %s failed: %s", task.task_id, exc, exc_info=True)
+            success = False
+        details = {}
+        if verifier is not None:
+            details["residual_pages"] = sorted(
+                {page for page, _ in verifier.failures.get(task.output_path, [])}
+            )
+        self.queue.complete(task, success, time.perf_counter() - started, **details)
+        with self._lock:
+            self.processed += 1
+
+    def _lane(self, wait: bool) -> None:
+        while not self._stop.is_set():
+            task = self.queue.claim()
+            if task is not None:
+                self._run_task(task)
+                continue
+            # Nothing claimable: leases held elsewhere may still expire
+            if not wait and self.queue.status().unfinished == 0:
+                return
+            self._stop.wait(IDLE_POLL)
+
+    def run(self, wait: bool = False) -> int:
+        """Process tasks until the queue is finished (or forever with *wait*).
+
+        Returns:
+            Number of tasks this worker completed.
+        """
+        heartbeat = threading.Thread(target=self._heartbeat, name="queue-heartbeat", daemon=True)
+        heartbeat.start()
+        # One scratch space for the whole run, shared by the lanes
+        self._scratch = ScratchSpace()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="queue-worker") as pool:
+                for future in [pool.submit(self._lane, wait) for _ in range(self.workers)]:
+                    future.result()
+        finally:
+            self._stop.set()
+            self._scratch.close()
+        logger.info(
+            "Worker %s finished %d task(s), %d lease conflict(s)",
+            _HOST, self.processed, self.queue.lease_conflicts,
+        )
+        return self.processed
+
+    def stop(self) -> None:
+        """Stop claiming tasks; files in progress finish."""
+        self._stop.set()
+
+
+def _folder_pairs(input_folder: str, output_folder: str) -> list[tuple[str, str]]:
+    return [
+        (os.path.join(input_folder, name), os.path.join(output_folder, name))
+        for name in sorted(os.listdir(input_folder))
+        if name.lower().endswith(".pdf")
+    ]
+
+
+def main(argv: list[str]) -> int:
+    """Command-line entry point (``submit``, ``work`` and ``status``)."""
+    parser = argparse.ArgumentParser(
+        prog="python -m mechanisms.shared_queue",
+        description="File d'attente partagée pour le traitement sur plusieurs machines.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="ajouter les PDF d'un dossier")
+    submit.add_argument("queue")
+    submit.add_argument("input_folder")
+    submit.add_argument("output_folder")
+    submit.add_argument("--name", default="", help="motif du filigrane nominatif")
+    submit.add_argument("--footer", default="DOCUMENT NON APPLICABLE")
+    submit.add_argument("--raster", action="store_true", help="documents numérisés")
+    submit.add_argument("--verify", action="store_true", help="vérifier les sorties")
+
+    work = commands.add_parser("work", help="traiter les fichiers de la file")
+    work.add_argument("queue")
+    work.add_argument("--workers", type=int, default=None)
+    work.add_argument("--lease", type=float, default=LEASE_SECONDS, help="durée du bail (s)")
+    work.add_argument("--wait", action="store_true", help="attendre de nouveaux fichiers")
+    work.add_argument("--no-stamp", action="store_true", help="sans mention d'identification")
+    work.add_argument("--mmap", action="store_true", help="lire les fichiers en mémoire mappée")
+    work.add_argument(
+        "--object-streams", action="store_true", help="compresser la structure des sorties"
+    )
+    work.add_argument("--linearize", action="store_true", help="sorties linéarisées")
+
+    status = commands.add_parser("status", help="état de la file")
+    status.add_argument("queue")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+    if args.command == "submit":
+        queue = SharedQueue(args.queue)
+        added = queue.submit(
+            _folder_pairs(args.input_folder, args.output_folder),
+            args.name, args.footer, raster=args.raster, verify=args.verify,
+        )
+        print(f"{added} fichier(s) ajouté(s) à {args.queue}")
+        return 0
+
+    if args.command == "work":
+        from mechanisms.watermark_processor import WatermarkProcessor
+
+        queue = SharedQueue(args.queue, lease_seconds=args.lease)
+        processor = WatermarkProcessor(
+            stamp_enabled=not args.no_stamp, mmap_input=args.mmap,
+            object_streams=args.object_streams, linearize=args.linearize,
+        )
+        done = QueueWorker(queue, processor, args.workers).run(wait=args.wait)
+        print(f"{done} fichier(s) traité(s) par {_HOST} (pid {os.getpid()})")
+        return 0
+
+    result = SharedQueue(args.queue).status()
+    print(result.summary())
+    for input_path, host in result.failed:
+        print(f"  erreur : {input_path} ({host})")
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,141 @@
+"""
+Identification Stamp Module.
+
+Adds the small "Traité par …" mention to processed documents.  The text
+is drawn once into a single Form XObject (with one shared font object),
+and every page only gains a reference to it plus two shared one-line
+content streams around its own, so stamping cost and output growth are
+nearly constant per page instead of one font resource and one text
+stream per page.
+"""
+
+import logging
+import time
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger("watermark_app.stamp")
+
+DEFAULT_STAMP_TEXT = "Traité par Supprimer Filigrane PDF - ID:{id}"
+STAMP_NAME = "FiligraneStamp"
+FONT_SIZE = 4
+GREY = 0.9
+# Top-left anchor of the text baseline, in PyMuPDF (top-down) coordinates
+ANCHOR = fitz.Point(5, 5)
+
+
+def _pdf_string(text: str) -> bytes:
+    """Encode *text* as a PDF literal string for a WinAnsi-encoded font."""
+    raw = text.encode("cp1252", errors="replace")
+    raw = raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+    return b"(" + raw + b")"
+
+
+def _ref(xref: int) -> str:
+    return f"{xref} 0 R"
+
+
+def _set_key(doc: "fitz.Document", xref: int, keys: list[str], value: str) -> None:
+    """``xref_set_key`` along *keys*, following indirect dictionaries.
+
+    PyMuPDF refuses paths that cross indirect objects, but page resources
+    and their XObject dictionaries are very often indirect (and shared).
+    """
+    for depth in range(1, len(keys)):
+        kind, val = doc.xref_get_key(xref, "/".join(keys[:depth]))
+        if kind == "xref":
+            _set_key(doc, int(val.split()[0]), keys[depth:], value)
+            return
+        if kind != "dict":
+            break  # missing: xref_set_key creates the rest inline
+    doc.xref_set_key(xref, "/".join(keys), value)
+
+
+def _resources_owner(doc: "fitz.Document", page: "fitz.Page") -> int:
+    """Object holding the page's resources, following /Parent inheritance."""
+    node = page.xref
+    while node:
+        if doc.xref_get_key(node, "Resources")[0] != "null":
+            return node
+        kind, val = doc.xref_get_key(node, "Parent")
+        node = int(val.split()[0]) if kind == "xref" else 0
+    return page.xref
+
+
+class IdentificationStamp:
+    """Stamps every page of a document with one shared Form XObject."""
+
+    def __init__(self, text: str = DEFAULT_STAMP_TEXT) -> None:
+        """Prepare the stamp; ``{id}`` in *text* becomes a Unix timestamp."""
+        self.text = text
+
+    def render_text(self) -> str:
+        return self.text.replace("{id}", str(int(time.time())))
+
+    def apply(self, doc: "fitz.Document") -> int:
+        """Add the stamp to every page of *doc*.
+
+        The stamp is drawn last, over the page content, so opaque pages
+        (scans, filled backgrounds) do not hide it.  The existing content
+        is wrapped between a shared ``q`` stream and a shared ``Q``
+        placement stream, so the stamp starts from the default graphics
+        state whatever the content leaves behind.
+
+        Returns:
+            Number of pages stamped.
+        """
+        text = self.render_text()
+        if not text or not len(doc):
+            return 0
+
+        font = doc.get_new_xref()
+        doc.update_object(
+            font,
+            "<</Type/Font/Subtype/Type1/BaseFont/Helvetica/Encoding/WinAnsiEncoding>>",
+        )
+        width = fitz.get_text_length(text, fontname="helv", fontsize=FONT_SIZE)
+        form = doc.get_new_xref()
+        doc.update_object(
+            form,
+            # Padded: MuPDF drops glyphs that touch the edge of the BBox
+            f"<</Type/XObject/Subtype/Form/BBox[-1 -2 {width + 1:.2f} {FONT_SIZE + 1}]"
+            f"/Resources<</Font<</F1 {_ref(font)}>>>>>>",
+        )
+        doc.update_stream(
+            form,
+            b"BT /F1 %d Tf %.2f g 0 0 Td " % (FONT_SIZE, GREY) + _pdf_string(text) + b" Tj ET",
+        )
+
+        save = doc.get_new_xref()
+        doc.update_object(save, "<<>>")
+        doc.update_stream(save, b"q\n")
+
+        # One placement stream per distinct page geometry, shared by pages
+        placements: dict[tuple[float, float], int] = {}
+        for page in doc:
+            origin = ANCHOR * ~page.transformation_matrix
+            key = (round(origin.x, 2), round(origin.y, 2))
+            stream = placements.get(key)
+            if stream is None:
+                stream = doc.get_new_xref()
+                doc.update_object(stream, "<<>>")
+                doc.update_stream(
+                    stream,
+                    b"\nQ q 1 0 0 1 %.2f %.2f cm /%s Do Q\n" % (key[0], key[1], STAMP_NAME.encode()),
+                )
+                placements[key] = stream
+
+            _set_key(
+                doc, _resources_owner(doc, page),
+                ["Resources", "XObject", STAMP_NAME], _ref(form),
+            )
+            kind, val = doc.xref_get_key(page.xref, "Contents")
+            if kind == "array":
+                contents = f"[{_ref(save)} {val.strip()[1:-1]} {_ref(stream)}]"
+            elif kind == "xref":
+                contents = f"[{_ref(save)} {val} {_ref(stream)}]"
+            else:
+                contents = f"[{_ref(save)} {_ref(stream)}]"
+            doc.xref_set_key(page.xref, "Contents", contents)
+
+        return len(doc)
@@ -0,0 +1,221 @@
+"""
+Telemetry Module.
+
+Opt-in structured log and metrics sink for production runs.  When
+enabled, every record of the ``watermark_app`` loggers is written as one
+JSON object per line, and the engine adds one ``file`` record per
+processed document (duration, pages, bytes in/out, rule hits) and one
+``batch`` record per batch.
+
+Records are handed to a :class:`logging.handlers.QueueHandler`, and a
+background listener thread does the formatting and disk writes, so
+worker threads never block on I/O.  Telemetry is off by default: the
+application keeps writing nothing to disk unless a path is given, either
+through the ``WATERMARK_TELEMETRY`` environment variable or from the menu.
+Watermark patterns (personal names) are never recorded.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger("watermark_app.telemetry")
+metrics_logger = logging.getLogger("watermark_app.metrics")
+
+TELEMETRY_ENV = "WATERMARK_TELEMETRY"
+ROOT_LOGGER = "watermark_app"
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats a record as a single-line JSON object."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TelemetrySink:
+    """A JSON-lines file fed through a queue by a background listener."""
+
+    def __init__(self, path: str, level: int = logging.INFO) -> None:
+        """Open *path* for appending and start the listener thread."""
+        self.path = path
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        file_handler = logging.FileHandler(path, encoding="utf-8")
+        file_handler.setFormatter(JsonLinesFormatter())
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.handler = logging.handlers.QueueHandler(self._queue)
+        self.handler.setLevel(level)
+        self._file_handler = file_handler
+        self._listener = logging.handlers.QueueListener(self._queue, file_handler)
+        self._listener.start()
+
+    def close(self) -> None:
+        """Flush pending records and stop the listener."""
+        self._listener.stop()
+        self._file_handler.close()
+
+
+_sink: Optional[TelemetrySink] = None
+_sink_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    """Whether a telemetry sink is currently installed."""
+    return _sink is not None
+
+
+def telemetry_path() -> Optional[str]:
+    """Path of the active sink, if any."""
+    return _sink.path if _sink is not None else None
+
+
+def enable_telemetry(path: str, level: int = logging.INFO) -> TelemetrySink:
+    """Start writing ``watermark_app`` records to *path* (replaces any sink)."""
+    global _sink
+    sink = TelemetrySink(path, level)
+    with _sink_lock:
+        previous, _sink = _sink, sink
+        logging.getLogger(ROOT_LOGGER).addHandler(sink.handler)
+    if previous is not None:
+        logging.getLogger(ROOT_LOGGER).removeHandler(previous.handler)
+        previous.close()
+    logger.info("Telemetry enabled", extra={"event": "telemetry", "path": path})
+    return sink
+
+
+@atexit.register
+def disable_telemetry() -> None:
+    """Stop the sink, if any, after flushing its pending records."""
+    global _sink
+    with _sink_lock:
+        sink, _sink = _sink, None
+    if sink is not None:
+        logging.getLogger(ROOT_LOGGER).removeHandler(sink.handler)
+        sink.close()
+
+
+def enable_from_environment() -> Optional[TelemetrySink]:
+    """Enable telemetry when ``WATERMARK_TELEMETRY`` names a file.
+
+    Does nothing in child processes (isolated workers, shards): they
+    inherit the variable and re-run the entry point, but their files are
+    recorded once, by the process that dispatched them.
+    """
+    path = os.environ.get(TELEMETRY_ENV, "").strip()
+    # A spawned child imports the entry point before its bootstrap, when
+    # only its name tells it apart from the application process
+    if not path or multiprocessing.current_process().name != "MainProcess":
+        return None
+    try:
+        return enable_telemetry(path)
+    except OSError as exc:
+        logger.warning("Cannot open telemetry file %s: %s", path, exc)
+        return None
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def record_file(
+    input_path: str,
+    output_path: str,
+    started: float,
+    success: bool,
+    report=None,
+    bytes_out: Optional[int] = None,
+    mode: str = "file",
+) -> None:
+    """Emit the ``file`` metrics record for one document.
+
+    Does nothing (and measures nothing) when telemetry is disabled.
+
+    Args:
+        started: ``time.perf_counter()`` value taken when the file started.
+        report: The engine's ``DocumentReport``, when the rules ran.
+        bytes_out: Output size; read from *output_path* when omitted.
+        mode: ``"file"``, ``"pipeline"`` or ``"isolated"``.
+    """
+    if _sink is None:
+        return
+    fields = {
+        "event": "file",
+        "mode": mode,
+        "file": os.path.basename(input_path),
+        "success": success,
+        "seconds": round(time.perf_counter() - started, 4),
+        "bytes_in": _size(input_path),
+        "bytes_out": (bytes_out if bytes_out is not None else _size(output_path)) if success else 0,
+    }
+    if report is not None:
+        fields["pages"] = report.page_count
+        fields["pages_modified"] = len(report.modified_pages)
+        fields["rule_hits"] = dict(report.rule_hits)
+        if report.classification is not None:
+            fields["pages_selected"] = len(report.classification.selected)
+    metrics_logger.info("File processed", extra=fields)
+
+
+def record_batch(result, workers: int, mode: str) -> None:
+    """Emit the ``batch`` metrics record for a finished ``BatchResult``."""
+    if _sink is None:
+        return
+    fields = {
+        "event": "batch",
+        "mode": mode,
+        "workers": workers,
+        "files": result.total,
+        "succeeded": len(result.succeeded),
+        "failed": len(result.failed),
+        "cancelled": result.cancelled,
+        "seconds": round(result.elapsed, 4),
+    }
+    if result.metrics is not None:
+        fields["stages"] = {
+            stage.name: {
+                "busy": round(stage.busy_seconds, 4),
+                "wait": round(stage.wait_seconds, 4),
+                "bytes": stage.bytes,
+            }
+            for stage in result.metrics.stages
+        }
+    if result.dedup is not None:
+        fields["duplicates"] = result.dedup.duplicates
+    if result.schedule is not None:
+        fields["efficiency"] = round(result.schedule.efficiency, 3)
+        fields["utilisation"] = round(result.schedule.utilisation, 3)
+        fields["makespan_lower_bound"] = round(result.schedule.lower_bound, 4)
+    if result.verification is not None:
+        fields["unverified"] = len(result.verification.failures)
+    if result.concurrency is not None:
+        fields["adjustments"] = len(result.concurrency.adjustments)
+        fields["final_limit"] = result.concurrency.limit
+    if result.quarantine is not None:
+        fields["quarantined"] = len(result.quarantine.entries)
+    metrics_logger.info("Batch finished", extra=fields)
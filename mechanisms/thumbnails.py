@@ -0,0 +1,186 @@
+"""
+Thumbnail Rendering Module.
+
+Renders low-resolution page images for the before / after preview.
+Pages are rendered on demand by a single background thread, most recent
+request first, so the pages currently on screen are always served
+before the ones the user already scrolled past.  Rendered pages are kept
+as PNG bytes in an LRU cache bounded by memory.  A few documents stay
+open while requests keep coming and are closed as soon as the queue is
+empty, so the preview never holds a file that a job wants to replace.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger("watermark_app.thumbnails")
+
+THUMBNAIL_DPI = 40
+CACHE_BYTES = 64 * 1024 * 1024
+OPEN_DOCUMENTS = 4
+MAX_PENDING = 64
+
+# (path, modification time, page number, dpi)
+ThumbnailKey = tuple[str, int, int, int]
+
+
+def thumbnail_key(path: str, page_num: int, dpi: int = THUMBNAIL_DPI) -> ThumbnailKey:
+    """Cache key of a page; a rewritten file gets new keys."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = 0
+    return (os.path.abspath(path), mtime, page_num, dpi)
+
+
+class RenderCache:
+    """Thread-safe LRU cache of rendered pages, bounded by their total size."""
+
+    def __init__(self, max_bytes: int = CACHE_BYTES) -> None:
+        """Create an empty cache holding at most *max_bytes* of images."""
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[ThumbnailKey, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: ThumbnailKey) -> Optional[bytes]:
+        """Cached image for *key*, marked as most recently used."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: ThumbnailKey, data: bytes) -> None:
+        """Store *data*, evicting least recently used images to make room."""
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class ThumbnailRenderer:
+    """Background renderer feeding a :class:`RenderCache`.
+
+    *on_ready* is called with ``(key, png_bytes)`` from the rendering
+    thread; UI callers must marshal it back to the Tk main loop.
+    """
+
+    def __init__(
+        self,
+        on_ready: Callable[[ThumbnailKey, bytes], None],
+        cache: Optional[RenderCache] = None,
+    ) -> None:
+        """Start the rendering thread."""
+        self.on_ready = on_ready
+        self.cache = cache or RenderCache()
+        self._pending: "OrderedDict[ThumbnailKey, None]" = OrderedDict()
+        self._documents: "OrderedDict[str, fitz.Document]" = OrderedDict()
+        self._condition = threading.Condition()  # guards the pending requests
+        self._doc_lock = threading.Lock()  # guards the open documents
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="watermark-thumbnails", daemon=True
+        )
+        self._thread.start()
+
+    def request(self, key: ThumbnailKey) -> Optional[bytes]:
+        """Cached image for *key*, or None after queueing it for rendering."""
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        with self._condition:
+            self._pending.pop(key, None)
+            self._pending[key] = None  # newest request served first
+            while len(self._pending) > MAX_PENDING:
+                self._pending.popitem(last=False)  # long scrolled past
+            self._condition.notify()
+        return None
+
+    @staticmethod
+    def document_info(path: str) -> tuple[int, float, float]:
+        """Page count of *path* and size of its first page, in points.
+
+        Returns ``(0, 0, 0)`` when the document cannot be opened.
+        """
+        try:
+            with fitz.open(path) as doc:
+                if not len(doc):
+                    return 0, 0.0, 0.0
+                rect = doc[0].rect
+                return len(doc), rect.width, rect.height
+        except Exception as exc:
+            logger.warning("Cannot open %s for preview: %s", path, exc)
+            return 0, 0.0, 0.0
+
+    def close(self) -> None:
+        """Stop the thread and close the open documents."""
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify()
+        self._thread.join(timeout=2)
+        self._close_documents()
+
+    def _close_documents(self) -> None:
+        with self._doc_lock:
+            for doc in self._documents.values():
+                doc.close()
+            self._documents.clear()
+
+    def _document(self, path: str) -> "fitz.Document":
+        # Called with the document lock held
+        doc = self._documents.pop(path, None)
+        if doc is None:
+            doc = fitz.open(path)
+        self._documents[path] = doc
+        while len(self._documents) > OPEN_DOCUMENTS:
+            _, oldest = self._documents.popitem(last=False)
+            oldest.close()
+        return doc
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                idle = not self._pending
+            if idle:
+                self._close_documents()
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                key, _ = self._pending.popitem(last=True)
+            path, _, page_num, dpi = key
+            try:
+                with self._doc_lock:
+                    doc = self._document(path)
+                    if page_num >= len(doc):
+                        continue
+                    data = doc[page_num].get_pixmap(dpi=dpi).tobytes("png")
+            except Exception as exc:
+                logger.warning("Cannot render page %d of %s: %s", page_num, path, exc)
+                continue
+            self.cache.put(key, data)
+            try:
+                self.on_ready(key, data)
+            except Exception as exc:
+                logger.warning("Thumbnail callback failed: %s", exc)
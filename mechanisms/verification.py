@@ -0,0 +1,201 @@
+"""
+Output Verification Module.
+
+Optional QA stage run after an output is written: only the pages the
+engine actually modified are re-opened and their extracted text is
+searched for the original watermark patterns.  Results are cached per
+page fingerprint — the content stream together with every resource it
+can draw (Form XObjects, fonts, nested resources) — so identical pages
+(a watermark template repeated on every page, or across copies of a
+document) are checked only once, while pages that share a content
+stream such as ``/fzFrm0 Do`` but draw different forms are not.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger("watermark_app.verification")
+
+DATE_WATERMARK_TEXT = "Document non tenu"
+
+_REFERENCE = re.compile(rb"(\d+) 0 R")
+_PARENT = re.compile(rb"/(?:Parent|P)\s+\d+ 0 R")
+
+
+def _inherited_resources(doc: "fitz.Document", xref: int) -> bytes:
+    """Source of the ``/Resources`` entry of page *xref*, inherited if needed."""
+    seen = set()
+    while xref and xref not in seen:
+        seen.add(xref)
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind != "null":
+            return value.encode("latin-1")
+        kind, value = doc.xref_get_key(xref, "Parent")
+        xref = int(value.split()[0]) if kind == "xref" else 0
+    return b""
+
+
+def _object_digest(
+    doc: "fitz.Document", xref: int, digests: dict[int, bytes], active: set[int]
+) -> bytes:
+    """Digest of object *xref* with its references replaced by their digests."""
+    if xref in digests:
+        return digests[xref]
+    if xref in active or not 0 < xref < doc.xref_length():
+        return b"-"  # reference cycle or dangling reference
+    active.add(xref)
+    source = doc.xref_object(xref, compressed=True).encode("latin-1")
+    digest = hashlib.sha1(_resolve(doc, source, digests, active))
+    if doc.xref_is_stream(xref) and b"/Image" not in source:
+        digest.update(doc.xref_stream_raw(xref) or b"")
+    active.discard(xref)
+    digests[xref] = digest.digest()
+    return digests[xref]
+
+
+def _resolve(
+    doc: "fitz.Document", source: bytes, digests: dict[int, bytes], active: set[int]
+) -> bytes:
+    # Never climb back into the page tree
+    source = _PARENT.sub(b"", source)
+    return _REFERENCE.sub(
+        lambda ref: _object_digest(doc, int(ref.group(1)), digests, active).hex().encode(),
+        source,
+    )
+
+
+def page_fingerprint(
+    doc: "fitz.Document", page: "fitz.Page", digests: dict[int, bytes]
+) -> bytes:
+    """Digest of everything the text of *page* depends on.
+
+    Covers the page's content streams and, recursively, every object its
+    resources reference: dictionaries by their source, Form XObjects,
+    font programs and CMaps by their raw stream as well (image streams
+    are left out, they hold no text).  References are replaced by the
+    digest of their target, so identical pages match whatever their
+    object numbers, also across documents.  *digests* memoises the
+    objects of *doc*, each one is read once however many pages use it.
+    """
+    digest = hashlib.sha1(page.read_contents())
+    digest.update(b"\0")
+    digest.update(_resolve(doc, _inherited_resources(doc, page.xref), digests, set()))
+    return digest.digest()
+
+
+class OutputVerifier:
+    """Checks written outputs for residual watermark text.
+
+    One instance is shared by every worker of a batch; it is thread-safe
+    and accumulates the failures that end up in the batch summary.
+    """
+
+    def __init__(self, name_pattern: str, footer_pattern: str) -> None:
+        """Prepare the patterns that must no longer appear in the output."""
+        self.patterns = self.patterns_for(name_pattern, footer_pattern)
+        self.failures: dict[str, list[tuple[int, str]]] = {}
+        self.pages_checked = 0
+        self.cache_hits = 0
+        self.seconds = 0.0
+        self._cache: dict[tuple[bytes, tuple[str, ...]], tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def patterns_for(name_pattern: str, footer_pattern: str) -> tuple[str, ...]:
+        """Texts that must be gone from an output cleaned with these patterns."""
+        return tuple(
+            pattern
+            for pattern in (name_pattern, footer_pattern, DATE_WATERMARK_TEXT)
+            if pattern
+        )
+
+    def verify(
+        self,
+        output_path: str,
+        pages: list[int],
+        patterns: Optional[tuple[str, ...]] = None,
+    ) -> list[tuple[int, str]]:
+        """Re-scan *pages* of *output_path* for residual patterns.
+
+        *patterns* overrides the verifier's own for files of a manifest
+        processed with other parameters (see :meth:`patterns_for`).
+
+        Returns:
+            ``(page_number, pattern)`` for every pattern still present;
+            an empty list means the output is clean.
+        """
+        started = time.perf_counter()
+        found: list[tuple[int, str]] = []
+        checked = hits = 0
+
+        patterns = self.patterns if patterns is None else patterns
+        if pages and patterns:
+            doc = fitz.open(output_path)
+            digests: dict[int, bytes] = {}
+            try:
+                for page_num in pages:
+                    if page_num >= len(doc):
+                        continue
+                    page = doc[page_num]
+                    key = (page_fingerprint(doc, page, digests), patterns)
+                    with self._lock:
+                        residual = self._cache.get(key)
+                    if residual is None:
+                        text = page.get_text()
+                        residual = tuple(p for p in patterns if p in text)
+                        with self._lock:
+                            self._cache[key] = residual
+                        checked += 1
+                    else:
+                        hits += 1
+                    found.extend((page_num + 1, pattern) for pattern in residual)
+            finally:
+                doc.close()
+
+        self.record(output_path, found, checked, hits, time.perf_counter() - started)
+        return found
+
+    def record(
+        self,
+        output_path: str,
+        found: list[tuple[int, str]],
+        checked: int = 0,
+        hits: int = 0,
+        seconds: float = 0.0,
+    ) -> None:
+        """Account for a verification of *output_path* done elsewhere.
+
+        Used by :meth:`verify` and for outputs verified inside an
+        isolated worker process.
+        """
+        with self._lock:
+            self.pages_checked += checked
+            self.cache_hits += hits
+            self.seconds += seconds
+            if found:
+                self.failures[output_path] = found
+
+        if found:
+            # Page numbers only: patterns are personal names and must not
+            # end up in the telemetry log
+            logger.warning(
+                "Verification failed for %s on page(s) %s", output_path,
+                ", ".join(str(page) for page in sorted({page for page, _ in found})[:10]),
+            )
+
+    def summary(self) -> str:
+        """One-line human-readable summary."""
+        status = (
+            f"{len(self.failures)} fichier(s) avec filigrane résiduel"
+            if self.failures else "aucun filigrane résiduel"
+        )
+        return (
+            f"Vérification : {status} ({self.pages_checked} page(s) analysée(s), "
+            f"{self.cache_hits} en cache, {self.seconds:.2f}s)."
+        )
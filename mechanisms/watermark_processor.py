@@ -5,20 +5,234 @@ Handles all PDF-related operations including watermark detection
 and removal across single files and batch folder processing.
 """
 
+import copy
 import logging
+import multiprocessing
 import os
-import shutil
-import tempfile
+import threading
 import time
-from typing import Optional
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
 
 import fitz  # PyMuPDF
 from tkinter import messagebox
 
+from mechanisms import manifest, profiling, telemetry
+from mechanisms.cancellation import CancellationToken, ProcessingCancelled
+from mechanisms.concurrency import AdaptiveLimiter, max_concurrency
+from mechanisms.dedup import DedupStats, find_duplicates, materialize_duplicates
+from mechanisms.document_io import open_document, save_document
+from mechanisms.edit_list import EditList
+from mechanisms.isolation import IsolatedRunner, IsolationLimits, Quarantine
+from mechanisms.manifest import ManifestEntry
+from mechanisms.page_classifier import (
+    DATE_WATERMARK, HEX_PATTERNS, RED_MARKERS, PageClassification, classify_pages,
+)
+from mechanisms.pipeline import PipelineMetrics, run_pipeline
+from mechanisms.raster_cleaner import clean_raster_pages
+from mechanisms.scheduling import ScheduleStats, clean_sharded, largest_first
+from mechanisms.scratch import ScratchSpace
+from mechanisms.stamp import DEFAULT_STAMP_TEXT, IdentificationStamp
+from mechanisms.verification import OutputVerifier
+from mechanisms.worker_pool import WorkerPool, default_worker_count
+
 logger = logging.getLogger("watermark_app.processor")
 
+
+def _occurrences(content: bytes, needle: bytes) -> list[int]:
+    """Offsets of the non-overlapping occurrences of *needle* in *content*."""
+    found = []
+    pos = content.find(needle)
+    while pos != -1:
+        found.append(pos)
+        pos = content.find(needle, pos + len(needle))
+    return found
+
+
+def clean_stream(
+    content: bytes, name_bytes: bytes, footer_bytes: bytes, report: "DocumentReport"
+) -> Optional[bytes]:
+    """Apply every watermark rule to one content stream.
+
+    Rule hits and timings are added to *report*.  Pure function of the
+    stream bytes, so it can run in any process.
+
+    Returns:
+        The cleaned stream, or None when no rule fired.
+    """
+    # Every rule records its hits against the original bytes;
+    # the stream is rebuilt once when all rules have run
+    edits = EditList()
+    rule_started = time.perf_counter()
+
+    # 1. Handle named watermark (diagonal red text)
+    if name_bytes:
+        hits = _occurrences(content, name_bytes)
+        for pos in hits:
+            edits.add(pos, pos + len(name_bytes))
+        report.rule_hits["name"] += len(hits)
+    rule_started = report.time_rule("name", rule_started)
+        
+    # 2. Handle footer text (blue text at bottom)
+    if footer_bytes:
+        hits = _occurrences(content, footer_bytes)
+        for pos in hits:
+            edits.add(pos, pos + len(footer_bytes))
+        report.rule_hits["footer"] += len(hits)
+    rule_started = report.time_rule("footer", rule_started)
+        
+    # 3. Special handling for the date watermark with both approaches
+        
+    # First approach: Direct text matching with flexible end
+    # detection, for every occurrence of the text
+    for start_pos in _occurrences(content, DATE_WATERMARK):
+        # Look for ending markers (Tj or ET)
+        end_markers = [b"Tj", b"ET", b"TD", b")"]
+        for marker in end_markers:
+            end_pos = content.find(marker, start_pos + 10)
+            if end_pos > 0:
+                # Find the opening parenthesis before this sequence
+                open_paren = content.rfind(b"(", 0, start_pos + 15)
+                if open_paren > 0:
+                    # Replace the section with empty content
+                    # (preserving structure)
+                    section_end = end_pos + len(marker)
+                    section = content[open_paren:section_end]
+                    if b"(" in section and b")" in section:
+                        edits.add(open_paren, section_end, b"()")
+                        report.rule_hits["date"] += 1
+                        break
+        
+    rule_started = report.time_rule("date", rule_started)
+
+    # Second approach: Byte pattern matching (hex encoded text)
+    for pattern in HEX_PATTERNS:
+        # Find all occurrences of this pattern
+        start_idx = content.find(pattern)
+        while start_idx != -1:
+            # Find the nearest opening parenthesis before this
+            open_idx = max(0, start_idx - 100)
+            window_end = min(len(content), start_idx + 200)
+                
+            # Check if we have a parenthesis sequence
+            open_paren_pos = content.rfind(b"(", open_idx, min(open_idx + 100, window_end))
+            if open_paren_pos >= 0:
+                # Find the corresponding closing parenthesis
+                close_paren_pos = content.find(b")", open_paren_pos, window_end)
+                if close_paren_pos > open_paren_pos:
+                    edits.add(open_paren_pos, close_paren_pos + 1, b"()")
+                    report.rule_hits["hex"] += 1
+                
+            # Move forward to avoid endless loop
+            start_idx = content.find(pattern, start_idx + 10)
+    rule_started = report.time_rule("hex", rule_started)
+        
+    # 4. Handle red text (diagonal watermark) by color markers
+    red_pos = max(content.find(marker) for marker in RED_MARKERS)
+    if red_pos > 0:
+        # Find next text operator (BT...ET sequence)
+        bt_pos = content.find(b"BT", max(0, red_pos - 50))
+        et_pos = content.find(b"ET", red_pos)
+            
+        if bt_pos > 0 and et_pos > bt_pos:
+            # Replace the entire text block with empty BT/ET
+            edits.add(bt_pos, et_pos + 2, b"BT ET")
+            report.rule_hits["red"] += 1
+    rule_started = report.time_rule("red", rule_started)
+
+    if not edits:
+        return None
+    cleaned = edits.apply(content)
+    report.time_rule("rewrite", rule_started)
+    return cleaned
+
+
 class WatermarkProcessor:
     """Handles PDF watermark removal functionality."""
+
+    def __init__(
+        self,
+        classify_pages: bool = True,
+        stamp_enabled: bool = True,
+        stamp_text: str = DEFAULT_STAMP_TEXT,
+        profile_patterns: Optional[list[str]] = None,
+        worker_pool: Optional[WorkerPool] = None,
+        isolation_limits: Optional[IsolationLimits] = None,
+        shard_min_pages: int = 0,
+        mmap_input: bool = False,
+        object_streams: bool = False,
+        linearize: bool = False,
+    ) -> None:
+        """Configure engine-wide options.
+
+        Args:
+            classify_pages: Run the NumPy pre-pass that skips pages no
+                rule can modify (no effect when NumPy is missing).
+            stamp_enabled: Add the identification mention to every page.
+            stamp_text: Text of the mention; ``{id}`` becomes a timestamp.
+            profile_patterns: File name patterns (``fnmatch``) of the
+                documents to process under cProfile and tracemalloc;
+                reports are written next to their outputs.
+            worker_pool: Long-lived pool that runs the files of every
+                batch; without one, each batch starts its own threads.
+            isolation_limits: Time and memory limits of the isolated
+                batch mode; the defaults of :class:`IsolationLimits`
+                when omitted.
+            shard_min_pages: Documents opened from a file with at least
+                this many pages to clean are split across processes
+                (``0`` disables sharding).
+            mmap_input: Open inputs through a read-only memory mapping
+                instead of reading them from their path (large files,
+                network mounts).  The pipelined mode reads whole files
+                anyway and ignores it.
+            object_streams: Pack the objects of outputs into compressed
+                object streams (smaller files).
+            linearize: Save outputs linearised ("fast web view") when
+                MuPDF supports it.
+        """
+        self.classify_pages = classify_pages
+        self.stamp_enabled = stamp_enabled
+        self.stamp_text = stamp_text
+        self.profile_patterns = profile_patterns
+        self.worker_pool = worker_pool
+        self.isolation_limits = isolation_limits or IsolationLimits()
+        self.shard_min_pages = shard_min_pages
+        self.mmap_input = mmap_input
+        self.object_streams = object_streams
+        self.linearize = linearize
+
+    def engine_settings(self) -> dict:
+        """Keyword arguments recreating this engine in another process."""
+        return {
+            "classify_pages": self.classify_pages,
+            "stamp_enabled": self.stamp_enabled,
+            "stamp_text": self.stamp_text,
+            "profile_patterns": self.profile_patterns,
+            "shard_min_pages": self.shard_min_pages,
+            "mmap_input": self.mmap_input,
+            "object_streams": self.object_streams,
+            "linearize": self.linearize,
+        }
+
+    def configured(self, **settings) -> "WatermarkProcessor":
+        """Copy of this engine with some options replaced, for one job.
+
+        Jobs carry the stamp and I/O options chosen when they were
+        submitted; running them on a copy keeps a queued or running job
+        from seeing options changed afterwards.  The copy shares the
+        worker pool and the isolation limits.
+
+        Raises:
+            TypeError: If a setting is not an option of the engine.
+        """
+        unknown = sorted(set(settings) - set(self.engine_settings()))
+        if unknown:
+            raise TypeError(f"Unknown engine setting(s): {', '.join(unknown)}")
+        engine = copy.copy(self)
+        for name, value in settings.items():
+            setattr(engine, name, value)
+        return engine
     
     def remove_watermark_by_structure(
         self,
@@ -27,6 +241,12 @@ class WatermarkProcessor:
         name_pattern: str,
         footer_pattern: str = "DOCUMENT NON APPLICABLE",
         progress_var: Optional["tk.IntVar"] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        notify: bool = True,
+        verifier: Optional[OutputVerifier] = None,
+        raster: bool = False,
+        scratch: Optional[ScratchSpace] = None,
+        heartbeat: Optional[Callable[[str], None]] = None,
     ) -> bool:
         """Remove watermarks from a single PDF by analysing its content streams.
 
@@ -36,171 +256,318 @@ class WatermarkProcessor:
             name_pattern: Name text to search for in diagonal (red) watermarks.
             footer_pattern: Footer text to remove (blue watermark).
             progress_var: Optional Tkinter IntVar updated with 0-100 progress.
+            cancel_token: Optional token polled before each page; when
+                cancelled, nothing is written and the temp file is removed.
+            notify: Show error dialogs on failure; batch runs pass False
+                and report failures once in their summary instead.
+            verifier: When given, the modified pages of the written output
+                are re-scanned for the patterns; residual watermarks are
+                recorded on the verifier (the file still counts as written).
+            raster: Also clean red/blue watermark pixels out of embedded
+                page images (scanned documents).
+            scratch: Scratch space of the calling job; a private one is
+                used (and removed) when omitted.
+            heartbeat: Called with the name of each phase as it starts,
+                and again for every page or image of the phases that
+                loop over them (see :meth:`process_document`), so a
+                supervisor can tell a long phase from a stuck one.
 
         Returns:
-            True on success, False on failure.
+            True on success, False on failure or cancellation.
         """
-        """Remove watermarks by analyzing the PDF structure."""
+        # Work on a unique file in a scratch directory next to the output,
+        # so concurrent jobs never collide and the final move is atomic
+        own_scratch = scratch is None
+        if own_scratch:
+            scratch = ScratchSpace()
+        src_doc = None
+        mapping = None
+        temp_file = None
+        committed = False
+        report = None
+        success: Optional[bool] = False  # None once cancelled
+        profiler = self.begin_document(pdf_path, output_path)
+        started = time.perf_counter()
+
         try:
-            # Create temporary file
-            temp_dir = tempfile.gettempdir()
-            temp_file = os.path.join(temp_dir, f"temp_{int(time.time())}_{os.path.basename(output_path)}")
-            
             # Open source document
-            src_doc = fitz.open(pdf_path)
-            total_pages = len(src_doc)
-            
-            # For each page
-            for page_num, page in enumerate(src_doc):
-                modified = False
-                
-                # Get all content streams for the page
-                for xref in page.get_contents():
-                    content = src_doc.xref_stream(xref)
-                    if not content:
-                        continue
-                    
-                    # Decode content with multiple fallbacks to handle encoding issues
-                    content_text = content.decode('utf-8', errors='ignore')
-                    
-                    # 1. Handle named watermark (diagonal red text)
-                    if name_pattern in content_text:
-                        content = content.replace(name_pattern.encode('utf-8'), b'')
-                        modified = True
-                    
-                    # 2. Handle footer text (blue text at bottom)
-                    if footer_pattern and footer_pattern in content_text:
-                        content = content.replace(footer_pattern.encode('utf-8'), b'')
-                        modified = True
-                    
-                    # 3. Special handling for the date watermark with both approaches
-                    
-                    # First approach: Direct text matching with flexible end detection
-                    date_watermark_partial = "Document non tenu"
-                    if date_watermark_partial in content_text:
-                        # Find start position of this text
-                        start_pos = content_text.find(date_watermark_partial)
-                        
-                        # Look for ending markers (Tj or ET)
-                        end_markers = ["Tj", "ET", "TD", ")"]
-                        for marker in end_markers:
-                            end_pos = content_text.find(marker, start_pos + 10)
-                            if end_pos > 0:
-                                # Find the opening parenthesis before this sequence
-                                open_paren = content_text.rfind("(", 0, start_pos + 15)
-                                if open_paren > 0:
-                                    # Extract the section to remove
-                                    section_to_remove = content_text[open_paren:end_pos+len(marker)]
-                                    # Replace with empty content (preserving structure)
-                                    if "(" in section_to_remove and ")" in section_to_remove:
-                                        content = content.replace(
-                                            section_to_remove.encode('utf-8'), 
-                                            b'()'
-                                        )
-                                        modified = True
-                                        break
-                    
-                    # Second approach: Byte pattern matching (hex encoded text)
-                    hex_patterns = [
-                        b'44 6f 63 75 6d 65 6e 74 20 6e 6f 6e 20 74 65 6e 75',  # "Document non tenu"
-                        b'6f 63 75 6d 65 6e 74 20 6e 6f 6e 20 74 65 6e 75',      # "ocument non tenu"
-                        b'44 6f 63 75 6d',                                       # "Docum"
-                        b'6e 6f 6e 20 74 65 6e 75'                               # "non tenu"
-                    ]
-                    
-                    for pattern in hex_patterns:
-                        if pattern in content:
-                            # Find all occurrences of this pattern
-                            start_idx = 0
-                            while True:
-                                start_idx = content.find(pattern, start_idx)
-                                if start_idx == -1:
-                                    break
-                                    
-                                # Find the nearest opening parenthesis before this
-                                open_idx = max(0, start_idx - 100)
-                                chunk = content[open_idx:start_idx + 200]
-                                
-                                # Check if we have a parenthesis sequence
-                                open_paren_pos = chunk.rfind(b'(', 0, 100)
-                                if open_paren_pos >= 0:
-                                    # Find the corresponding closing parenthesis
-                                    close_paren_pos = chunk.find(b')', open_paren_pos)
-                                    if close_paren_pos > open_paren_pos:
-                                        # Extract and remove this content
-                                        removal_chunk = chunk[open_paren_pos:close_paren_pos+1]
-                                        content = content.replace(removal_chunk, b'()')
-                                        modified = True
-                                
-                                start_idx += 10  # Move forward to avoid endless loop
-                    
-                    # 4. Handle red text (diagonal watermark) by color markers
-                    if b'1 0 0 rg' in content or b'0.8 0 0 rg' in content or b'1 0 0 RG' in content:
-                        # Find position of red color marker
-                        red_pos = max(
-                            content.find(b'1 0 0 rg'),
-                            content.find(b'0.8 0 0 rg'),
-                            content.find(b'1 0 0 RG')
-                        )
-                        
-                        if red_pos > 0:
-                            # Find next text operator (BT...ET sequence)
-                            bt_pos = content.find(b'BT', red_pos - 50)
-                            et_pos = content.find(b'ET', red_pos)
-                            
-                            if bt_pos > 0 and et_pos > bt_pos:
-                                # Replace the entire text block with empty BT/ET
-                                text_block = content[bt_pos:et_pos+2]
-                                content = content.replace(text_block, b'BT ET')
-                                modified = True
-                    
-                    # Update content if modified
-                    if modified:
-                        src_doc.update_stream(xref, content)
-                
-                # Update progress
-                if progress_var is not None:
-                    progress_var.set(int((page_num + 1) / total_pages * 100))
-            
+            src_doc, mapping = open_document(pdf_path, self.mmap_input)
+            opened = time.perf_counter()
+            report = self.process_document(
+                src_doc, name_pattern, footer_pattern, progress_var, cancel_token,
+                raster=raster, source_path=pdf_path, heartbeat=heartbeat,
+            )
+            report.phase_seconds["open"] += opened - started
+
+            # Last chance to stop before anything is written to disk
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
             # Save the document
-            src_doc.save(temp_file, garbage=4, deflate=True, clean=True)
+            if heartbeat is not None:
+                heartbeat("save")
+            phase_started = time.perf_counter()
+            temp_file = scratch.temp_path(output_path)
+            save_document(src_doc, temp_file, self.object_streams, self.linearize)
             src_doc.close()
+            src_doc = None
+            if mapping is not None:
+                # Unmapped before the move, Windows cannot replace a mapped file
+                mapping.close()
+                mapping = None
+            phase_started = report.lap("save", phase_started)
             
-            # Copy to final destination
+            # Move to final destination
             try:
-                shutil.copy2(temp_file, output_path)
-                try:
-                    os.remove(temp_file)
-                except OSError as rm_err:
-                    logger.warning("Could not remove temp file %s: %s", temp_file, rm_err)
-
-                # Add a subtle identification to the processed file
-                try:
-                    output_doc = fitz.open(output_path)
-                    for page in output_doc:
-                        text = f"Traité par Supprimer Filigrane PDF - ID:{int(time.time())}"
-                        page.insert_text((5, 5), text, fontsize=4, color=(0.9, 0.9, 0.9))
-                    output_doc.save(output_path, garbage=4, deflate=True, clean=True)
-                    output_doc.close()
-                except Exception as wm_err:
-                    logger.warning("Could not add identification watermark: %s", wm_err)
+                scratch.commit(temp_file, output_path)
+                committed = True
+                phase_started = report.lap("write", phase_started)
+                if verifier is not None:
+                    if heartbeat is not None:
+                        heartbeat("verify")
+                    residual = verifier.verify(
+                        output_path, report.modified_pages,
+                        OutputVerifier.patterns_for(name_pattern, footer_pattern),
+                    )
+                    report.lap("verify", phase_started)
+                    if residual and notify:
+                        messagebox.showwarning(
+                            "Vérification",
+                            f"Filigrane résiduel détecté dans {output_path} :\n"
+                            + "\n".join(
+                                f"• page {page} : « {pattern} »"
+                                for page, pattern in residual[:10]
+                            ),
+                        )
+                success = True
                 return True
             except Exception as copy_err:
                 logger.error("Failed to write output to %s: %s", output_path, copy_err)
-                messagebox.showwarning(
-                    "Attention",
-                    f"Impossible d'écrire dans {output_path}.\n"
-                    f"Le fichier traité est disponible dans: {temp_file}",
-                )
+                if committed:
+                    return False
+                kept = scratch.preserve(temp_file)
+                committed = True
+                logger.warning("Processed file kept at %s", kept)
+                if notify:
+                    messagebox.showwarning(
+                        "Attention",
+                        f"Impossible d'écrire dans {output_path}.\n"
+                        f"Le fichier traité est disponible dans: {kept}",
+                    )
                 return False
 
+        except ProcessingCancelled:
+            logger.info("Processing of %s cancelled", pdf_path)
+            success = None
+            return False
+
         except Exception as proc_err:
             logger.error("Error processing %s: %s", pdf_path, proc_err, exc_info=True)
-            messagebox.showerror(
-                "Erreur", f"Erreur lors du traitement de {pdf_path}: {proc_err}"
-            )
+            if notify:
+                messagebox.showerror(
+                    "Erreur", f"Erreur lors du traitement de {pdf_path}: {proc_err}"
+                )
             return False
+
+        finally:
+            if src_doc is not None:
+                src_doc.close()
+            if mapping is not None:
+                mapping.close()
+            if temp_file is not None and not committed:
+                scratch.discard(temp_file)
+            if own_scratch:
+                scratch.close()
+            self.end_document(profiler, report)
+            if success is not None:
+                telemetry.record_file(pdf_path, output_path, started, success, report)
     
+    def begin_document(
+        self, input_path: str, output_path: str, scope: str = ""
+    ) -> Optional[profiling.DocumentProfiler]:
+        """Register the start of a file; started profiler if it is profiled.
+
+        A profiled file waits for every other file of the process and
+        holds them back until :meth:`end_document`, which must follow.
+        *scope* names work that keeps running meanwhile.
+        """
+        return profiling.begin_document(input_path, output_path, self.profile_patterns, scope)
+
+    def end_document(
+        self,
+        profiler: Optional[profiling.DocumentProfiler],
+        report: Optional["DocumentReport"] = None,
+    ) -> None:
+        """Counterpart of :meth:`begin_document`; writes the profile reports."""
+        profiling.end_document(profiler, report)
+
+    def process_document(
+        self,
+        src_doc: "fitz.Document",
+        name_pattern: str,
+        footer_pattern: str,
+        progress_var: Optional["tk.IntVar"] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        raster: bool = False,
+        source_path: Optional[str] = None,
+        heartbeat: Optional[Callable[[str], None]] = None,
+    ) -> "DocumentReport":
+        """Apply every watermark rule to the content streams of an open document.
+
+        Works purely in memory, so it serves both the path-based entry
+        point and the pipelined batch mode that feeds documents as bytes.
+        When page classification is enabled, only pages containing at
+        least one rule trigger are visited.  Form XObjects drawn by the
+        pages are then cleaned, each once.  With *raster*, embedded page
+        images are then cleaned by colour thresholding as well.  The
+        identification stamp, if enabled, is added last.  *source_path*
+        names the file a memory-mapped document was opened from, which
+        sharding needs.  *heartbeat* is called with ``"classification"``,
+        ``"rules"``, ``"forms"``, ``"raster"`` and ``"stamp"`` as each
+        phase starts; the forms and raster phases call it again for every
+        page and image (the rule phase reports its pages through
+        *progress_var*).
+
+        Returns:
+            What was done to the document: modified pages and, when
+            enabled, the page classification statistics.
+
+        Raises:
+            ProcessingCancelled: If *cancel_token* is cancelled between pages.
+        """
+        phase_started = time.perf_counter()
+        if heartbeat is not None:
+            heartbeat("classification")
+        classification = None
+        if self.classify_pages:
+            classification = classify_pages(src_doc, name_pattern, footer_pattern)
+
+        if classification is not None:
+            pages = [int(page_num) for page_num in classification.selected]
+            cached = classification.contents  # consumed page by page
+        else:
+            pages = list(range(len(src_doc)))
+            cached = {}
+        total_pages = len(pages)
+        report = DocumentReport(len(src_doc), classification)
+        name_bytes = name_pattern.encode("utf-8") if name_pattern else b""
+        footer_bytes = footer_pattern.encode("utf-8") if footer_pattern else b""
+        phase_started = report.lap("classification", phase_started)
+        if heartbeat is not None:
+            heartbeat("rules")
+
+        source_path = source_path or src_doc.name or ""
+        if (
+            self.shard_min_pages and total_pages >= self.shard_min_pages
+            and os.path.isfile(source_path)
+            # Daemonic processes (isolated workers) cannot have children
+            and not multiprocessing.current_process().daemon
+        ):
+            clean_sharded(
+                src_doc, pages, name_bytes, footer_bytes, report,
+                shards=os.cpu_count() or 1, cancel_token=cancel_token,
+                path=source_path,
+            )
+            pages = []  # already cleaned by the shards
+            if progress_var is not None:
+                progress_var.set(100)
+
+        # For each page
+        for index, page_num in enumerate(pages):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            page = src_doc[page_num]
+            modified = False
+                
+            # Get all content streams for the page
+            for xref in page.get_contents():
+                # Streams shared by several pages are only served from the
+                # cache once, later pages see the updated stream
+                content = cached.pop(xref, None)
+                if content is None:
+                    content = src_doc.xref_stream(xref)
+                if not content:
+                    continue
+                    
+                cleaned = clean_stream(content, name_bytes, footer_bytes, report)
+                if cleaned is not None:
+                    rewrite_started = time.perf_counter()
+                    src_doc.update_stream(xref, cleaned)
+                    report.time_rule("rewrite", rewrite_started)
+                    modified = True
+
+            if modified:
+                report.modified_pages.append(page_num)
+                
+            # Update progress
+            if progress_var is not None:
+                progress_var.set(int((index + 1) / total_pages * 100))
+
+        if progress_var is not None and not total_pages:
+            progress_var.set(100)
+        cached.clear()  # left over by sharding or shared streams
+        phase_started = report.lap("rules", phase_started)
+        self._clean_forms(src_doc, name_bytes, footer_bytes, report, cancel_token, heartbeat)
+        phase_started = report.lap("forms", phase_started)
+        if raster:
+            raster_pages = clean_raster_pages(
+                src_doc, cancel_token=cancel_token, heartbeat=heartbeat,
+            )
+            report.rule_hits["raster"] += len(raster_pages)
+            report.modified_pages = sorted(set(report.modified_pages) | set(raster_pages))
+            phase_started = report.lap("raster", phase_started)
+        if self.stamp_enabled:
+            if heartbeat is not None:
+                heartbeat("stamp")
+            try:
+                IdentificationStamp(self.stamp_text).apply(src_doc)
+            except Exception as wm_err:
+                logger.warning("Could not add identification stamp: %s", wm_err)
+            report.lap("stamp", phase_started)
+        if classification is not None:
+            logger.info("Page classification: %s", classification.summary())
+        return report
+
+    @staticmethod
+    def _clean_forms(
+        src_doc: "fitz.Document",
+        name_bytes: bytes,
+        footer_bytes: bytes,
+        report: "DocumentReport",
+        cancel_token: Optional[CancellationToken] = None,
+        heartbeat: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        """Apply the rules to every Form XObject the pages draw, nested ones included.
+
+        Each form stream is cleaned once per xref, however many pages
+        (or other forms) reference it; pages drawing a modified form are
+        added to the report's modified pages.  *heartbeat* is called with
+        ``"forms"`` for every page.
+        """
+        visited: set[int] = set()
+        modified: set[int] = set()
+        pages = set(report.modified_pages)
+        for page in src_doc:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            if heartbeat is not None:
+                heartbeat("forms")
+            # get_xobjects() walks the resources recursively: forms used
+            # by forms are listed with the xref of the form invoking them
+            for xref, *_ in page.get_xobjects():
+                if xref not in visited:
+                    visited.add(xref)
+                    content = src_doc.xref_stream(xref)
+                    if content:
+                        cleaned = clean_stream(content, name_bytes, footer_bytes, report)
+                        if cleaned is not None:
+                            src_doc.update_stream(xref, cleaned)
+                            report.rule_hits["forms"] += 1
+                            modified.add(xref)
+                if xref in modified:
+                    pages.add(page.number)
+        report.modified_pages = sorted(pages)
+
     def process_folder(
         self,
         input_folder: str,
@@ -209,80 +576,487 @@ class WatermarkProcessor:
         footer_pattern: str = "DOCUMENT NON APPLICABLE",
         progress_var: Optional["tk.IntVar"] = None,
         status_var: Optional["tk.StringVar"] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        pipelined: bool = False,
+        deduplicate: bool = False,
+        verify: bool = False,
+        raster: bool = False,
+        isolate: bool = False,
+        adaptive: bool = False,
     ) -> bool:
         """Process all PDF files in a folder.
 
         Unlike previous behaviour that stopped on the first failure,
         this now processes every file and reports a summary at the end.
+        When *cancel_token* is cancelled, the files in progress are
+        abandoned cleanly, files already written are kept, and the
+        status reports how far the batch got.  See :meth:`process_files`
+        for *pipelined*, *deduplicate*, *verify*, *raster*, *isolate* and
+        *adaptive*.
 
         Returns:
-            True if *all* files succeeded, False if at least one failed.
+            True if *all* files succeeded, False if at least one failed
+            or the batch was cancelled.
         """
         try:
-            # Create destination folder if it doesn't exist
-            if not os.path.exists(output_folder):
-                try:
-                    os.makedirs(output_folder)
-                except OSError as dir_err:
-                    logger.error("Cannot create output folder %s: %s", output_folder, dir_err)
-                    messagebox.showerror(
-                        "Erreur",
-                        f"Impossible de créer le dossier de destination: {output_folder}",
-                    )
-                    return False
-
             # Get all PDF files in source folder
             pdf_files = [f for f in os.listdir(input_folder) if f.lower().endswith(".pdf")]
-            total_files = len(pdf_files)
+        except OSError as exc:
+            logger.error("Batch processing error: %s", exc, exc_info=True)
+            if status_var:
+                status_var.set(f"Erreur: {exc}")
+            messagebox.showerror("Erreur", f"Une erreur est survenue: {exc}")
+            return False
 
-            if total_files == 0:
-                if status_var:
-                    status_var.set("Aucun fichier PDF trouvé dans le dossier source.")
-                return False
+        if not pdf_files:
+            if status_var:
+                status_var.set("Aucun fichier PDF trouvé dans le dossier source.")
+            return False
 
-            failed_files: list[str] = []
+        pairs = [
+            (os.path.join(input_folder, f), os.path.join(output_folder, f))
+            for f in pdf_files
+        ]
+        return self.process_files(
+            pairs, name_pattern, footer_pattern,
+            progress_var, status_var, cancel_token,
+            pipelined=pipelined, deduplicate=deduplicate, verify=verify,
+            raster=raster, isolate=isolate, adaptive=adaptive,
+        )
 
-            # Process each PDF file — continue on individual failures
-            for i, filename in enumerate(pdf_files):
-                input_path = os.path.join(input_folder, filename)
-                output_path = os.path.join(output_folder, filename)
+    def process_manifest(
+        self,
+        entries: list[ManifestEntry],
+        progress_var: Optional["tk.IntVar"] = None,
+        status_var: Optional["tk.StringVar"] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        max_workers: Optional[int] = None,
+        pipelined: bool = False,
+        deduplicate: bool = False,
+        verify: bool = False,
+        raster: bool = False,
+        isolate: bool = False,
+        adaptive: bool = False,
+    ) -> bool:
+        """Process the files of a manifest, each with its own patterns, as one batch.
 
-                if status_var:
-                    status_var.set(f"Traitement de {filename} ({i + 1}/{total_files})")
+        Every file is dispatched through the same pool, by decreasing
+        priority and then largest first; files sharing a parameter set
+        share its compiled rules.  See :mod:`mechanisms.manifest` for the
+        formats and :meth:`process_files` for the options.
 
-                success = self.remove_watermark_by_structure(
-                    input_path, output_path, name_pattern, footer_pattern
-                )
+        Returns:
+            True if *all* files succeeded, False if at least one failed
+            or the batch was cancelled.
+        """
+        if not entries:
+            if status_var:
+                status_var.set("Le manifeste ne contient aucun fichier.")
+            return False
+        return self.process_files(
+            [entry.pair for entry in entries], "", manifest.DEFAULT_FOOTER,
+            progress_var, status_var, cancel_token, max_workers,
+            pipelined=pipelined, deduplicate=deduplicate, verify=verify,
+            raster=raster, isolate=isolate, adaptive=adaptive,
+            entries={entry.output_path: entry for entry in entries},
+        )
 
-                if progress_var is not None:
-                    progress_var.set(int((i + 1) / total_files * 100))
+    def process_files(
+        self,
+        pairs: list[tuple[str, str]],
+        name_pattern: str,
+        footer_pattern: str = "DOCUMENT NON APPLICABLE",
+        progress_var: Optional["tk.IntVar"] = None,
+        status_var: Optional["tk.StringVar"] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        max_workers: Optional[int] = None,
+        pipelined: bool = False,
+        prefetch: int = 4,
+        deduplicate: bool = False,
+        verify: bool = False,
+        raster: bool = False,
+        isolate: bool = False,
+        adaptive: bool = False,
+        entries: Optional[dict[str, ManifestEntry]] = None,
+    ) -> bool:
+        """Process an explicit list of files as one parallel batch.
 
-                if not success:
-                    failed_files.append(filename)
-                    logger.warning("Failed to process: %s", filename)
+        Args:
+            pairs: ``(input_path, output_path)`` tuples; files may come
+                from different folders.
+            max_workers: Number of files processed concurrently;
+                defaults to :func:`default_worker_count`.
+            pipelined: Overlap I/O with processing: a reader thread
+                prefetches up to *prefetch* files into memory and a writer
+                thread flushes outputs in the background.  Suited to
+                network shares; per-stage timings are logged.
+            prefetch: Bounded queue size for the pipelined mode.
+            deduplicate: Hash inputs up front, process each distinct
+                document once and link or copy its output for the
+                byte-identical copies.
+            verify: Re-scan the modified pages of every output for the
+                original patterns; files with residual watermarks are
+                flagged in the summary.
+            raster: Also clean watermark pixels from page images (scans).
+            isolate: Run every file in a supervised worker process with
+                the engine's ``isolation_limits``; documents that exceed
+                them or crash their worker are quarantined.  Takes
+                precedence over *pipelined*.
+            adaptive: Adjust the number of files processed at once while
+                the batch runs, from free memory, memory per file, CPU
+                utilisation and I/O wait, up to *max_workers* or
+                :func:`~mechanisms.concurrency.max_concurrency` (and the
+                worker pool size).  Every adjustment is
+                logged.  Not used by the pipelined mode.
+            entries: Manifest entries keyed by output path; their patterns
+                replace *name_pattern* and *footer_pattern* for those
+                files, and files run by decreasing priority (see
+                :meth:`process_manifest`).
 
-            # Summary
-            succeeded = total_files - len(failed_files)
-            if failed_files:
-                if status_var:
-                    status_var.set(
-                        f"Terminé : {succeeded}/{total_files} fichiers traités. "
-                        f"{len(failed_files)} erreur(s)."
-                    )
-                messagebox.showwarning(
-                    "Traitement partiel",
-                    f"{len(failed_files)} fichier(s) n'ont pas pu être traités :\n"
-                    + "\n".join(f"• {f}" for f in failed_files[:10]),
-                )
-                return False
+        Returns:
+            True if *all* files succeeded, False if at least one failed
+            or the batch was cancelled.
+        """
+        try:
+            # Create destination folders if they don't exist
+            for output_folder in sorted({os.path.dirname(out) for _, out in pairs}):
+                if output_folder and not os.path.exists(output_folder):
+                    try:
+                        os.makedirs(output_folder)
+                    except OSError as dir_err:
+                        logger.error("Cannot create output folder %s: %s", output_folder, dir_err)
+                        messagebox.showerror(
+                            "Erreur",
+                            f"Impossible de créer le dossier de destination: {output_folder}",
+                        )
+                        return False
 
-            if status_var:
-                status_var.set(f"Traitement terminé. {total_files} fichiers traités.")
-            return True
+            result = self._run_batch(
+                pairs, name_pattern, footer_pattern,
+                progress_var, status_var, cancel_token, max_workers,
+                pipelined, prefetch, deduplicate, verify, raster, isolate,
+                adaptive, entries,
+            )
+            return self._report_batch(result, status_var)
 
         except Exception as exc:
             logger.error("Batch processing error: %s", exc, exc_info=True)
             if status_var:
                 status_var.set(f"Erreur: {exc}")
             messagebox.showerror("Erreur", f"Une erreur est survenue: {exc}")
-            return False
\ No newline at end of file
+            return False
+
+    def _run_batch(
+        self,
+        pairs: list[tuple[str, str]],
+        name_pattern: str,
+        footer_pattern: str,
+        progress_var: Optional["tk.IntVar"],
+        status_var: Optional["tk.StringVar"],
+        cancel_token: Optional[CancellationToken],
+        max_workers: Optional[int],
+        pipelined: bool = False,
+        prefetch: int = 4,
+        deduplicate: bool = False,
+        verify: bool = False,
+        raster: bool = False,
+        isolate: bool = False,
+        adaptive: bool = False,
+        entries: Optional[dict[str, ManifestEntry]] = None,
+    ) -> "BatchResult":
+        """Run every pair through the engine, threaded, pipelined or isolated."""
+        result = BatchResult(len(pairs))
+        verifier = OutputVerifier(name_pattern, footer_pattern) if verify else None
+        lock = threading.Lock()
+        started = time.monotonic()
+        succeeded_inputs: set[str] = set()
+
+        def patterns(output_path: str) -> tuple[str, str]:
+            entry = entries.get(output_path) if entries else None
+            if entry is None:
+                return name_pattern, footer_pattern
+            return entry.parameters
+
+        # Files sharing parameters form one set: rules are compiled once
+        # per set and identical inputs are only merged within a set
+        parameter_sets: dict[tuple[str, str], list[tuple[str, str]]] = {}
+        for pair in pairs:
+            parameter_sets.setdefault(patterns(pair[1]), []).append(pair)
+        if entries:
+            result.manifest = [entries[out] for _, out in pairs if out in entries]
+            manifest.prepare_groups(result.manifest)
+
+        groups = None
+        if deduplicate:
+            if status_var:
+                status_var.set("Recherche des fichiers identiques…")
+            groups = [
+                group
+                for subset in parameter_sets.values()
+                for group in find_duplicates(subset)
+            ]
+            pairs = [group.primary for group in groups]
+        # Longest files first, so no worker is left alone with a big one;
+        # manifest priorities come before size (the sort is stable)
+        pairs = largest_first(pairs)
+        if entries:
+            pairs.sort(
+                key=lambda pair: -entries[pair[1]].priority if pair[1] in entries else 0
+            )
+        workers = max(1, min(max_workers or default_worker_count(), len(pairs)))
+        runner = None
+        if isolate:
+            pipelined = False
+            runner = IsolatedRunner(self.engine_settings(), self.isolation_limits, verifier)
+            result.quarantine = runner.quarantine
+        limiter = None
+        if adaptive and not pipelined:
+            # One lane per file the machine might run; the limiter decides
+            # how many of them actually work at any moment
+            upper = max_workers or max_concurrency()
+            if self.worker_pool is not None:
+                upper = min(upper, self.worker_pool.max_workers)
+            initial = max(1, min(default_worker_count(), len(pairs)))
+            workers = max(1, min(upper, len(pairs)))
+            limiter = result.concurrency = AdaptiveLimiter(
+                workers, initial,
+                memory_in_use=runner.memory_in_use if runner is not None else None,
+            )
+        schedule = result.schedule = ScheduleStats(workers)
+
+        def record(input_path: str, success: bool) -> None:
+            filename = os.path.basename(input_path)
+            with lock:
+                if success:
+                    succeeded_inputs.add(input_path)
+                    result.succeeded.append(filename)
+                else:
+                    result.failed.append(filename)
+                    logger.warning("Failed to process: %s", filename)
+                done = result.processed
+
+            if status_var:
+                status_var.set(f"Traitement : {done}/{result.total} fichiers terminés")
+            if progress_var is not None:
+                progress_var.set(int(done / result.total * 100))
+
+        def run_one(pair: tuple[str, str]) -> None:
+            if limiter is None:
+                process_one(pair)
+                return
+            with limiter.slot():
+                process_one(pair)
+
+        def process_one(pair: tuple[str, str]) -> None:
+            input_path, output_path = pair
+            filename = os.path.basename(input_path)
+            if cancel_token is not None and cancel_token.cancelled:
+                return
+            file_name_pattern, file_footer_pattern = patterns(output_path)
+
+            if status_var:
+                status_var.set(
+                    f"Traitement de {filename} ({result.processed}/{result.total} terminés)"
+                )
+
+            file_started = time.perf_counter()
+            if runner is not None:
+                success = runner.process(
+                    input_path, output_path, file_name_pattern, file_footer_pattern,
+                    raster=raster, cancel_token=cancel_token,
+                )
+                if success is None:
+                    return  # cancelled, the worker was stopped
+                telemetry.record_file(
+                    input_path, output_path, file_started, success, mode="isolated"
+                )
+            else:
+                # Errors are collected for the end-of-batch summary instead
+                # of popping one dialog per file from every worker thread.
+                success = self.remove_watermark_by_structure(
+                    input_path, output_path, file_name_pattern, file_footer_pattern,
+                    cancel_token=cancel_token, notify=False, verifier=verifier,
+                    raster=raster, scratch=scratch,
+                )
+                if not success and cancel_token is not None and cancel_token.cancelled:
+                    return  # abandoned mid-file, nothing was written
+            schedule.record(time.perf_counter() - file_started)
+            record(input_path, success)
+
+        if limiter is not None:
+            limiter.start()
+        with ScratchSpace() as scratch:
+            try:
+                if pipelined:
+                    workers = 1
+                    result.schedule = None  # stages overlap, see the pipeline metrics
+                    if status_var:
+                        status_var.set(f"Traitement en pipeline de {len(pairs)} fichier(s)…")
+                    result.metrics = run_pipeline(
+                        self, pairs, name_pattern, footer_pattern, record,
+                        cancel_token=cancel_token, prefetch=prefetch, verifier=verifier,
+                        raster=raster, scratch=scratch,
+                        parameters={
+                            out: entry.parameters for out, entry in entries.items()
+                        } if entries else None,
+                    )
+                elif self.worker_pool is not None:
+                    self.worker_pool.run_lanes(run_one, pairs, workers)
+                else:
+                    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="watermark-file") as pool:
+                        list(pool.map(run_one, pairs))
+            finally:
+                if runner is not None:
+                    runner.close()
+                if limiter is not None:
+                    limiter.stop()
+        schedule.finish()
+
+        if groups is not None:
+            seconds_per_unique = (time.monotonic() - started) / max(1, len(pairs))
+            result.dedup = materialize_duplicates(
+                groups, succeeded_inputs, record,
+                seconds_per_unique=seconds_per_unique, cancel_token=cancel_token,
+            )
+
+        result.cancelled = result.processed < result.total
+        result.elapsed = time.monotonic() - started
+        if result.schedule is not None:
+            logger.info(schedule.summary())
+        if limiter is not None:
+            logger.info(limiter.summary())
+        if verifier is not None:
+            result.verification = verifier
+            logger.info(verifier.summary())
+        logger.info(
+            "Batch of %d file(s) finished in %.1fs with %d worker(s): %d ok, %d failed",
+            result.total, result.elapsed, workers,
+            len(result.succeeded), len(result.failed),
+        )
+        mode = "isolated" if isolate else "pipeline" if pipelined else "file"
+        telemetry.record_batch(result, workers, mode)
+        return result
+
+    @staticmethod
+    def _report_batch(
+        result: "BatchResult", status_var: Optional["tk.StringVar"]
+    ) -> bool:
+        """Publish the batch summary; returns True if every file succeeded."""
+        failed_files = result.failed
+        total_files = result.total
+
+        if result.cancelled:
+            summary = (
+                f"Traitement annulé : {len(result.succeeded)}/{total_files} fichiers traités, "
+                f"{len(failed_files)} erreur(s), "
+                f"{total_files - result.processed} non traité(s)."
+            )
+            logger.info(summary)
+            if status_var:
+                status_var.set(summary)
+            return False
+
+        succeeded = total_files - len(failed_files)
+        if failed_files:
+            quarantined = result.quarantine.entries if result.quarantine is not None else []
+            if status_var:
+                summary = (
+                    f"Terminé : {succeeded}/{total_files} fichiers traités. "
+                    f"{len(failed_files)} erreur(s)."
+                )
+                if quarantined:
+                    summary += f" {result.quarantine.summary()}"
+                status_var.set(summary)
+            reasons = dict(quarantined)
+            messagebox.showwarning(
+                "Traitement partiel",
+                f"{len(failed_files)} fichier(s) n'ont pas pu être traités :\n"
+                + "\n".join(
+                    f"• {f} (quarantaine : {reasons[f]})" if f in reasons else f"• {f}"
+                    for f in failed_files[:10]
+                ),
+            )
+            return False
+
+        if status_var:
+            summary = f"Traitement terminé. {total_files} fichiers traités."
+            if result.metrics is not None:
+                summary += f" {result.metrics.summary()}"
+            if result.schedule is not None and result.schedule.workers > 1:
+                summary += f" {result.schedule.summary()}"
+            if result.concurrency is not None:
+                summary += f" {result.concurrency.summary()}"
+            if result.dedup is not None and result.dedup.duplicates:
+                summary += f" {result.dedup.summary()}"
+            if result.verification is not None:
+                summary += f" {result.verification.summary()}"
+            if result.manifest:
+                summary += f" {manifest.summary(result.manifest)}"
+            status_var.set(summary)
+        if result.unverified:
+            messagebox.showwarning(
+                "Vérification",
+                f"Un filigrane résiduel a été détecté dans {len(result.unverified)} "
+                "fichier(s) :\n"
+                + "\n".join(f"• {f}" for f in result.unverified[:10]),
+            )
+        return True
+
+
+class DocumentReport:
+    """What the rule pass did to one document."""
+
+    def __init__(
+        self, page_count: int, classification: Optional[PageClassification] = None
+    ) -> None:
+        """Start a report for a document of *page_count* pages."""
+        self.page_count = page_count
+        self.classification = classification
+        self.modified_pages: list[int] = []
+        self.rule_hits: Counter = Counter()  # rule name -> times it fired
+        self.rule_seconds: Counter = Counter()  # rule name -> time spent
+        self.phase_seconds: Counter = Counter()  # engine phase -> time spent
+
+    def lap(self, phase: str, since: float) -> float:
+        """Charge the time elapsed *since* to *phase*; return the new start."""
+        now = time.perf_counter()
+        self.phase_seconds[phase] += now - since
+        return now
+
+    def time_rule(self, rule: str, since: float) -> float:
+        """Charge the time elapsed *since* to *rule*; return the new start."""
+        now = time.perf_counter()
+        self.rule_seconds[rule] += now - since
+        return now
+
+
+class BatchResult:
+    """Outcome of a batch run, used to build the end-of-batch summary."""
+
+    def __init__(self, total: int) -> None:
+        """Start an empty result for a batch of *total* files."""
+        self.total = total
+        self.succeeded: list[str] = []
+        self.failed: list[str] = []
+        self.cancelled = False
+        self.elapsed = 0.0
+        self.metrics: Optional[PipelineMetrics] = None
+        self.dedup: Optional[DedupStats] = None
+        self.verification: Optional[OutputVerifier] = None
+        self.quarantine: Optional[Quarantine] = None
+        self.schedule: Optional[ScheduleStats] = None
+        self.concurrency: Optional[AdaptiveLimiter] = None
+        self.manifest: Optional[list[ManifestEntry]] = None
+
+    @property
+    def unverified(self) -> list[str]:
+        """Outputs in which verification still found watermark text."""
+        if self.verification is None:
+            return []
+        return sorted(os.path.basename(path) for path in self.verification.failures)
+
+    @property
+    def processed(self) -> int:
+        """Number of files that ran to completion, successfully or not."""
+        return len(self.succeeded) + len(self.failed)
+
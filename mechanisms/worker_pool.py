@@ -0,0 +1,119 @@
+"""
+Worker Pool Module.
+
+Long-lived pool of processing threads shared by every job of a GUI
+session.  It is created once when the application starts; each thread
+warms up as soon as it is spawned (first MuPDF document, stamp font
+metrics, compiled classifier pattern for the default parameters), so
+short interactive jobs start immediately instead of paying thread
+creation and first-use costs.  The pool is shut down when the
+application exits.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+import fitz  # PyMuPDF
+
+from mechanisms.page_classifier import needle_regex
+
+logger = logging.getLogger("watermark_app.workers")
+
+DEFAULT_FOOTER = "DOCUMENT NON APPLICABLE"
+
+_END = object()
+
+
+def default_worker_count() -> int:
+    """Number of files a batch processes concurrently by default."""
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def _warm_thread() -> None:
+    """Pay first-use costs on a fresh worker thread, before any job."""
+    try:
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((5, 5), "warm-up", fontsize=4)
+        doc.tobytes(garbage=4, deflate=True, clean=True)
+        doc.close()
+        fitz.get_text_length("warm-up", fontname="helv", fontsize=4)
+        needle_regex("", DEFAULT_FOOTER)
+    except Exception as exc:  # warming is best effort
+        logger.debug("Worker warm-up failed: %s", exc)
+
+
+class WorkerPool:
+    """Persistent thread pool running the files of every batch."""
+
+    def __init__(self, max_workers: Optional[int] = None) -> None:
+        """Create the pool; threads start on :meth:`warm_up` or first use."""
+        self.max_workers = max_workers or default_worker_count()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="watermark-worker",
+            initializer=_warm_thread,
+        )
+
+    def warm_up(self) -> None:
+        """Start every worker thread now, in the background."""
+        started = time.perf_counter()
+        barrier = threading.Barrier(self.max_workers + 1)
+
+        def wait_for_all() -> None:
+            # Holding each thread until all are up forces the executor
+            # to spawn (and warm) one thread per task
+            try:
+                barrier.wait(timeout=10)
+            except threading.BrokenBarrierError:
+                pass
+
+        for _ in range(self.max_workers):
+            self._executor.submit(wait_for_all)
+
+        def report() -> None:
+            try:
+                barrier.wait(timeout=10)
+            except threading.BrokenBarrierError:
+                return
+            logger.info(
+                "%d worker thread(s) ready in %.3fs",
+                self.max_workers, time.perf_counter() - started,
+            )
+
+        threading.Thread(target=report, name="watermark-warmup", daemon=True).start()
+
+    def run_lanes(self, fn: Callable[[object], None], items: Iterable, lanes: int) -> None:
+        """Call *fn* on every item using at most *lanes* pool threads.
+
+        Each lane pulls the next item from a shared iterator, so a batch
+        never occupies more threads than it asked for and several jobs
+        can share the pool.  Blocks until every item is done, and
+        re-raises the first exception raised by *fn*.
+        """
+        iterator = iter(items)
+        lock = threading.Lock()
+
+        def lane() -> None:
+            while True:
+                with lock:
+                    item = next(iterator, _END)
+                if item is _END:
+                    return
+                fn(item)
+
+        lanes = max(1, min(lanes, self.max_workers))
+        futures = [self._executor.submit(lane) for _ in range(lanes)]
+        for future in futures:
+            try:
+                future.result()
+            except CancelledError:
+                pass  # pool shut down while the batch was queued
+
+    def shutdown(self) -> None:
+        """Stop accepting work and drop queued lanes; running files finish."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
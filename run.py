@@ -6,6 +6,7 @@ Bootstraps logging, resolves frozen/source imports, and launches the main window
 import os
 import sys
 import logging
+import multiprocessing
 import tkinter as tk
 import traceback
 
@@ -17,11 +18,18 @@ def _setup_logging() -> logging.Logger:
 
     Modules still call logger.info/warning/error as before; a NullHandler
     simply discards those records so no watermark_app.log file is ever
-    created next to the executable.
+    created next to the executable.  Structured telemetry is only written
+    when explicitly requested through the WATERMARK_TELEMETRY variable.
     """
     logger = logging.getLogger("watermark_app")
     logger.setLevel(logging.DEBUG)
     logger.addHandler(logging.NullHandler())
+    try:
+        from mechanisms.telemetry import enable_from_environment
+
+        enable_from_environment()
+    except ImportError:
+        pass  # reported by the main import below
     return logger
 
 
@@ -40,6 +48,10 @@ try:
     from main.remove_watermark import WatermarkRemoverApp
 
     if __name__ == "__main__":
+        # Isolated batch workers are spawned processes; in the frozen
+        # executable they re-enter here and must not open a window
+        multiprocessing.freeze_support()
+
         root = ctk.CTk()
 
         # Set application icon
@@ -0,0 +1,50 @@
+"""Shared fixtures of the test suite: run ``python -m pytest tests`` from the repository root.
+
+Tests marked ``benchmark`` compare timings and are skipped unless the
+``WATERMARK_BENCHMARK`` environment variable is set.
+"""
+
+import os
+import sys
+
+import fitz  # PyMuPDF
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCHMARK_ENV = "WATERMARK_BENCHMARK"
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", f"benchmark: relative performance check, run with {BENCHMARK_ENV}=1",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get(BENCHMARK_ENV):
+        return
+    skip = pytest.mark.skip(reason=f"set {BENCHMARK_ENV}=1 to run benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+def write_pdf(path, pages):
+    """Write a PDF whose pages show the given lines of text, one list per page."""
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page()
+        for number, line in enumerate(lines):
+            page.insert_text((72, 72 + 20 * number), line)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """Factory writing small text PDFs into the test's temporary folder."""
+    def make(name, pages):
+        return write_pdf(tmp_path / name, pages)
+    return make
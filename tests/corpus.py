@@ -0,0 +1,150 @@
+"""
+Generated regression corpus.
+
+One small document per rule of
+:func:`~mechanisms.watermark_processor.clean_stream` (name, footer,
+"Document non tenu" text, hex-encoded text, red colour blocks, several
+streams per page, Form XObjects), plus a clean document and a large
+mixed one.  Each case states which strings must be gone from the output
+and which must survive on every page.
+"""
+
+import os
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+NAME = "JEAN DUPONT"
+FOOTER = "DOCUMENT NON APPLICABLE"
+BODY = "Corps du document"
+
+_BODY = b"q BT /helv 12 Tf 0 0 0 rg 72 700 Td (Corps du document page %d) Tj ET Q\n"
+_NAME = b"q 0 0 0 rg BT /helv 12 Tf 72 650 Td (Copie de JEAN DUPONT) Tj ET Q\n"
+_FOOTER = b"q 0 0 1 rg BT /helv 10 Tf 72 30 Td (DOCUMENT NON APPLICABLE) Tj ET Q\n"
+_DATE = b"q 0 0 0 rg BT /helv 8 Tf 72 20 Td (Document non tenu a jour 01/01/2025) Tj ET Q\n"
+_HEX_FULL = (
+    b"q BT /helv 8 Tf 72 60 Td "
+    b"(x 44 6f 63 75 6d 65 6e 74 20 6e 6f 6e 20 74 65 6e 75 y) Tj ET Q\n"
+)
+_HEX_SHORT = b"q BT /helv 8 Tf 72 80 Td (x 6e 6f 6e 20 74 65 6e 75 y) Tj ET Q\n"
+_RED = (
+    b"q 1 0 0 rg BT /helv 30 Tf 100 400 Td (CONFIDENTIEL) Tj ET Q\n",
+    b"q 0.8 0 0 rg BT /helv 30 Tf 100 400 Td (CONFIDENTIEL) Tj ET Q\n",
+    b"q 1 0 0 RG BT /helv 30 Tf 100 400 Td (CONFIDENTIEL) Tj ET Q\n",
+)
+
+
+class CorpusCase:
+    """One generated document and what the engine must do to it."""
+
+    def __init__(
+        self,
+        name: str,
+        pages: list[list[bytes]],
+        removed: tuple[str, ...] = (),
+        kept: tuple[str, ...] = (BODY,),
+        form: bool = False,
+    ) -> None:
+        """Describe a case.
+
+        Args:
+            name: File name stem, also the test id.
+            pages: Content streams of every page; ``%d`` in a stream is
+                replaced with the page number.
+            removed: Strings that must not appear in the output text.
+            kept: Strings that must appear on every page of the output.
+            form: Draw each page through a Form XObject instead of
+                directly (watermarks inside stamps and imported pages).
+        """
+        self.name = name
+        self.pages = pages
+        self.removed = removed
+        self.kept = kept
+        self.form = form
+
+    def __repr__(self) -> str:
+        return self.name
+
+    @property
+    def file_name(self) -> str:
+        return f"{self.name}.pdf"
+
+    def build(self, folder: str) -> str:
+        """Write the case's document into *folder* and return its path."""
+        path = os.path.join(folder, self.file_name)
+        doc = fitz.open()
+        try:
+            for number, streams in enumerate(self.pages, start=1):
+                page = doc.new_page()
+                for stream in streams:
+                    # Registers the font and appends a stream we overwrite
+                    page.insert_text((72, 100), "x", fontname="helv")
+                    xref = page.get_contents()[-1]
+                    body = stream % number if b"%d" in stream else stream
+                    doc.update_stream(xref, body)
+            if self.form:
+                outer = fitz.open()
+                for page in doc:
+                    framed = outer.new_page(width=page.rect.width, height=page.rect.height)
+                    framed.show_pdf_page(framed.rect, doc, page.number)
+                doc.close()
+                doc = outer
+            doc.save(path, garbage=3, deflate=True)
+        finally:
+            doc.close()
+        return path
+
+
+def mixed_case(pages: int, name: Optional[str] = None) -> CorpusCase:
+    """Every rule on every page, red variants alternating."""
+    return CorpusCase(
+        name or f"mixed{pages}",
+        [[_BODY + _NAME + _FOOTER + _DATE + _HEX_FULL + _RED[page % 3]]
+         for page in range(pages)],
+        removed=(NAME, FOOTER, "Document non tenu", "44 6f 63", "CONFIDENTIEL"),
+        kept=(BODY, "Copie de"),
+    )
+
+
+def clean_case(pages: int, name: Optional[str] = None) -> CorpusCase:
+    """Body text only: no rule may fire."""
+    return CorpusCase(name or f"clean{pages}", [[_BODY]] * pages)
+
+
+def default_cases() -> list[CorpusCase]:
+    """Cases covering every rule of the engine."""
+    return [
+        clean_case(3, "clean"),
+        CorpusCase("name", [[_BODY + _NAME]] * 3, removed=(NAME,), kept=(BODY, "Copie de")),
+        CorpusCase("footer", [[_BODY + _FOOTER]] * 3, removed=(FOOTER,)),
+        CorpusCase(
+            "date", [[_BODY + _DATE], [_DATE + _BODY + _DATE]],
+            removed=("Document non tenu", "01/01/2025"),
+        ),
+        CorpusCase(
+            "hex", [[_BODY + _HEX_FULL], [_BODY + _HEX_SHORT]],
+            removed=("44 6f 63 75 6d", "6e 6f 6e 20 74 65 6e 75"),
+        ),
+        CorpusCase("red", [[_BODY + red] for red in _RED], removed=("CONFIDENTIEL",)),
+        CorpusCase(
+            "streams", [[_BODY, _FOOTER, _DATE + _RED[0]]] * 3,
+            removed=(FOOTER, "Document non tenu", "CONFIDENTIEL"),
+        ),
+        CorpusCase(
+            "forms", [[_BODY + _NAME + _FOOTER]] * 3,
+            removed=(NAME, FOOTER), kept=(BODY, "Copie de"), form=True,
+        ),
+        mixed_case(300, "mixed"),
+    ]
+
+
+def page_texts(path: str) -> list[str]:
+    """Extracted text of every page of *path*, whitespace normalised."""
+    with fitz.open(path) as doc:
+        return [" ".join(page.get_text().split()) for page in doc]
+
+
+def page_contents(path: str) -> list[bytes]:
+    """Decoded content streams of every page of *path*."""
+    with fitz.open(path) as doc:
+        return [page.read_contents() for page in doc]
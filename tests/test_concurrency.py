@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from mechanisms import concurrency
+from mechanisms.concurrency import AdaptiveLimiter, SystemSample, max_concurrency
+
+MB = 1024 * 1024
+PLENTY = 8192 * MB
+
+
+@pytest.fixture
+def cores(monkeypatch):
+    monkeypatch.setattr(concurrency.os, "cpu_count", lambda: 2)
+    return 2
+
+
+def _limiter(limit, active=None, waiting=1, in_use=100 * MB):
+    """Limiter at *limit* with every slot busy and files waiting."""
+    limiter = AdaptiveLimiter(max_workers=8, initial=limit, memory_in_use=lambda: 0)
+    limiter._memory_in_use = lambda: in_use
+    limiter._active = limit if active is None else active
+    limiter._waiting = waiting
+    return limiter
+
+
+def test_default_bound_leaves_room_above_the_cores(cores):
+    assert max_concurrency() > cores
+
+
+def test_high_iowait_adds_a_file(cores):
+    limiter = _limiter(cores)
+    limiter._adjust(SystemSample(cpu_busy=0.9, iowait=0.4, free_bytes=PLENTY))
+    assert limiter.limit == cores + 1
+    assert limiter.adjustments[-1][3] == "attente d'entrées/sorties élevée"
+
+
+def test_idle_cpu_adds_a_file(cores):
+    limiter = _limiter(1)
+    limiter._adjust(SystemSample(cpu_busy=0.3, iowait=0.0, free_bytes=PLENTY))
+    assert limiter.limit == 2
+    assert limiter.adjustments[-1][3] == "processeur disponible"
+
+
+def test_saturated_cpu_removes_oversubscribed_files(cores):
+    limiter = _limiter(cores + 2)
+    limiter._adjust(SystemSample(cpu_busy=0.99, iowait=0.01, free_bytes=PLENTY))
+    assert limiter.limit == cores + 1
+    assert limiter.adjustments[-1][3] == "processeur saturé"
+
+
+def test_low_memory_removes_a_file(cores):
+    limiter = _limiter(3)
+    limiter._adjust(SystemSample(cpu_busy=0.3, iowait=0.4, free_bytes=100 * MB))
+    assert limiter.limit == 2
+    assert limiter.adjustments[-1][3] == "mémoire libre insuffisante"
+
+
+def test_no_growth_when_another_file_would_not_fit(cores):
+    limiter = _limiter(1, in_use=600 * MB)
+    limiter._adjust(SystemSample(cpu_busy=0.3, iowait=0.4, free_bytes=1024 * MB))
+    assert limiter.limit == 1
+    assert not limiter.adjustments
+
+
+def test_no_growth_without_waiting_files(cores):
+    limiter = _limiter(1, waiting=0)
+    limiter._adjust(SystemSample(cpu_busy=0.1, iowait=0.5, free_bytes=PLENTY))
+    assert limiter.limit == 1
+
+
+def test_adaptive_batch_gets_lanes_above_the_cores(make_pdf, tmp_path, monkeypatch):
+    from mechanisms import watermark_processor
+    from mechanisms.worker_pool import WorkerPool
+
+    limiters = []
+
+    class Recording(AdaptiveLimiter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            limiters.append(self)
+
+    monkeypatch.setattr(watermark_processor, "AdaptiveLimiter", Recording)
+    pool = WorkerPool(max_concurrency())
+    try:
+        engine = watermark_processor.WatermarkProcessor(stamp_enabled=False, worker_pool=pool)
+        pairs = [
+            (make_pdf(f"in{number}.pdf", [["Corps"]]), str(tmp_path / f"out{number}.pdf"))
+            for number in range(max_concurrency() + 1)
+        ]
+        assert engine.process_files(pairs, "", "", adaptive=True)
+    finally:
+        pool.shutdown()
+    assert limiters[0].max_workers == max_concurrency() > (os.cpu_count() or 1)
+    assert all(os.path.exists(output) for _, output in pairs)
@@ -0,0 +1,59 @@
+"""Regression suite: every rule of the engine on a generated corpus."""
+
+import os
+
+import pytest
+
+from corpus import FOOTER, NAME, default_cases, page_contents, page_texts
+from mechanisms.watermark_processor import WatermarkProcessor
+
+CASES = default_cases()
+
+
+@pytest.fixture(scope="module")
+def corpus_dir(tmp_path_factory):
+    folder = str(tmp_path_factory.mktemp("corpus"))
+    for case in CASES:
+        case.build(folder)
+    return folder
+
+
+def _clean(source, output, **settings):
+    # The identification mention changes with the clock: leave it out
+    engine = WatermarkProcessor(stamp_enabled=False, **settings)
+    assert engine.remove_watermark_by_structure(source, output, NAME, FOOTER, notify=False)
+    return output
+
+
+@pytest.mark.parametrize("case", CASES, ids=repr)
+def test_case_output_text(case, corpus_dir, tmp_path):
+    output = _clean(os.path.join(corpus_dir, case.file_name), str(tmp_path / case.file_name))
+
+    texts = page_texts(output)
+    assert len(texts) == len(case.pages)
+    for number, text in enumerate(texts, start=1):
+        assert f"Corps du document page {number}" in text
+        for needle in case.kept:
+            assert needle in text, f"page {number}: {needle!r} removed"
+        for needle in case.removed:
+            assert needle not in text, f"page {number}: {needle!r} still present"
+
+
+@pytest.mark.parametrize("case", CASES, ids=repr)
+def test_classification_never_changes_the_output(case, corpus_dir, tmp_path):
+    source = os.path.join(corpus_dir, case.file_name)
+    classified = _clean(source, str(tmp_path / "classified.pdf"))
+    unclassified = _clean(source, str(tmp_path / "unclassified.pdf"), classify_pages=False)
+    assert page_contents(classified) == page_contents(unclassified)
+
+
+@pytest.mark.parametrize("settings", [
+    {"mmap_input": True},
+    {"object_streams": True},
+    {"shard_min_pages": 2},
+], ids=lambda settings: next(iter(settings)))
+def test_engine_options_never_change_the_output(settings, corpus_dir, tmp_path):
+    source = os.path.join(corpus_dir, "mixed.pdf")
+    reference = _clean(source, str(tmp_path / "reference.pdf"))
+    variant = _clean(source, str(tmp_path / "variant.pdf"), **settings)
+    assert page_contents(variant) == page_contents(reference)
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from mechanisms.cancellation import CancellationToken
+from mechanisms.dedup import find_duplicates, materialize_duplicates
+
+
+@pytest.fixture
+def batch(tmp_path):
+    """Three inputs of the same size, two of them identical."""
+    contents = {"a.pdf": b"%PDF-1.7 A", "b.pdf": b"%PDF-1.7 A", "c.pdf": b"%PDF-1.7 C"}
+    (tmp_path / "out").mkdir()
+    pairs = []
+    for name, data in contents.items():
+        (tmp_path / name).write_bytes(data)
+        pairs.append((str(tmp_path / name), str(tmp_path / "out" / name)))
+    return pairs
+
+
+def test_identical_inputs_are_grouped(batch):
+    groups = find_duplicates(batch)
+    assert [group.primary for group in groups] == [batch[0], batch[2]]
+    assert groups[0].duplicates == [batch[1]]
+    assert groups[1].duplicates == []
+
+
+def test_unreadable_input_gets_its_own_group(batch, tmp_path):
+    missing = (str(tmp_path / "absent.pdf"), str(tmp_path / "out" / "absent.pdf"))
+    groups = find_duplicates(batch + [missing, missing])
+    assert [group.primary for group in groups][-2:] == [missing, missing]
+
+
+def test_duplicates_of_a_processed_primary_are_materialised(batch):
+    groups = find_duplicates(batch)
+    with open(batch[0][1], "wb") as fh:
+        fh.write(b"%PDF-1.7 cleaned")
+    done = []
+    stats = materialize_duplicates(groups, {batch[0][0]}, lambda path, ok: done.append((path, ok)))
+    assert done == [(batch[1][0], True)]
+    with open(batch[1][1], "rb") as fh:
+        assert fh.read() == b"%PDF-1.7 cleaned"
+    assert (stats.unique, stats.duplicates, stats.bytes_saved) == (2, 1, len(b"%PDF-1.7 A"))
+    assert sum(stats.methods.values()) == 1
+
+
+def test_duplicates_of_a_failed_primary_fail(batch):
+    done = []
+    stats = materialize_duplicates(find_duplicates(batch), set(), lambda path, ok: done.append((path, ok)))
+    assert done == [(batch[1][0], False)]
+    assert not os.path.exists(batch[1][1])
+    assert stats.duplicates == 0
+
+
+def test_duplicates_of_a_cancelled_primary_are_skipped(batch):
+    token = CancellationToken()
+    token.cancel()
+    done = []
+    materialize_duplicates(
+        find_duplicates(batch), set(), lambda path, ok: done.append((path, ok)), cancel_token=token,
+    )
+    assert done == []
+    assert not os.path.exists(batch[1][1])
+
+
+def test_existing_output_is_replaced_not_written_through(tmp_path):
+    from mechanisms.dedup import link_or_copy
+
+    source, target = tmp_path / "primaire.pdf", tmp_path / "copie.pdf"
+    source.write_bytes(b"%PDF nouveau")
+    target.write_bytes(b"%PDF ancien")
+    other = tmp_path / "autre.pdf"
+    os.link(target, other)  # an earlier hard-linked output
+
+    link_or_copy(str(source), str(target))
+    assert target.read_bytes() == b"%PDF nouveau"
+    assert other.read_bytes() == b"%PDF ancien"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["autre.pdf", "copie.pdf", "primaire.pdf"]
+
+
+def test_failed_link_keeps_the_previous_output(tmp_path, monkeypatch):
+    from mechanisms import dedup
+
+    source, target = tmp_path / "primaire.pdf", tmp_path / "copie.pdf"
+    source.write_bytes(b"%PDF nouveau")
+    target.write_bytes(b"%PDF ancien")
+
+    def fail(*_args, **_kwargs):
+        raise OSError("disque plein")
+
+    monkeypatch.setattr(dedup.os, "link", fail)
+    monkeypatch.setattr(dedup.shutil, "copy2", fail)
+    with pytest.raises(OSError):
+        dedup.link_or_copy(str(source), str(target))
+    assert target.read_bytes() == b"%PDF ancien"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["copie.pdf", "primaire.pdf"]
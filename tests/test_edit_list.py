@@ -0,0 +1,38 @@
+from mechanisms.edit_list import EditList
+
+
+def _apply(edits, content=b"0123456789"):
+    edit_list = EditList()
+    for edit in edits:
+        edit_list.add(*edit)
+    return edit_list.apply(content)
+
+
+def test_no_edit_returns_the_content_itself():
+    content = b"BT (texte) Tj ET"
+    assert EditList().apply(content) is content
+
+
+def test_edits_are_applied_in_offset_order():
+    assert _apply([(6, 8, b"b"), (1, 3, b"a")]) == b"0a345b89"
+
+
+def test_first_start_wins_an_overlap():
+    assert _apply([(4, 8, b"y"), (2, 6, b"x")]) == b"01x6789"
+
+
+def test_widest_edit_wins_when_starts_tie():
+    assert _apply([(2, 4, b"x"), (2, 7, b"y")]) == b"01y789"
+
+
+def test_contained_edits_are_dropped():
+    # A whole BT … ET block removed by one rule, hits inside it by others
+    assert _apply([(3, 4, b"a"), (1, 9), (5, 7, b"b")]) == b"09"
+
+
+def test_adjacent_edits_are_both_kept():
+    assert _apply([(0, 2, b"a"), (2, 4, b"b")]) == b"ab456789"
+
+
+def test_insertion_at_an_offset():
+    assert _apply([(5, 5, b"-")]) == b"01234-56789"
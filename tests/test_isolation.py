@@ -0,0 +1,64 @@
+import fitz  # PyMuPDF
+import pytest
+
+from mechanisms.isolation import (
+    QUARANTINE_FOLDER, QUARANTINE_LOG, IsolatedRunner, IsolationLimits, Quarantine,
+)
+
+np = pytest.importorskip("numpy")
+
+
+def _scan_pdf(path, pages=12, width=1200, height=1600):
+    pixels = np.full((height, width, 3), 235, np.uint8)
+    for row in range(600):
+        pixels[400 + row, 300 + row:360 + row] = (230, 20, 20)
+    doc = fitz.open()
+    for number in range(pages):
+        pixels[0, 0] = (number, number, number)  # one distinct image per page
+        page = doc.new_page()
+        page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csRGB, width, height, pixels.tobytes(), False))
+    doc.save(str(path), deflate=True)
+    return str(path)
+
+
+def test_long_raster_phase_is_not_a_stuck_page(tmp_path):
+    source = _scan_pdf(tmp_path / "scan.pdf")
+    output = str(tmp_path / "out" / "scan.pdf")
+    (tmp_path / "out").mkdir()
+    # Far shorter than the whole raster phase, longer than one image
+    runner = IsolatedRunner({"stamp_enabled": False}, IsolationLimits(page_seconds=0.3))
+    try:
+        assert runner.process(source, output, "JEAN DUPONT", "", raster=True) is True
+    finally:
+        runner.close()
+    assert runner.quarantine.entries == []
+
+
+def test_file_limit_still_quarantines(tmp_path):
+    source = _scan_pdf(tmp_path / "scan.pdf", pages=4)
+    output = str(tmp_path / "scan_out.pdf")
+    runner = IsolatedRunner({}, IsolationLimits(file_seconds=0.01))
+    try:
+        assert runner.process(source, output, "JEAN DUPONT", "", raster=True) is False
+    finally:
+        runner.close()
+    assert [name for name, _ in runner.quarantine.entries] == ["scan.pdf"]
+
+
+def test_quarantine_keeps_inputs_sharing_a_name(tmp_path):
+    quarantine = Quarantine()
+    for client, reason in (("client_a", "délai"), ("client_b", "mémoire")):
+        (tmp_path / client).mkdir()
+        source = tmp_path / client / "facture.pdf"
+        source.write_bytes(client.encode())
+        quarantine.add(str(source), str(tmp_path / "sortie" / "facture.pdf"), reason)
+
+    folder = tmp_path / "sortie" / QUARANTINE_FOLDER
+    assert quarantine.entries == [("facture.pdf", "délai"), ("facture (2).pdf", "mémoire")]
+    assert (folder / "facture.pdf").read_bytes() == b"client_a"
+    assert (folder / "facture (2).pdf").read_bytes() == b"client_b"
+    lines = (folder / QUARANTINE_LOG).read_text(encoding="utf-8").splitlines()
+    assert [line.split("\t")[1:] for line in lines] == [
+        ["facture.pdf", str(tmp_path / "client_a" / "facture.pdf"), "délai"],
+        ["facture (2).pdf", str(tmp_path / "client_b" / "facture.pdf"), "mémoire"],
+    ]
@@ -0,0 +1,48 @@
+import threading
+
+import fitz  # PyMuPDF
+import pytest
+
+from mechanisms.job_queue import DONE, Job, JobQueue
+from mechanisms.watermark_processor import WatermarkProcessor
+
+
+def _wait(queue, job, timeout=30):
+    finished = threading.Event()
+    queue.on_update = lambda updated: finished.set() if updated is job and job.finished else None
+    if not job.finished:
+        assert finished.wait(timeout)
+
+
+def test_configured_copy_leaves_the_engine_untouched():
+    engine = WatermarkProcessor(stamp_enabled=True, object_streams=False)
+    copy = engine.configured(stamp_enabled=False, object_streams=True)
+    assert (copy.stamp_enabled, copy.object_streams) == (False, True)
+    assert (engine.stamp_enabled, engine.object_streams) == (True, False)
+
+
+def test_configured_rejects_unknown_settings():
+    with pytest.raises(TypeError):
+        WatermarkProcessor().configured(stamp=False)
+
+
+def test_job_keeps_the_settings_it_was_created_with(make_pdf, tmp_path):
+    source = make_pdf("in.pdf", [["Corps du document"]])
+    output = str(tmp_path / "out.pdf")
+    engine = WatermarkProcessor(stamp_enabled=True)
+    queue = JobQueue(engine, max_workers=1)
+    gate = threading.Event()
+    queue._executor.submit(gate.wait)  # holds the job pending
+
+    job = queue.submit(Job(
+        source, output, "JEAN DUPONT", single_file=True,
+        settings={"stamp_enabled": False},
+    ))
+    engine.stamp_enabled = True  # changed after submission
+    gate.set()
+    _wait(queue, job)
+    queue.shutdown()
+
+    assert job.status == DONE
+    with fitz.open(output) as doc:
+        assert "Traité par" not in doc[0].get_text()
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from mechanisms.manifest import DEFAULT_FOOTER, ManifestError, group_by_parameters, load_manifest
+
+
+def _manifest(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_csv_with_semicolons_and_relative_paths(tmp_path):
+    path = _manifest(tmp_path, "lot.csv", (
+        "Input;Output;Name;Priority\n"
+        "a.pdf;sortie/a.pdf;JEAN DUPONT;2\n"
+        "\n"
+        "b.pdf;sortie/b.pdf;MARIE MARTIN;\n"
+    ))
+    entries = load_manifest(path)
+    assert [entry.pair for entry in entries] == [
+        (str(tmp_path / "a.pdf"), os.path.normpath(str(tmp_path / "sortie" / "a.pdf"))),
+        (str(tmp_path / "b.pdf"), os.path.normpath(str(tmp_path / "sortie" / "b.pdf"))),
+    ]
+    assert [entry.name_pattern for entry in entries] == ["JEAN DUPONT", "MARIE MARTIN"]
+    assert [entry.priority for entry in entries] == [2, 0]
+
+
+def test_footer_defaults_when_absent_and_empty_disables_it(tmp_path):
+    path = _manifest(tmp_path, "lot.jsonl", (
+        '{"input": "a.pdf", "output": "x/a.pdf", "name": "JEAN DUPONT"}\n'
+        '{"input": "b.pdf", "output": "x/b.pdf", "name": "JEAN DUPONT", "footer": ""}\n'
+        '{"input": "c.pdf", "output": "x/c.pdf", "name": "JEAN DUPONT", "footer": null}\n'
+    ))
+    entries = load_manifest(path)
+    assert [entry.footer_pattern for entry in entries] == [DEFAULT_FOOTER, "", ""]
+    assert [len(group) for group in group_by_parameters(entries).values()] == [1, 2]
+
+
+@pytest.mark.parametrize("name, text, message", [
+    ("lot.jsonl", '{"input": "a.pdf", "output": "b.pdf"}\n{input: 1}\n', "ligne 2 : JSON invalide"),
+    ("lot.jsonl", '["a.pdf", "b.pdf"]\n', "ligne 1 : un objet JSON est attendu"),
+    ("lot.jsonl", '{"input": "a.pdf"}\n', "« input » et « output » sont obligatoires"),
+    ("lot.csv", "input,output\na.pdf,\n", "« input » et « output » sont obligatoires"),
+    ("lot.csv", "input,output,priority\na.pdf,b.pdf,haute\n", "priorité « haute » invalide"),
+    ("lot.csv", "input,output\na.pdf,b.pdf\nc.pdf,./b.pdf\n", "même fichier de sortie qu'à la ligne 2"),
+    ("lot.csv", "input,output\n", "aucun fichier à traiter"),
+    ("lot.jsonl", "\n\n", "aucun fichier à traiter"),
+])
+def test_invalid_manifests_are_rejected(tmp_path, name, text, message):
+    with pytest.raises(ManifestError, match=message):
+        load_manifest(_manifest(tmp_path, name, text))
+
+
+def test_missing_manifest_is_a_manifest_error(tmp_path):
+    with pytest.raises(ManifestError, match="Impossible de lire"):
+        load_manifest(str(tmp_path / "absent.csv"))
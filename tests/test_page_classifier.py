@@ -0,0 +1,49 @@
+import fitz  # PyMuPDF
+import pytest
+
+from corpus import _BODY, _FOOTER, _NAME, FOOTER, NAME, CorpusCase, page_texts
+from mechanisms import page_classifier
+from mechanisms.watermark_processor import WatermarkProcessor
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Watermarks on the second and fourth pages only."""
+    pages = [[_BODY], [_BODY + _NAME], [_BODY], [_BODY + _FOOTER]]
+    return CorpusCase("doc", pages).build(str(tmp_path))
+
+
+def test_only_selected_pages_are_cached(source):
+    doc = fitz.open(source)
+    classification = page_classifier.classify_pages(doc, NAME, FOOTER)
+    assert list(classification.selected) == [1, 3]
+    selected_streams = {xref for page in (1, 3) for xref in doc[page].get_contents()}
+    assert set(classification.contents) == selected_streams
+
+
+def test_cache_is_bounded(source, monkeypatch):
+    doc = fitz.open(source)
+    first = doc.xref_stream(doc[1].get_contents()[0])
+    monkeypatch.setattr(page_classifier, "CACHE_BYTES", len(first))
+    classification = page_classifier.classify_pages(doc, NAME, FOOTER)
+    assert list(classification.selected) == [1, 3]
+    assert sum(map(len, classification.contents.values())) <= len(first)
+
+
+def test_rule_pass_consumes_the_cache(source, tmp_path, monkeypatch):
+    engine = WatermarkProcessor(stamp_enabled=False)
+    reference = str(tmp_path / "reference.pdf")
+    assert engine.remove_watermark_by_structure(
+        source, reference, NAME, FOOTER, notify=False,
+    )
+
+    doc = fitz.open(source)
+    monkeypatch.setattr(page_classifier, "CACHE_BYTES", 1)  # nothing fits
+    report = engine.process_document(doc, NAME, FOOTER)
+    assert report.modified_pages == [1, 3]
+    assert report.classification.contents == {}
+    output = str(tmp_path / "bounded.pdf")
+    doc.save(output, garbage=4, deflate=True)
+    assert page_texts(output) == page_texts(reference)
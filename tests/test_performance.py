@@ -0,0 +1,73 @@
+"""Relative performance checks, opt-in: ``WATERMARK_BENCHMARK=1 python -m pytest tests``.
+
+Every threshold compares two measurements taken in the same run on the
+same machine, never a recorded absolute time.
+"""
+
+import os
+import statistics
+import time
+
+import pytest
+
+from corpus import FOOTER, NAME, clean_case, mixed_case
+from mechanisms.watermark_processor import WatermarkProcessor
+
+pytestmark = pytest.mark.benchmark
+
+ROUNDS = 5
+TOLERANCE = 1.5  # a variant may be this much slower than its reference
+
+
+def _median_seconds(source, output, rounds=ROUNDS, **settings):
+    engine = WatermarkProcessor(stamp_enabled=False, **settings)
+    seconds = []
+    # One unmeasured round first: first-use costs and a warm page cache
+    for _ in range(rounds + 1):
+        started = time.perf_counter()
+        assert engine.remove_watermark_by_structure(source, output, NAME, FOOTER, notify=False)
+        seconds.append(time.perf_counter() - started)
+    return statistics.median(seconds[1:])
+
+
+@pytest.fixture(scope="module")
+def documents(tmp_path_factory):
+    folder = str(tmp_path_factory.mktemp("bench"))
+    cases = (mixed_case(30), mixed_case(300), clean_case(300))
+    return {case.name: case.build(folder) for case in cases}
+
+
+def test_time_grows_linearly_with_pages(documents, tmp_path):
+    small = _median_seconds(documents["mixed30"], str(tmp_path / "small.pdf"))
+    large = _median_seconds(documents["mixed300"], str(tmp_path / "large.pdf"))
+    assert large <= 10 * small * TOLERANCE, f"30 pages {small:.3f}s, 300 pages {large:.3f}s"
+
+
+def test_classification_overhead_on_clean_pages(documents, tmp_path):
+    # Clean pages are where classification pays off; it must never cost more
+    output = str(tmp_path / "out.pdf")
+    classified = _median_seconds(documents["clean300"], output)
+    unclassified = _median_seconds(documents["clean300"], output, classify_pages=False)
+    assert classified <= unclassified * TOLERANCE, (
+        f"{classified:.3f}s with classification, {unclassified:.3f}s without"
+    )
+
+
+@pytest.mark.parametrize("settings", [
+    {"mmap_input": True},
+    {"object_streams": True},
+    {"linearize": True},
+], ids=lambda settings: next(iter(settings)))
+def test_io_options(settings, documents, tmp_path):
+    reference_output = str(tmp_path / "reference.pdf")
+    variant_output = str(tmp_path / "variant.pdf")
+    reference = _median_seconds(documents["mixed300"], reference_output)
+    variant = _median_seconds(documents["mixed300"], variant_output, **settings)
+    size, reference_size = os.path.getsize(variant_output), os.path.getsize(reference_output)
+    print(
+        f"{next(iter(settings))}: {variant:.3f}s ({reference:.3f}s standard), "
+        f"{size} bytes ({reference_size} standard)"
+    )
+    assert variant <= reference * TOLERANCE
+    if settings.get("object_streams"):
+        assert size <= reference_size
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from corpus import FOOTER, NAME, mixed_case, page_texts
+from mechanisms.cancellation import CancellationToken
+from mechanisms.pipeline import run_pipeline
+from mechanisms.watermark_processor import WatermarkProcessor
+
+
+@pytest.fixture
+def batch(tmp_path):
+    """Four watermarked inputs and their outputs."""
+    source = mixed_case(2).build(str(tmp_path))
+    pairs = []
+    for number in range(4):
+        input_path = str(tmp_path / f"in{number}.pdf")
+        with open(source, "rb") as src, open(input_path, "wb") as dst:
+            dst.write(src.read())
+        pairs.append((input_path, str(tmp_path / f"out{number}.pdf")))
+    return pairs
+
+
+def _run(pairs, processor=None, **kwargs):
+    done = []
+    metrics = run_pipeline(
+        processor or WatermarkProcessor(stamp_enabled=False), pairs, NAME, FOOTER,
+        lambda path, success: done.append((path, success)), prefetch=2, **kwargs,
+    )
+    return done, metrics
+
+
+def test_every_file_is_written(batch):
+    done, metrics = _run(batch)
+    assert sorted(done) == sorted((input_path, True) for input_path, _ in batch)
+    assert [stage.items for stage in metrics.stages] == [4, 4, 4]
+    for _, output_path in batch:
+        assert all(NAME not in text for text in page_texts(output_path))
+
+
+def test_unreadable_input_fails_alone(batch):
+    os.remove(batch[1][0])
+    done, _ = _run(batch)
+    assert sorted(done) == sorted(
+        (input_path, number != 1) for number, (input_path, _) in enumerate(batch)
+    )
+    assert not os.path.exists(batch[1][1])
+
+
+def test_write_behind_error_fails_that_file_only(batch):
+    os.mkdir(batch[2][1])  # the output path is taken by a folder
+    done, metrics = _run(batch)
+    assert sorted(done) == sorted(
+        (input_path, number != 2) for number, (input_path, _) in enumerate(batch)
+    )
+    assert metrics.write.items == 4
+    assert os.path.isdir(batch[2][1])
+    assert all(os.path.isfile(output) for number, (_, output) in enumerate(batch) if number != 2)
+
+
+def test_cancellation_stops_processing_and_flushes_finished_files(batch):
+    token = CancellationToken()
+
+    class CancelOnSecondFile(WatermarkProcessor):
+        calls = 0
+
+        def process_document(self, *args, **kwargs):
+            self.calls += 1
+            if self.calls == 2:
+                token.cancel()
+            return super().process_document(*args, **kwargs)
+
+    processor = CancelOnSecondFile(stamp_enabled=False)
+    done, metrics = _run(batch, processor, cancel_token=token)
+    assert done == [(batch[0][0], True)]
+    assert processor.calls == 2
+    assert metrics.write.items == 1
+    assert [os.path.exists(output) for _, output in batch] == [True, False, False, False]
+
+
+def test_cancelled_before_start_writes_nothing(batch):
+    token = CancellationToken()
+    token.cancel()
+    done, _ = _run(batch, cancel_token=token)
+    assert done == []
+    assert not any(os.path.exists(output) for _, output in batch)
@@ -0,0 +1,63 @@
+import json
+import threading
+import time
+
+from mechanisms import profiling
+from mechanisms.watermark_processor import WatermarkProcessor
+
+
+def test_profiled_file_writes_its_reports(make_pdf, tmp_path):
+    source = make_pdf("lent.pdf", [["Corps"], ["Copie de JEAN DUPONT"]])
+    output = str(tmp_path / "out.pdf")
+    engine = WatermarkProcessor(stamp_enabled=False, profile_patterns=["lent*.pdf"])
+    assert engine.remove_watermark_by_structure(source, output, "JEAN DUPONT", "", notify=False)
+    with open(output + ".profile.json", encoding="utf-8") as fh:
+        summary = json.load(fh)
+    assert summary["pages"] == 2 and summary["scope"] == ""
+    assert "rules" in summary["phases"]
+    assert "Phase dominante" in profiling.format_summary(output)
+
+
+def test_unmatched_file_is_not_profiled(make_pdf, tmp_path):
+    source = make_pdf("rapide.pdf", [["Corps"]])
+    output = str(tmp_path / "out.pdf")
+    engine = WatermarkProcessor(stamp_enabled=False, profile_patterns=["lent*.pdf"])
+    assert engine.remove_watermark_by_structure(source, output, "", "", notify=False)
+    assert not (tmp_path / "out.pdf.profile.json").exists()
+
+
+def test_profiled_document_runs_alone(tmp_path):
+    events = []
+    lock = threading.Lock()
+
+    def log(event):
+        with lock:
+            events.append(event)
+
+    assert profiling.begin_document("autre.pdf", "o.pdf", ["lent*.pdf"]) is None
+    log("autre:start")
+
+    def profiled():
+        profiler = profiling.begin_document("lent.pdf", str(tmp_path / "lent.pdf"), ["lent*.pdf"])
+        log("lent:start")
+        time.sleep(0.05)
+        log("lent:end")
+        profiling.end_document(profiler)
+
+    def late():
+        time.sleep(0.02)  # arrives while the profiled document waits
+        assert profiling.begin_document("tard.pdf", "t.pdf", ["lent*.pdf"]) is None
+        log("tard:start")
+        profiling.end_document(None)
+
+    threads = [threading.Thread(target=profiled), threading.Thread(target=late)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    log("autre:end")
+    profiling.end_document(None)
+    for thread in threads:
+        thread.join(5)
+
+    assert events == ["autre:start", "autre:end", "lent:start", "lent:end", "tard:start"]
+    assert (tmp_path / "lent.pdf.profile.json").exists()
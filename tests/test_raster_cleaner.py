@@ -0,0 +1,84 @@
+import fitz  # PyMuPDF
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mechanisms.raster_cleaner import clean_raster_pages  # noqa: E402
+
+
+def _scan(width=600, height=800):
+    """RGB scan: grey paper noise, black text band, red diagonal, blue footer."""
+    rng = np.random.default_rng(0)
+    pixels = np.full((height, width, 3), 235, np.uint8)
+    pixels += rng.integers(0, 20, pixels.shape, dtype=np.uint8)
+    pixels[100:130, 50:550] = (20, 20, 20)
+    for row in range(300):
+        pixels[200 + row, 150 + row:180 + row] = (230, 20, 20)
+    pixels[750:765, 50:450] = (20, 20, 220)
+    return fitz.Pixmap(fitz.csRGB, width, height, pixels.tobytes(), False)
+
+
+def _coloured_pixels(pix):
+    rgb = np.frombuffer(pix.samples, np.uint8).reshape(pix.height, pix.width, pix.n)
+    rgb = rgb[..., :3].astype(int)
+    red = rgb[..., 0] - np.maximum(rgb[..., 1], rgb[..., 2]) > 60
+    blue = rgb[..., 2] - np.maximum(rgb[..., 0], rgb[..., 1]) > 60
+    return int(np.count_nonzero(red | blue))
+
+
+def test_jpeg_scan_stays_jpeg_and_keeps_its_soft_mask():
+    scan = _scan()
+    mask = fitz.Pixmap(fitz.csGRAY, scan.width, scan.height, bytes([255]) * scan.width * scan.height, False)
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, stream=scan.tobytes("jpeg", jpg_quality=85), mask=mask.tobytes("png"))
+    xref = page.get_images(full=True)[0][0]
+    smask = doc.xref_get_key(xref, "SMask")
+    size = len(doc.xref_stream_raw(xref))
+    contents = page.get_contents()
+
+    assert clean_raster_pages(doc) == [0]
+
+    assert doc.xref_get_key(xref, "Filter") == ("name", "/DCTDecode")
+    assert doc.xref_get_key(xref, "SMask") == smask
+    assert len(doc.xref_stream_raw(xref)) < 2 * size
+    assert doc[0].get_contents() == contents
+    cleaned = fitz.Pixmap(doc, xref)
+    assert _coloured_pixels(cleaned) < _coloured_pixels(scan) // 100
+
+
+def test_lossless_scan_is_stored_flate_compressed():
+    scan = _scan()
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=scan)
+    xref = page.get_images(full=True)[0][0]
+
+    assert clean_raster_pages(doc) == [0]
+
+    assert doc.xref_get_key(xref, "Filter") == ("name", "/FlateDecode")
+    assert _coloured_pixels(fitz.Pixmap(doc, xref)) == 0
+
+
+def test_cmyk_image_is_declared_rgb_after_cleaning():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csCMYK, _scan()))
+    xref = page.get_images(full=True)[0][0]
+
+    assert clean_raster_pages(doc) == [0]
+
+    assert doc.xref_get_key(xref, "ColorSpace") == ("name", "/DeviceRGB")
+    assert fitz.Pixmap(doc, xref).n == 3
+
+
+def test_image_without_watermark_is_untouched():
+    pixels = np.full((200, 200, 3), 240, np.uint8)
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csRGB, 200, 200, pixels.tobytes(), False))
+    xref = page.get_images(full=True)[0][0]
+    raw = doc.xref_stream_raw(xref)
+
+    assert clean_raster_pages(doc) == []
+    assert doc.xref_stream_raw(xref) == raw
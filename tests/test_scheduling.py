@@ -0,0 +1,54 @@
+import fitz  # PyMuPDF
+
+from mechanisms.isolation import IsolatedRunner
+from mechanisms.scheduling import largest_first, split_pages
+
+_NAME = b"q 0 0 0 rg BT /helv 12 Tf 72 650 Td (Copie de JEAN DUPONT) Tj ET Q\n"
+
+
+def _named_pdf(path, pages):
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 700), "Corps du document")
+        xref = page.get_contents()[-1]
+        doc.update_stream(xref, doc.xref_stream(xref) + b"\n" + _NAME)
+    doc.save(str(path))
+    return str(path)
+
+
+def test_largest_first(tmp_path):
+    sizes = {"small.pdf": 10, "big.pdf": 1000, "mid.pdf": 100}
+    pairs = []
+    for name, size in sizes.items():
+        (tmp_path / name).write_bytes(b"x" * size)
+        pairs.append((str(tmp_path / name), name))
+    assert [out for _, out in largest_first(pairs)] == ["big.pdf", "mid.pdf", "small.pdf"]
+
+
+def test_split_pages_keeps_shared_streams_together():
+    doc = fitz.open()
+    for _ in range(6):
+        doc.new_page().insert_text((72, 72), "x")
+    shared = doc[0].get_contents()[0]
+    doc.xref_set_key(doc[3].xref, "Contents", f"{shared} 0 R")
+
+    groups = split_pages(doc, list(range(6)), 3)
+    assert sorted(page for group in groups for page in group) == list(range(6))
+    assert any({0, 3} <= set(group) for group in groups)
+    assert all(group == sorted(group) for group in groups)
+
+
+def test_isolated_worker_does_not_shard(tmp_path):
+    source = _named_pdf(tmp_path / "named.pdf", 4)
+    output = str(tmp_path / "named_out.pdf")
+    # Isolated workers are daemonic processes, which cannot start the
+    # shard pool: the document must be cleaned in the worker itself
+    runner = IsolatedRunner({"shard_min_pages": 1, "stamp_enabled": False})
+    try:
+        assert runner.process(source, output, "JEAN DUPONT", "") is True
+    finally:
+        runner.close()
+    assert runner.quarantine.entries == []
+    with fitz.open(output) as doc:
+        assert all("JEAN DUPONT" not in page.get_text() for page in doc)
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from mechanisms.scratch import _HOST, SCRATCH_PREFIX, ScratchSpace, cleanup_stale, reserve_output_path
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_cleanup_removes_only_abandoned_directories(tmp_path):
+    dead = tmp_path / f"{SCRATCH_PREFIX}{_HOST}-{_dead_pid()}-abc"
+    live = tmp_path / f"{SCRATCH_PREFIX}{_HOST}-{os.getpid()}-abc"
+    remote = tmp_path / f"{SCRATCH_PREFIX}autre_poste-1234-abc"
+    remote_old = tmp_path / f"{SCRATCH_PREFIX}autre_poste-5678-abc"
+    unrelated = tmp_path / f"{SCRATCH_PREFIX}sans-pid"
+    for folder in (dead, live, remote, remote_old, unrelated):
+        folder.mkdir()
+        (folder / "travail.pdf").write_bytes(b"%PDF")
+    long_ago = time.time() - 2 * 24 * 3600
+    os.utime(remote_old, (long_ago, long_ago))
+
+    assert cleanup_stale(str(tmp_path)) == 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        path.name for path in (live, remote, unrelated)
+    )
+
+
+def test_reserved_names_are_numbered(tmp_path):
+    (tmp_path / "existant.pdf").write_bytes(b"%PDF")
+    assert reserve_output_path(str(tmp_path / "existant.pdf")) == str(tmp_path / "existant (2).pdf")
+    first = reserve_output_path(str(tmp_path / "nouveau.pdf"))
+    second = reserve_output_path(str(tmp_path / "nouveau.pdf"))
+    assert (first, second) == (str(tmp_path / "nouveau.pdf"), str(tmp_path / "nouveau (2).pdf"))
+
+
+def test_write_replaces_the_output_atomically(tmp_path):
+    output = tmp_path / "sortie.pdf"
+    output.write_bytes(b"ancien")
+    with ScratchSpace() as scratch:
+        scratch.write(b"nouveau", str(output))
+        assert output.read_bytes() == b"nouveau"
+        scratch_dirs = [path for path in tmp_path.iterdir() if path.name.startswith(SCRATCH_PREFIX)]
+        assert [list(path.iterdir()) for path in scratch_dirs] == [[]]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["sortie.pdf"]
+
+
+def test_failed_write_leaves_the_output_untouched(tmp_path):
+    output = tmp_path / "sortie.pdf"
+    output.write_bytes(b"ancien")
+    with ScratchSpace() as scratch:
+        with pytest.raises(TypeError):
+            scratch.write("pas des octets", str(output))
+        assert output.read_bytes() == b"ancien"
+        assert all(not list(path.iterdir()) for path in tmp_path.iterdir() if path.is_dir())
+
+
+def test_preserved_work_copy_survives_close(tmp_path):
+    output = tmp_path / "sortie.pdf"
+    with ScratchSpace() as scratch:
+        temp = scratch.temp_path(str(output))
+        with open(temp, "wb") as fh:
+            fh.write(b"%PDF partiel")
+        kept = scratch.preserve(temp)
+    assert os.path.dirname(kept) == str(tmp_path)
+    with open(kept, "rb") as fh:
+        assert fh.read() == b"%PDF partiel"
+    assert not output.exists()
+
+
+def test_folder_is_swept_once_per_process(tmp_path, monkeypatch):
+    from mechanisms import scratch as module
+
+    sweeps = []
+    monkeypatch.setattr(module, "cleanup_stale", lambda folder: sweeps.append(folder) or 0)
+    for number in range(3):
+        with ScratchSpace() as scratch:
+            scratch.write(b"%PDF", str(tmp_path / f"sortie{number}.pdf"))
+    assert sweeps == [str(tmp_path)]
@@ -0,0 +1,154 @@
+import os
+import time
+
+import pytest
+
+from mechanisms.shared_queue import SharedQueue
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "file")
+
+
+def _submit(queue, tmp_path, *names):
+    return queue.submit(
+        [(str(tmp_path / name), str(tmp_path / "sortie" / name)) for name in names], "JEAN DUPONT",
+    )
+
+
+def _age_lease(queue, task_id, seconds):
+    then = time.time() - seconds
+    os.utime(queue._lease_path(task_id), (then, then))
+
+
+def test_submitting_twice_queues_once(root, tmp_path):
+    queue = SharedQueue(root)
+    assert _submit(queue, tmp_path, "a.pdf", "b.pdf") == 2
+    assert _submit(queue, tmp_path, "a.pdf") == 0
+    assert queue.status().pending == 2
+
+
+def test_a_task_is_claimed_by_one_worker(root, tmp_path):
+    first, second = SharedQueue(root), SharedQueue(root)
+    _submit(first, tmp_path, "a.pdf")
+    task = first.claim()
+    assert task is not None and task.input_path == str(tmp_path / "a.pdf")
+    assert second.claim() is None
+    assert first.status().leased == 1
+
+
+def test_an_expired_lease_is_taken_over(root, tmp_path):
+    crashed, survivor = SharedQueue(root), SharedQueue(root, lease_seconds=10)
+    _submit(crashed, tmp_path, "a.pdf")
+    task = crashed.claim()
+    _age_lease(crashed, task.task_id, 60)
+    assert survivor.status().expired == 1
+
+    taken = survivor.claim()
+    assert taken is not None and taken.task_id == task.task_id
+    assert os.listdir(survivor.leases_dir) == [task.task_id + ".lease"]
+    assert survivor.status().leased == 1
+
+
+def test_a_renewed_lease_is_not_taken_over(root, tmp_path):
+    holder, other = SharedQueue(root, lease_seconds=10), SharedQueue(root, lease_seconds=10)
+    _submit(holder, tmp_path, "a.pdf")
+    task = holder.claim()
+    _age_lease(holder, task.task_id, 60)
+    holder.renew()
+    assert other.claim() is None
+
+
+def test_completed_tasks_are_counted_and_never_claimed_again(root, tmp_path):
+    queue = SharedQueue(root)
+    _submit(queue, tmp_path, "a.pdf", "b.pdf", "c.pdf")
+    queue.complete(queue.claim(), True, 1.0)
+    queue.complete(queue.claim(), False, 1.0)
+
+    status = queue.status()
+    assert (status.succeeded, len(status.failed), status.pending, status.unfinished) == (1, 1, 1, 1)
+    assert os.listdir(queue.leases_dir) == []
+    last = SharedQueue(root).claim()
+    assert last is not None
+    assert SharedQueue(root).claim() is None
+
+
+def test_worker_reuses_one_scratch_space(root, tmp_path):
+    from mechanisms.shared_queue import QueueWorker
+
+    class Recorder:
+        def __init__(self):
+            self.spaces = []
+
+        def remove_watermark_by_structure(self, *args, scratch=None, **kwargs):
+            self.spaces.append(scratch)
+            return True
+
+    queue = SharedQueue(root)
+    _submit(queue, tmp_path, "a.pdf", "b.pdf", "c.pdf")
+    recorder = Recorder()
+    assert QueueWorker(queue, recorder, workers=2).run() == 3
+    assert len(recorder.spaces) == 3 and recorder.spaces[0] is not None
+    assert len({id(space) for space in recorder.spaces}) == 1
+
+
+def test_stalled_holder_leaves_the_new_lease_alone(root, tmp_path):
+    stalled, survivor = SharedQueue(root), SharedQueue(root, lease_seconds=10)
+    _submit(stalled, tmp_path, "a.pdf")
+    task = stalled.claim()
+    _age_lease(stalled, task.task_id, 60)
+    assert survivor.claim().task_id == task.task_id
+
+    # The stalled worker wakes up: it must not renew nor remove the new lease
+    lease = survivor._lease_path(task.task_id)
+    _age_lease(survivor, task.task_id, 5)
+    before = os.path.getmtime(lease)
+    stalled.renew()
+    assert os.path.getmtime(lease) == before
+    assert stalled.lease_conflicts == 1
+    stalled.complete(task, True, 1.0)
+    assert os.path.exists(lease)
+    assert SharedQueue(root).status().succeeded == 1
+
+    survivor.renew()
+    assert os.path.getmtime(lease) > before
+    survivor.complete(task, True, 1.0)
+    assert os.listdir(survivor.leases_dir) == []
+
+
+def test_stalled_holder_completing_before_renewing(root, tmp_path):
+    stalled, survivor = SharedQueue(root), SharedQueue(root, lease_seconds=10)
+    _submit(stalled, tmp_path, "a.pdf")
+    task = stalled.claim()
+    _age_lease(stalled, task.task_id, 60)
+    survivor.claim()
+
+    stalled.complete(task, True, 1.0)
+    assert os.listdir(survivor.leases_dir) == [task.task_id + ".lease"]
+    assert stalled.lease_conflicts == 1
+    third = SharedQueue(root, lease_seconds=10)
+    assert third.claim() is None
+
+
+def test_late_give_back_is_counted(root, tmp_path, monkeypatch):
+    from mechanisms import shared_queue
+
+    breaker = SharedQueue(root, lease_seconds=10)
+    holder = SharedQueue(root, lease_seconds=10)
+    _submit(breaker, tmp_path, "a.pdf")
+    task = holder.claim()
+    lease = holder._lease_path(task.task_id)
+
+    def link_after_a_third_claim(source, target):
+        # A third worker claims the task while the lease is renamed away
+        SharedQueue(root)._try_lease(task.task_id)
+        raise FileExistsError(target)
+
+    monkeypatch.setattr(shared_queue.os, "link", link_after_a_third_claim)
+    # The lease looked expired to the breaker but was renewed meanwhile
+    assert not breaker._break_lease(task.task_id)
+    assert breaker.lease_conflicts == 1
+    assert os.path.exists(lease)
+    holder.renew()
+    assert holder.lease_conflicts == 1
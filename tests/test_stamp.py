@@ -0,0 +1,54 @@
+import fitz  # PyMuPDF
+
+from mechanisms.stamp import STAMP_NAME, IdentificationStamp
+
+
+def _stamp_pixels(page):
+    """Non-white pixels in the corner where the stamp is drawn."""
+    pix = page.get_pixmap(clip=fitz.Rect(0, 0, 120, 10), dpi=288, colorspace=fitz.csGRAY)
+    return sum(1 for value in pix.samples if value < 250)
+
+
+def _opaque_document(pages=1):
+    """Pages fully covered by a white fill, like a scan."""
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.draw_rect(page.rect, color=None, fill=(1, 1, 1))
+        page.insert_text((72, 300), "Corps du document")
+    return doc
+
+
+def test_stamp_is_visible_on_an_opaque_page():
+    doc = _opaque_document()
+    assert _stamp_pixels(doc[0]) == 0
+    assert IdentificationStamp("Traité par test").apply(doc) == 1
+    assert _stamp_pixels(doc[0]) > 0
+    assert "Corps du document" in doc[0].get_text()
+
+
+def test_stamp_survives_save_and_unbalanced_content(tmp_path):
+    doc = _opaque_document()
+    # Content leaving a transformation and a fill colour behind
+    doc[0].set_contents(doc[0].get_contents()[0])
+    xref = doc[0].get_contents()[0]
+    doc.update_stream(xref, doc.xref_stream(xref) + b"\nq 0.5 0 0 0.5 300 300 cm 1 0 0 rg\n")
+    IdentificationStamp("Traité par test").apply(doc)
+    doc.save(str(tmp_path / "out.pdf"))
+    reopened = fitz.open(str(tmp_path / "out.pdf"))
+    assert _stamp_pixels(reopened[0]) > 0
+    assert "Traité par test" in reopened[0].get_text()
+
+
+def test_form_and_streams_are_shared_across_pages():
+    doc = _opaque_document(pages=3)
+    IdentificationStamp().apply(doc)
+    forms = {
+        doc.xref_get_key(doc[number].xref, f"Resources/XObject/{STAMP_NAME}")[1]
+        for number in range(len(doc))
+    }
+    contents = [doc[number].get_contents() for number in range(len(doc))]
+    assert len(forms) == 1
+    assert len({streams[0] for streams in contents}) == 1
+    assert len({streams[-1] for streams in contents}) == 1
+    assert len({len(streams) for streams in contents}) == 1
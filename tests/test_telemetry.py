@@ -0,0 +1,49 @@
+import json
+import logging
+import multiprocessing
+
+from mechanisms import telemetry
+
+
+def _enable_in_child(results):
+    results.put(telemetry.enable_from_environment() is not None)
+
+
+def test_environment_enables_the_sink(tmp_path, monkeypatch):
+    path = tmp_path / "telemetry.jsonl"
+    monkeypatch.setenv(telemetry.TELEMETRY_ENV, str(path))
+    try:
+        assert telemetry.enable_from_environment() is not None
+        assert telemetry.telemetry_path() == str(path)
+    finally:
+        telemetry.disable_telemetry()
+
+
+def test_child_processes_do_not_open_the_sink(tmp_path, monkeypatch):
+    path = tmp_path / "telemetry.jsonl"
+    monkeypatch.setenv(telemetry.TELEMETRY_ENV, str(path))
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    child = context.Process(target=_enable_in_child, args=(results,))
+    child.start()
+    enabled = results.get(timeout=60)
+    child.join(timeout=60)
+    assert enabled is False
+    assert not path.exists()
+
+
+def test_file_record_is_written(tmp_path, make_pdf):
+    path = tmp_path / "telemetry.jsonl"
+    source = make_pdf("in.pdf", [["Corps"]])
+    root = logging.getLogger(telemetry.ROOT_LOGGER)
+    level = root.level
+    root.setLevel(logging.INFO)
+    telemetry.enable_telemetry(str(path))
+    try:
+        telemetry.record_file(source, source, 0.0, True)
+    finally:
+        telemetry.disable_telemetry()
+        root.setLevel(level)
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    files = [record for record in records if record.get("event") == "file"]
+    assert len(files) == 1 and files[0]["file"] == "in.pdf"
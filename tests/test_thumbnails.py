@@ -0,0 +1,55 @@
+import os
+import threading
+
+from mechanisms.thumbnails import RenderCache, ThumbnailRenderer, thumbnail_key
+
+
+def _key(page):
+    return ("doc.pdf", 1, page, 40)
+
+
+def test_least_recently_used_entries_are_evicted_at_the_byte_limit():
+    cache = RenderCache(max_bytes=30)
+    for page in range(3):
+        cache.put(_key(page), bytes(10))
+    assert cache.get(_key(0)) is not None  # page 0 is now the most recent
+    cache.put(_key(3), bytes(10))
+    assert cache.size == 30 and len(cache) == 3
+    assert cache.get(_key(1)) is None
+    assert [cache.get(_key(page)) is not None for page in (0, 2, 3)] == [True] * 3
+
+
+def test_replacing_an_entry_updates_the_size():
+    cache = RenderCache(max_bytes=100)
+    cache.put(_key(0), bytes(40))
+    cache.put(_key(0), bytes(10))
+    assert (cache.size, len(cache)) == (10, 1)
+
+
+def test_an_oversized_image_is_still_kept_alone():
+    cache = RenderCache(max_bytes=10)
+    cache.put(_key(0), bytes(5))
+    cache.put(_key(1), bytes(50))
+    assert (cache.size, len(cache)) == (50, 1)
+    assert cache.get(_key(1)) is not None
+
+
+def test_rewritten_file_gets_a_new_key(make_pdf):
+    path = make_pdf("doc.pdf", [["Corps"]])
+    before = thumbnail_key(path, 0)
+    make_pdf("doc.pdf", [["Corps"], ["Suite"]])
+    os.utime(path, ns=(before[1] + 10**9, before[1] + 10**9))
+    assert thumbnail_key(path, 0) != before
+
+
+def test_renderer_fills_the_cache(make_pdf):
+    path = make_pdf("doc.pdf", [["Corps"]])
+    ready = threading.Event()
+    renderer = ThumbnailRenderer(lambda key, data: ready.set())
+    try:
+        key = thumbnail_key(path, 0)
+        assert renderer.request(key) is None
+        assert ready.wait(10)
+        assert renderer.request(key).startswith(b"\x89PNG")
+    finally:
+        renderer.close()
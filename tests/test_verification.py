@@ -0,0 +1,56 @@
+import fitz  # PyMuPDF
+
+from mechanisms.verification import OutputVerifier
+
+
+def _framed(source_path, path):
+    """Draw every page of *source_path* through a Form XObject: all pages
+    then share the content stream ``q /fzFrm0 Do Q``."""
+    source = fitz.open(source_path)
+    doc = fitz.open()
+    for number in range(len(source)):
+        page = doc.new_page()
+        page.show_pdf_page(page.rect, source, number)
+    doc.save(str(path))
+    return str(path)
+
+
+def test_clean_output_passes(make_pdf):
+    path = make_pdf("clean.pdf", [["Corps du document"]] * 2)
+    verifier = OutputVerifier("JEAN DUPONT", "DOCUMENT NON APPLICABLE")
+    assert verifier.verify(path, [0, 1]) == []
+    assert not verifier.failures
+
+
+def test_residual_pattern_reported(make_pdf):
+    path = make_pdf("dirty.pdf", [["Corps"], ["Copie de JEAN DUPONT"]])
+    verifier = OutputVerifier("JEAN DUPONT", "")
+    assert verifier.verify(path, [0, 1]) == [(2, "JEAN DUPONT")]
+    assert path in verifier.failures
+
+
+def test_identical_pages_hit_the_cache(make_pdf):
+    path = make_pdf("repeat.pdf", [["Corps du document"]] * 5)
+    verifier = OutputVerifier("JEAN DUPONT", "")
+    verifier.verify(path, list(range(5)))
+    assert (verifier.pages_checked, verifier.cache_hits) == (1, 4)
+
+
+def test_same_content_stream_different_forms(make_pdf, tmp_path):
+    source = make_pdf("source.pdf", [["Bonjour"], ["Copie de JEAN DUPONT"]])
+    path = _framed(source, tmp_path / "framed.pdf")
+    with fitz.open(path) as doc:
+        assert doc[0].read_contents() == doc[1].read_contents()
+
+    verifier = OutputVerifier("JEAN DUPONT", "")
+    assert verifier.verify(path, [0, 1]) == [(2, "JEAN DUPONT")]
+    assert verifier.cache_hits == 0
+
+
+def test_cache_shared_across_copies(make_pdf):
+    first = make_pdf("a.pdf", [["Corps du document"]])
+    second = make_pdf("b.pdf", [["Corps du document"]])
+    verifier = OutputVerifier("JEAN DUPONT", "")
+    verifier.verify(first, [0])
+    verifier.verify(second, [0])
+    assert verifier.cache_hits == 1
@@ -0,0 +1,54 @@
+import threading
+import time
+
+import pytest
+
+from mechanisms.worker_pool import WorkerPool
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(2)
+    yield pool
+    pool.shutdown()
+
+
+def _tracking():
+    """Work function recording the items and the peak concurrency."""
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0, "done": []}
+
+    def work(item):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.01)
+        with lock:
+            state["running"] -= 1
+            state["done"].append(item)
+
+    return work, state
+
+
+def test_lanes_are_capped_at_the_pool_size(pool):
+    work, state = _tracking()
+    pool.run_lanes(work, range(10), lanes=8)
+    assert sorted(state["done"]) == list(range(10))
+    assert state["peak"] == 2
+
+
+def test_a_batch_uses_only_the_lanes_it_asked_for(pool):
+    work, state = _tracking()
+    pool.run_lanes(work, range(6), lanes=1)
+    assert state["done"] == list(range(6))
+    assert state["peak"] == 1
+
+
+def test_first_error_is_raised(pool):
+    def work(item):
+        if item == 3:
+            raise ValueError("fichier illisible")
+
+    with pytest.raises(ValueError, match="fichier illisible"):
+        pool.run_lanes(work, range(6), lanes=2)
+
@@ -2,17 +2,35 @@
 Application UI Module – modern CustomTkinter interface.
 
 Provides all main-window widgets: mode switch, source / destination
-pickers, watermark parameter card, action button, and progress bar.
+pickers, watermark parameter card, action button, job queue panel and
+progress bar.
 """
 
+import logging
 import os
 import time
-import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox
+from typing import Optional
 
 import customtkinter as ctk
 
+try:
+    from tkinterdnd2 import DND_FILES, TkinterDnD
+except ImportError:  # drag-and-drop is optional
+    DND_FILES = None
+    TkinterDnD = None
+
+from mechanisms import telemetry
+from mechanisms.job_queue import (
+    CANCELLED, DONE, FAILED, RUNNING, Job, JobQueue, default_output_path,
+)
+from mechanisms.manifest import ManifestError, load_manifest
+from mechanisms.thumbnails import ThumbnailRenderer
+from ui.preview_pane import PreviewWindow
+
+logger = logging.getLogger("watermark_app.ui")
+
 
 class AppUI:
     """Modern UI components for PDF Watermark Remover."""
@@ -24,6 +42,15 @@ class AppUI:
         # Callbacks épurés
         self.show_help_callback = None
         self.show_about_callback = None
+        self.shutdown_callback = None
+        self.job_rows: dict = {}
+        self.batch_files: list[str] = []
+        self._summary_pending = False
+        self.thumbnails: Optional[ThumbnailRenderer] = None
+        self.previews: list[PreviewWindow] = []
+        self.job_queue = JobQueue(
+            watermark_processor, on_update=self._on_job_update
+        )
         self.init_variables()
 
     # ── Variables ──────────────────────────────────────────────────
@@ -38,6 +65,20 @@ class AppUI:
         self.status_var = tk.StringVar()
         self.file_mode_var = tk.BooleanVar(value=False)
         self.use_footer_var = tk.BooleanVar(value=True)
+        self.pipelined_var = tk.BooleanVar(value=False)
+        self.deduplicate_var = tk.BooleanVar(value=False)
+        self.verify_var = tk.BooleanVar(value=False)
+        self.raster_var = tk.BooleanVar(value=False)
+        self.isolate_var = tk.BooleanVar(value=False)
+        self.adaptive_var = tk.BooleanVar(value=False)
+        self.mmap_var = tk.BooleanVar(value=self.watermark_processor.mmap_input)
+        self.object_streams_var = tk.BooleanVar(
+            value=self.watermark_processor.object_streams
+        )
+        self.linearize_var = tk.BooleanVar(value=self.watermark_processor.linearize)
+        self.stamp_var = tk.BooleanVar(value=self.watermark_processor.stamp_enabled)
+        self.stamp_text_var = tk.StringVar(value=self.watermark_processor.stamp_text)
+        self.telemetry_var = tk.BooleanVar(value=telemetry.enabled())
 
         # Bridge IntVar(0-100) → CTkProgressBar(0.0-1.0)
         self.progress_var.trace_add("write", self._on_progress_changed)
@@ -62,10 +103,13 @@ class AppUI:
 
         self._create_mode_section(content)
         self._create_io_section(content)
+        self._create_drop_zone(content)
         self._create_parameters_section(content)
         self._create_action_section(content)
         self._create_progress_section(content)
+        self._create_queue_section(content)
         self.create_menu_bar()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
         self.toggle_footer_options()
 
@@ -102,7 +146,7 @@ class AppUI:
 
         ctk.CTkSwitch(
             card,
-            text="  Traiter un seul fichier PDF",
+            text="  Traiter des fichiers PDF individuels",
             variable=self.file_mode_var,
             command=self.toggle_file_mode,
             onvalue=True, offvalue=False,
@@ -148,6 +192,49 @@ class AppUI:
             command=self.select_output,
         ).pack(side="right")
 
+    # ── Drag & drop ───────────────────────────────────────────────
+
+    def _create_drop_zone(self, parent: ctk.CTkFrame) -> None:
+        """Add a drop target for PDFs when tkinterdnd2 is available."""
+        if TkinterDnD is None:
+            return
+        try:
+            TkinterDnD._require(self.root)
+        except (RuntimeError, tk.TclError) as exc:
+            # tkdnd binaries missing for this platform — keep the pickers only
+            logger.info("Drag-and-drop unavailable: %s", exc)
+            return
+
+        zone = ctk.CTkFrame(
+            parent, corner_radius=10, height=64,
+            border_width=2, border_color=("gray70", "gray30"),
+        )
+        zone.pack(fill="x", pady=(14, 0))
+        zone.pack_propagate(False)
+
+        label = ctk.CTkLabel(
+            zone,
+            text="Déposez ici un dossier ou plusieurs fichiers PDF",
+            font=ctk.CTkFont(size=12),
+        )
+        label.pack(expand=True)
+
+        for widget in (zone, label):
+            widget.drop_target_register(DND_FILES)
+            widget.dnd_bind("<<Drop>>", self._on_drop)
+
+    def _on_drop(self, event) -> str:
+        paths = list(self.root.tk.splitlist(event.data))
+        folders = [p for p in paths if os.path.isdir(p)]
+        if len(paths) == 1 and folders:
+            self._clear_batch_files()
+            self.file_mode_var.set(False)
+            self.toggle_file_mode()
+            self.input_var.set(folders[0])
+        else:
+            self._set_input_files(paths)
+        return event.action
+
     # ── Watermark parameters card ─────────────────────────────────
 
     def _create_parameters_section(self, parent: ctk.CTkFrame) -> None:
@@ -176,20 +263,110 @@ class AppUI:
         ).pack(anchor="w", padx=16, pady=(4, 2))
 
         self.footer_entry = ctk.CTkEntry(card, textvariable=self.footer_var)
-        self.footer_entry.pack(fill="x", padx=16, pady=(0, 14))
+        self.footer_entry.pack(fill="x", padx=16, pady=(0, 10))
+
+        ctk.CTkCheckBox(
+            card,
+            text="Lecture / écriture anticipées (recommandé sur partage réseau)",
+            variable=self.pipelined_var,
+            onvalue=True, offvalue=False,
+        ).pack(anchor="w", padx=16, pady=(0, 8))
+
+        ctk.CTkCheckBox(
+            card,
+            text="Traiter une seule fois les fichiers identiques (liens physiques)",
+            variable=self.deduplicate_var,
+            onvalue=True, offvalue=False,
+        ).pack(anchor="w", padx=16, pady=(0, 8))
+
+        ctk.CTkCheckBox(
+            card,
+            text="Vérifier l'absence de filigrane dans les fichiers produits",
+            variable=self.verify_var,
+            onvalue=True, offvalue=False,
+        ).pack(anchor="w", padx=16, pady=(0, 8))
+
+        ctk.CTkCheckBox(
+            card,
+            text="Documents numérisés : nettoyer aussi les images (rouge / bleu)",
+            variable=self.raster_var,
+            onvalue=True, offvalue=False,
+        ).pack(anchor="w", padx=16, pady=(0, 8))
+
+        ctk.CTkCheckBox(
+            card,
+            text="Isoler chaque fichier (délai et mémoire limités, quarantaine)",
+            variable=self.isolate_var,
+            onvalue=True, offvalue=False,
+        ).pack(anchor="w", padx=16, pady=(0, 8))
+
+        ctk.CTkCheckBox(
+            card,
+            text="Adapter le parallélisme à la charge (mémoire, processeur, disque)",
+            variable=self.adaptive_var,
+            onvalue=True, offvalue=False,
+        ).pack(anchor="w", padx=16, pady=(0, 8))
+
+        ctk.CTkCheckBox(
+            card,
+            text="Lire les fichiers en mémoire mappée (gros fichiers, partages réseau)",
+            variable=self.mmap_var,
+            onvalue=True, offvalue=False,
+        ).pack(anchor="w", padx=16, pady=(0, 8))
+
+        ctk.CTkCheckBox(
+            card,
+            text="Compresser la structure des fichiers produits (flux d'objets)",
+            variable=self.object_streams_var,
+            onvalue=True, offvalue=False,
+        ).pack(anchor="w", padx=16, pady=(0, 8))
+
+        ctk.CTkCheckBox(
+            card,
+            text="Optimiser pour l'affichage web (linéarisation, si disponible)",
+            variable=self.linearize_var,
+            onvalue=True, offvalue=False,
+        ).pack(anchor="w", padx=16, pady=(0, 8))
+
+        ctk.CTkCheckBox(
+            card,
+            text="Ajouter une mention d'identification ({id} = horodatage) :",
+            variable=self.stamp_var,
+            command=self.toggle_stamp_options,
+            onvalue=True, offvalue=False,
+        ).pack(anchor="w", padx=16, pady=(0, 2))
+
+        self.stamp_entry = ctk.CTkEntry(card, textvariable=self.stamp_text_var)
+        self.stamp_entry.pack(fill="x", padx=16, pady=(0, 14))
+        self.toggle_stamp_options()
 
     # ── Action button ─────────────────────────────────────────────
 
     def _create_action_section(self, parent: ctk.CTkFrame) -> None:
+        actions = ctk.CTkFrame(parent, fg_color="transparent")
+        actions.pack(fill="x", pady=(20, 0))
+
         self.start_button = ctk.CTkButton(
-            parent,
+            actions,
             text="Lancer la suppression des filigranes",
             height=44,
             corner_radius=8,
             font=ctk.CTkFont(size=14, weight="bold"),
-            command=self.process_in_thread,
+            command=self.enqueue_job,
         )
-        self.start_button.pack(fill="x", pady=(20, 0))
+        self.start_button.pack(side="left", fill="x", expand=True, padx=(0, 8))
+
+        self.cancel_button = ctk.CTkButton(
+            actions,
+            text="Tout annuler",
+            width=110,
+            height=44,
+            corner_radius=8,
+            fg_color="gray50", hover_color="gray40",
+            state="disabled",
+            command=self.cancel_processing,
+        )
+        self.cancel_button.pack(side="right")
 
     # ── Progress ──────────────────────────────────────────────────
 
@@ -208,6 +385,35 @@ class AppUI:
         )
         self.status_label.pack(anchor="w")
 
+    # ── Job queue ─────────────────────────────────────────────────
+
+    def _create_queue_section(self, parent: ctk.CTkFrame) -> None:
+        card = ctk.CTkFrame(parent, corner_radius=10)
+        card.pack(fill="x", pady=(16, 0))
+
+        title = ctk.CTkFrame(card, fg_color="transparent")
+        title.pack(fill="x", padx=16, pady=(14, 6))
+
+        ctk.CTkLabel(
+            title, text="File d'attente",
+            font=ctk.CTkFont(size=14, weight="bold"),
+        ).pack(side="left")
+
+        ctk.CTkButton(
+            title, text="Effacer terminés", width=130, height=28,
+            fg_color="gray50", hover_color="gray40",
+            command=self.clear_finished_jobs,
+        ).pack(side="right")
+
+        self.queue_list = ctk.CTkFrame(card, fg_color="transparent")
+        self.queue_list.pack(fill="x", pady=(0, 6))
+
+        self.queue_empty_label = ctk.CTkLabel(
+            self.queue_list, text="Aucune tâche en attente.",
+            font=ctk.CTkFont(size=12),
+        )
+        self.queue_empty_label.pack(padx=16, pady=(0, 12), anchor="w")
+
     # ── Native menu bar ───────────────────────────────────────────
 
     def create_menu_bar(self) -> None:
@@ -217,7 +423,18 @@ class AppUI:
 
         file_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="Fichier", menu=file_menu)
-        file_menu.add_command(label="Quitter", command=self.root.quit)
+        file_menu.add_command(
+            label="Traiter un manifeste (CSV / JSONL)…",
+            command=self.enqueue_manifest,
+        )
+        file_menu.add_separator()
+        file_menu.add_checkbutton(
+            label="Journal de télémétrie (JSON)…",
+            variable=self.telemetry_var,
+            command=self.toggle_telemetry,
+        )
+        file_menu.add_separator()
+        file_menu.add_command(label="Quitter", command=self.quit_app)
 
         help_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="Aide", menu=help_menu)
@@ -251,9 +468,40 @@ class AppUI:
             state="normal" if self.use_footer_var.get() else "disabled"
         )
 
+    def toggle_telemetry(self) -> None:
+        """Start or stop the opt-in JSON-lines telemetry log."""
+        if not self.telemetry_var.get():
+            telemetry.disable_telemetry()
+            self.status_var.set("Journal de télémétrie désactivé.")
+            return
+
+        path = filedialog.asksaveasfilename(
+            title="Fichier du journal de télémétrie",
+            defaultextension=".jsonl",
+            filetypes=[("JSON Lines", "*.jsonl"), ("Tous les fichiers", "*.*")],
+        )
+        if not path:
+            self.telemetry_var.set(False)
+            return
+        try:
+            telemetry.enable_telemetry(path)
+        except OSError as exc:
+            self.telemetry_var.set(False)
+            messagebox.showerror(
+                "Erreur", f"Impossible d'ouvrir le journal {path} :\n{exc}"
+            )
+            return
+        self.status_var.set(f"Journal de télémétrie : {path}")
+
+    def toggle_stamp_options(self) -> None:
+        self.stamp_entry.configure(
+            state="normal" if self.stamp_var.get() else "disabled"
+        )
+
     def select_input(self) -> None:
         folder = filedialog.askdirectory()
         if folder:
+            self._clear_batch_files()
             self.input_var.set(folder)
 
     def select_output(self) -> None:
@@ -262,18 +510,43 @@ class AppUI:
             self.output_var.set(folder)
 
     def select_single_file(self) -> None:
-        path = filedialog.askopenfilename(
+        paths = filedialog.askopenfilenames(
             filetypes=[("Fichiers PDF", "*.pdf")]
         )
-        if path:
-            self.input_var.set(path)
-            self.file_mode_var.set(True)
+        if paths:
+            self._set_input_files(self.root.tk.splitlist(paths))
 
-    # ── Processing ────────────────────────────────────────────────
+    def _set_input_files(self, paths) -> None:
+        """Use one or several PDFs as the source (file mode)."""
+        pdfs = [p for p in paths if p.lower().endswith(".pdf") and os.path.isfile(p)]
+        if not pdfs:
+            messagebox.showerror(
+                "Erreur", "Aucun fichier PDF parmi les éléments sélectionnés."
+            )
+            return
 
-    def process_in_thread(self) -> None:
-        self.start_button.configure(state="disabled")
+        self.file_mode_var.set(True)
+        self.toggle_file_mode()
+        if len(pdfs) == 1:
+            self._clear_batch_files()
+            self.input_var.set(pdfs[0])
+        else:
+            self.batch_files = pdfs
+            self.input_var.set(f"{len(pdfs)} fichiers PDF sélectionnés")
+
+    def _clear_batch_files(self) -> None:
+        self.batch_files = []
+
+    def _batch_selected(self) -> bool:
+        """True while the source field still shows a multi-file selection."""
+        return bool(self.batch_files) and (
+            self.input_var.get() == f"{len(self.batch_files)} fichiers PDF sélectionnés"
+        )
 
+    # ── Processing ────────────────────────────────────────────────
+
+    def enqueue_job(self) -> None:
+        """Validate the form and add a job to the shared queue."""
         input_path = self.input_var.get()
         output_path = self.output_var.get()
         name_pattern = self.name_var.get()
@@ -286,7 +559,6 @@ class AppUI:
                 "Erreur",
                 "Veuillez sélectionner un dossier source ou un fichier PDF.",
             )
-            self.start_button.configure(state="normal")
             return
 
         if not output_path and not self.file_mode_var.get():
@@ -294,85 +566,256 @@ class AppUI:
                 "Erreur",
                 "Veuillez sélectionner un dossier de destination.",
             )
-            self.start_button.configure(state="normal")
             return
 
-        output_file = ""
-        if self.file_mode_var.get():
-            if not input_path.lower().endswith(".pdf"):
+        single_file = self.file_mode_var.get()
+        if single_file and self._batch_selected():
+            if output_path and not os.path.isdir(output_path):
                 messagebox.showerror(
-                    "Erreur", "Le fichier sélectionné n'est pas un PDF."
+                    "Erreur",
+                    "Pour plusieurs fichiers, la destination doit être un dossier.",
                 )
-                self.start_button.configure(state="normal")
                 return
+            job = Job(
+                input_path, output_path, name_pattern, footer_pattern,
+                files=self.batch_files,
+                pipelined=self.pipelined_var.get(),
+                deduplicate=self.deduplicate_var.get(),
+                verify=self.verify_var.get(),
+                raster=self.raster_var.get(),
+                isolate=self.isolate_var.get(),
+                adaptive=self.adaptive_var.get(),
+                settings=self._engine_settings(),
+            )
+        else:
+            if single_file:
+                if not input_path.lower().endswith(".pdf"):
+                    messagebox.showerror(
+                        "Erreur", "Le fichier sélectionné n'est pas un PDF."
+                    )
+                    return
+
+                stamp = int(time.time())
+                if not output_path or os.path.isdir(output_path):
+                    output_path = default_output_path(input_path, stamp, output_path)
+
+            job = Job(
+                input_path, output_path, name_pattern, footer_pattern,
+                single_file=single_file,
+                pipelined=self.pipelined_var.get(),
+                deduplicate=self.deduplicate_var.get(),
+                verify=self.verify_var.get(),
+                raster=self.raster_var.get(),
+                isolate=self.isolate_var.get(),
+                adaptive=self.adaptive_var.get(),
+                settings=self._engine_settings(),
+            )
+        self._add_job_row(job)
+        self.progress_frame.pack(fill="x", pady=(16, 0))
+        self.job_queue.submit(job)
+
+    def _engine_settings(self) -> dict:
+        # The stamp and the I/O options are captured with the job, so
+        # changing them never affects jobs already queued or running
+        return {
+            "stamp_enabled": self.stamp_var.get(),
+            "stamp_text": self.stamp_text_var.get(),
+            "mmap_input": self.mmap_var.get(),
+            "object_streams": self.object_streams_var.get(),
+            "linearize": self.linearize_var.get(),
+        }
+
+    def enqueue_manifest(self) -> None:
+        """Add a job processing the files of a manifest, each with its own patterns."""
+        path = filedialog.askopenfilename(
+            title="Sélectionner un manifeste",
+            filetypes=[
+                ("Manifestes", "*.csv *.jsonl"),
+                ("CSV", "*.csv"),
+                ("JSON Lines", "*.jsonl"),
+            ],
+        )
+        if not path:
+            return
+        try:
+            entries = load_manifest(path)
+        except ManifestError as exc:
+            messagebox.showerror("Manifeste invalide", str(exc))
+            return
 
-            base, ext = os.path.splitext(os.path.basename(input_path))
-            stamp = int(time.time())
-            if not output_path:
-                output_file = os.path.join(
-                    os.path.dirname(input_path),
-                    f"{base}_sans_filigrane_{stamp}{ext}",
-                )
-            elif os.path.isdir(output_path):
-                output_file = os.path.join(
-                    output_path, f"{base}_sans_filigrane_{stamp}{ext}"
-                )
-            else:
-                output_file = output_path
-
-        self.progress_var.set(0)
+        job = Job(
+            path, "", "", "",
+            entries=entries,
+            pipelined=self.pipelined_var.get(),
+            deduplicate=self.deduplicate_var.get(),
+            verify=self.verify_var.get(),
+            raster=self.raster_var.get(),
+            isolate=self.isolate_var.get(),
+            adaptive=self.adaptive_var.get(),
+            settings=self._engine_settings(),
+        )
+        self._add_job_row(job)
         self.progress_frame.pack(fill="x", pady=(16, 0))
-        self.status_var.set("Démarrage du traitement…")
-
-        def run_process() -> None:
-            success = False
-            try:
-                if self.file_mode_var.get():
-                    self.status_var.set(
-                        f"Traitement de {os.path.basename(input_path)}…"
-                    )
-                    success = self.watermark_processor.remove_watermark_by_structure(
-                        input_path, output_file, name_pattern,
-                        footer_pattern, self.progress_var,
-                    )
-                else:
-                    success = self.watermark_processor.process_folder(
-                        input_path, output_path, name_pattern,
-                        footer_pattern, self.progress_var, self.status_var,
-                    )
-            except Exception as exc:
-                success = False
-                self.root.after(
-                    0, lambda: self.status_var.set(f"Erreur : {exc}")
-                )
-                self.root.after(
-                    0,
-                    lambda: messagebox.showerror(
-                        "Erreur", f"Une erreur est survenue : {exc}"
-                    ),
+        self.job_queue.submit(job)
+
+    def cancel_processing(self) -> None:
+        """Ask every queued or running job to stop at the next page."""
+        self.job_queue.cancel_all()
+        self.status_var.set("Annulation en cours…")
+
+    def _on_job_update(self, job: Job) -> None:
+        # Called from worker threads — hop back onto the Tk main loop.
+        self.root.after(0, lambda: self._refresh_job_row(job))
+
+    def _refresh_job_row(self, job: Job) -> None:
+        row = self.job_rows.get(job.job_id)
+        if row is not None:
+            row["status"].configure(text=job.status)
+            row["progress"].set(max(0.0, min(1.0, job.progress / 100.0)))
+            detail = job.message
+            if job.started_at is not None:
+                detail = (
+                    f"{job.message}  ·  {job.throughput():.2f} Mo/s"
+                    f"  ·  {job.elapsed():.1f} s"
                 )
+            row["detail"].configure(text=detail)
+            if job.finished:
+                row["cancel"].configure(state="disabled")
+                row["preview"].configure(state="normal")
+        self._refresh_overall()
+
+    def _refresh_overall(self) -> None:
+        jobs = list(self.job_queue.jobs)
+        active = [job for job in jobs if not job.finished]
+        running = sum(1 for job in active if job.status == RUNNING)
+        if jobs:
+            self.progress_var.set(
+                int(sum(job.progress if not job.finished else 100 for job in jobs)
+                    / len(jobs))
+            )
 
-            self.root.after(0, lambda: self.progress_var.set(100))
-            if success:
-                self.root.after(
-                    0,
-                    lambda: self.status_var.set(
-                        "Suppression des filigranes terminée !"
-                    ),
-                )
-                self.root.after(
-                    0,
-                    lambda: messagebox.showinfo(
-                        "Succès",
-                        "Suppression des filigranes terminée !",
-                    ),
-                )
-            self.root.after(
-                0, lambda: self.start_button.configure(state="normal")
+        self.cancel_button.configure(state="normal" if active else "disabled")
+        if active:
+            self.status_var.set(
+                f"{running} tâche(s) en cours, "
+                f"{len(active) - running} en attente."
+            )
+            self._summary_pending = True
+        elif self._summary_pending:
+            self._summary_pending = False
+            self._show_queue_summary(jobs)
+
+    def _show_queue_summary(self, jobs: list) -> None:
+        done = sum(1 for job in jobs if job.status == DONE)
+        failed = sum(1 for job in jobs if job.status == FAILED)
+        cancelled = sum(1 for job in jobs if job.status == CANCELLED)
+        summary = (
+            f"{done} tâche(s) terminée(s), {failed} en erreur, "
+            f"{cancelled} annulée(s)."
+        )
+        self.status_var.set(summary)
+        if failed or cancelled:
+            messagebox.showinfo("File d'attente terminée", summary)
+        else:
+            messagebox.showinfo(
+                "Succès", f"Suppression des filigranes terminée !\n{summary}"
             )
 
-        thread = threading.Thread(target=run_process, daemon=True)
-        thread.start()
+    def _add_job_row(self, job: Job) -> None:
+        self.queue_empty_label.pack_forget()
+
+        row = ctk.CTkFrame(self.queue_list, corner_radius=8)
+        row.pack(fill="x", padx=12, pady=(0, 8))
+
+        top = ctk.CTkFrame(row, fg_color="transparent")
+        top.pack(fill="x", padx=10, pady=(8, 2))
+
+        ctk.CTkLabel(
+            top, text=f"#{job.job_id}  {job.label}",
+            font=ctk.CTkFont(size=12, weight="bold"),
+        ).pack(side="left")
+
+        cancel = ctk.CTkButton(
+            top, text="✕", width=28, height=24,
+            fg_color="gray50", hover_color="gray40",
+            command=lambda: self.job_queue.cancel(job),
+        )
+        cancel.pack(side="right")
+
+        preview = ctk.CTkButton(
+            top, text="Aperçu", width=70, height=24, state="disabled",
+            command=lambda: self.open_preview(job),
+        )
+        preview.pack(side="right", padx=(8, 0))
+
+        status = ctk.CTkLabel(top, text=job.status, font=ctk.CTkFont(size=12))
+        status.pack(side="right", padx=8)
+
+        progress = ctk.CTkProgressBar(row, height=8, corner_radius=4)
+        progress.set(0)
+        progress.pack(fill="x", padx=10, pady=(2, 2))
+
+        detail = ctk.CTkLabel(
+            row, text="", font=ctk.CTkFont(size=11),
+            anchor="w", justify="left",
+        )
+        detail.pack(fill="x", padx=10, pady=(0, 6))
+
+        self.job_rows[job.job_id] = {
+            "frame": row, "status": status, "progress": progress,
+            "detail": detail, "cancel": cancel, "preview": preview,
+        }
+
+    # ── Preview ───────────────────────────────────────────────────
+
+    def open_preview(self, job: Job) -> None:
+        """Show the pages of a finished job's inputs and outputs side by side."""
+        pairs = job.preview_pairs()
+        if not pairs:
+            messagebox.showinfo("Aperçu", "Aucun fichier produit par cette tâche.")
+            return
+        if self.thumbnails is None:
+            self.thumbnails = ThumbnailRenderer(self._on_thumbnail)
+        window = PreviewWindow(
+            self.root, self.thumbnails, pairs,
+            title=f"Aperçu avant / après – #{job.job_id} {job.label}",
+            on_close=self.previews.remove,
+        )
+        self.previews.append(window)
+
+    def _on_thumbnail(self, key, data: bytes) -> None:
+        # Called from the rendering thread — hop back onto the Tk main loop.
+        self.root.after(0, lambda: self._deliver_thumbnail(key, data))
+
+    def _deliver_thumbnail(self, key, data: bytes) -> None:
+        for window in list(self.previews):
+            window.thumbnail_ready(key, data)
+
+    def clear_finished_jobs(self) -> None:
+        """Remove finished jobs from the queue panel."""
+        for job in self.job_queue.clear_finished():
+            row = self.job_rows.pop(job.job_id, None)
+            if row is not None:
+                row["frame"].destroy()
+        if not self.job_rows:
+            self.queue_empty_label.pack(padx=16, pady=(0, 12), anchor="w")
+
+    def shutdown(self) -> None:
+        """Cancel outstanding jobs and release the worker pools."""
+        self.job_queue.shutdown()
+        if self.thumbnails is not None:
+            self.thumbnails.close()
+            self.thumbnails = None
+        if self.shutdown_callback:
+            self.shutdown_callback()
+
+    def quit_app(self) -> None:
+        self.shutdown()
+        self.root.quit()
+
+    def _on_close(self) -> None:
+        self.shutdown()
+        self.root.destroy()
 
     # ── Callback setters ──────────────────────────────────────────
 
@@ -380,4 +823,7 @@ class AppUI:
         self.show_help_callback = callback
 
     def set_show_about_callback(self, callback) -> None:
-        self.show_about_callback = callback
\ No newline at end of file
+        self.show_about_callback = callback
+
+    def set_shutdown_callback(self, callback) -> None:
+        self.shutdown_callback = callback
\ No newline at end of file
@@ -155,8 +155,10 @@ class DialogWindows:
             {
                 "title": "1.  Sélection du fichier / dossier",
                 "lines": [
-                    "• Cochez « Traiter un seul fichier PDF » pour un "
-                    "fichier individuel.",
+                    "• Cochez « Traiter des fichiers PDF individuels » pour "
+                    "choisir un ou plusieurs fichiers (Ctrl/Maj + clic).",
+                    "• Vous pouvez aussi glisser-déposer des fichiers PDF ou "
+                    "un dossier dans la zone prévue à cet effet.",
                     "• Sinon, sélectionnez un dossier pour traiter tous "
                     "les PDFs en masse.",
                 ],
@@ -182,7 +184,11 @@ class DialogWindows:
                 "title": "4.  Traitement",
                 "lines": [
                     "• Cliquez sur « Lancer la suppression des filigranes ».",
-                    "• Une barre de progression affichera l'avancement.",
+                    "• Chaque clic ajoute une tâche à la file d'attente : "
+                    "vous pouvez enchaîner plusieurs dossiers ou fichiers "
+                    "avec leurs propres paramètres.",
+                    "• Chaque tâche affiche son état, sa progression et son "
+                    "débit ; « ✕ » l'annule, « Tout annuler » les arrête toutes.",
                 ],
             },
         ]
@@ -0,0 +1,248 @@
+"""
+Preview Pane Module – before / after thumbnails of processed documents.
+
+Shows the pages of a source PDF next to the pages of its cleaned output.
+The canvas is virtualised: its scroll region covers every page, but only
+the rows on screen (plus a small margin) hold image items; rows scrolled
+out of view are deleted.  Images come from the shared
+:class:`~mechanisms.thumbnails.ThumbnailRenderer`, which renders missing
+pages in the background, so scrolling through a thousand-page document
+never waits on PyMuPDF.
+"""
+
+import base64
+import logging
+import os
+import tkinter as tk
+from typing import Callable, Optional
+
+import customtkinter as ctk
+
+from mechanisms.thumbnails import (
+    THUMBNAIL_DPI, ThumbnailKey, ThumbnailRenderer, thumbnail_key,
+)
+from ui.app_styles import AppStyles
+
+logger = logging.getLogger("watermark_app.preview")
+
+PADDING = 16
+LABEL_HEIGHT = 18
+MARGIN_ROWS = 2  # rows prepared above and below the visible area
+
+
+class PreviewWindow(ctk.CTkToplevel):
+    """Window listing the pages of a source PDF and of its output side by side."""
+
+    def __init__(
+        self,
+        master,
+        renderer: ThumbnailRenderer,
+        pairs: list[tuple[str, str]],
+        title: str,
+        on_close: Optional[Callable[["PreviewWindow"], None]] = None,
+    ) -> None:
+        """Open the preview on the first of *pairs* ``(input, output)``."""
+        super().__init__(master)
+        self.title(title)
+        self.geometry("760x720")
+        self.renderer = renderer
+        self.pairs = pairs
+        self.on_close = on_close
+
+        self._paths: tuple[str, str] = ("", "")
+        self._counts = (0, 0)
+        self._page_count = 0
+        self._thumb_size = (0, 0)
+        self._row_height = 1
+        self._rows: dict[int, dict] = {}
+        self._waiting: dict[ThumbnailKey, tuple[int, int]] = {}
+        self._refresh_scheduled = False
+
+        self._build()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.load(0)
+
+    # ── Layout ────────────────────────────────────────────────────
+
+    def _build(self) -> None:
+        header = ctk.CTkFrame(self, fg_color="transparent")
+        header.pack(fill="x", padx=PADDING, pady=(12, 6))
+
+        if len(self.pairs) > 1:
+            names = [self._choice_label(i) for i in range(len(self.pairs))]
+            self.file_menu = ctk.CTkOptionMenu(
+                header, values=names, width=360,
+                command=lambda name: self.load(names.index(name)),
+            )
+            self.file_menu.pack(side="left")
+
+        self.info_label = ctk.CTkLabel(
+            header, text="", font=ctk.CTkFont(size=12),
+            text_color=AppStyles.MUTED_TEXT,
+        )
+        self.info_label.pack(side="right")
+
+        body = ctk.CTkFrame(self, corner_radius=10)
+        body.pack(fill="both", expand=True, padx=PADDING, pady=(0, PADDING))
+
+        dark = ctk.get_appearance_mode() == "Dark"
+        self.canvas = tk.Canvas(
+            body, highlightthickness=0, bg="gray17" if dark else "gray95",
+        )
+        self._text_color = "gray70" if dark else "gray30"
+        scrollbar = ctk.CTkScrollbar(body, command=self._yview)
+        scrollbar.pack(side="right", fill="y", padx=(0, 4), pady=4)
+        self.canvas.pack(side="left", fill="both", expand=True, padx=4, pady=4)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+
+        self.canvas.bind("<Configure>", lambda _e: self._schedule_refresh())
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", lambda _e: self._scroll(-3))
+        self.canvas.bind("<Button-5>", lambda _e: self._scroll(3))
+
+    def _choice_label(self, index: int) -> str:
+        return f"{index + 1}. {os.path.basename(self.pairs[index][0])}"
+
+    # ── Document ──────────────────────────────────────────────────
+
+    def load(self, index: int) -> None:
+        """Show the pair at *index*, replacing the current document."""
+        self._clear()
+        self._paths = self.pairs[index]
+        source = self.renderer.document_info(self._paths[0])
+        output = self.renderer.document_info(self._paths[1])
+        self._counts = (source[0], output[0])
+        self._page_count = max(self._counts)
+
+        width, height = source[1:] if source[0] else output[1:]
+        scale = THUMBNAIL_DPI / 72.0
+        self._thumb_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        self._row_height = LABEL_HEIGHT + self._thumb_size[1] + PADDING
+
+        total_width = 3 * PADDING + 2 * self._thumb_size[0]
+        self.canvas.configure(
+            scrollregion=(0, 0, total_width, self._page_count * self._row_height)
+        )
+        self.canvas.yview_moveto(0)
+        self.info_label.configure(
+            text=f"{self._counts[0]} page(s) avant, {self._counts[1]} après"
+        )
+        self._schedule_refresh()
+
+    def _clear(self) -> None:
+        for row in list(self._rows):
+            self._drop_row(row)
+        self.canvas.delete("all")
+        self._waiting.clear()
+
+    def _column_x(self, column: int) -> int:
+        return PADDING + column * (self._thumb_size[0] + PADDING)
+
+    # ── Scrolling ─────────────────────────────────────────────────
+
+    def _yview(self, *args) -> None:
+        self.canvas.yview(*args)
+        self._schedule_refresh()
+
+    def _scroll(self, units: int) -> None:
+        self.canvas.yview_scroll(units, "units")
+        self._schedule_refresh()
+
+    def _on_wheel(self, event) -> None:
+        self._scroll(-1 if event.delta > 0 else 1)
+
+    def _schedule_refresh(self) -> None:
+        # Coalesce bursts of scroll events into one refresh
+        if not self._refresh_scheduled:
+            self._refresh_scheduled = True
+            self.after_idle(self._refresh)
+
+    def _refresh(self) -> None:
+        self._refresh_scheduled = False
+        if not self._page_count:
+            return
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first_visible = max(0, int(top // self._row_height))
+        last_visible = min(self._page_count - 1, int(bottom // self._row_height))
+        first = max(0, first_visible - MARGIN_ROWS)
+        last = min(self._page_count - 1, last_visible + MARGIN_ROWS)
+
+        for row in [r for r in self._rows if r < first or r > last]:
+            self._drop_row(row)
+
+        # The renderer serves the newest request first: queue the margin,
+        # then the visible rows bottom-up so the top of the view comes first
+        wanted = sorted(
+            range(first, last + 1),
+            key=lambda r: (first_visible <= r <= last_visible, -r),
+        )
+        for row in wanted:
+            if row not in self._rows:
+                self._add_row(row)
+
+    # ── Rows ──────────────────────────────────────────────────────
+
+    def _add_row(self, row: int) -> None:
+        y = row * self._row_height + LABEL_HEIGHT
+        width, height = self._thumb_size
+        entry = {"items": [], "placeholders": {}, "photos": {}}
+        self._rows[row] = entry
+        for column, side in enumerate(("avant", "après")):
+            if row >= self._counts[column]:
+                continue
+            x = self._column_x(column)
+            entry["items"].append(self.canvas.create_text(
+                x, y - 2, text=f"Page {row + 1} · {side}", anchor="sw",
+                fill=self._text_color, font=("TkDefaultFont", 9),
+            ))
+            entry["placeholders"][column] = self.canvas.create_rectangle(
+                x, y, x + width, y + height, outline=self._text_color, dash=(2, 4),
+            )
+            key = thumbnail_key(self._paths[column], row)
+            data = self.renderer.request(key)
+            if data is not None:
+                self._show(row, column, data)
+            else:
+                self._waiting[key] = (row, column)
+
+    def _drop_row(self, row: int) -> None:
+        entry = self._rows.pop(row)
+        for item in entry["items"]:
+            self.canvas.delete(item)
+        for item in entry["placeholders"].values():
+            self.canvas.delete(item)
+        entry["photos"].clear()  # lets Tk free the images
+
+    def _show(self, row: int, column: int, data: bytes) -> None:
+        entry = self._rows.get(row)
+        if entry is None or column in entry["photos"]:
+            return
+        try:
+            photo = tk.PhotoImage(
+                master=self.canvas, data=base64.b64encode(data), format="png",
+            )
+        except tk.TclError as exc:
+            logger.warning("Cannot display thumbnail of page %d: %s", row + 1, exc)
+            return
+        placeholder = entry["placeholders"].pop(column, None)
+        if placeholder is not None:
+            self.canvas.delete(placeholder)
+        entry["photos"][column] = photo
+        entry["items"].append(self.canvas.create_image(
+            self._column_x(column), row * self._row_height + LABEL_HEIGHT,
+            image=photo, anchor="nw",
+        ))
+
+    def thumbnail_ready(self, key: ThumbnailKey, data: bytes) -> None:
+        """Display a page rendered in the background, if still wanted."""
+        target = self._waiting.pop(key, None)
+        if target is not None:
+            self._show(*target, data)
+
+    def close(self) -> None:
+        """Release the images and close the window."""
+        self._clear()
+        if self.on_close is not None:
+            self.on_close(self)
+        self.destroy()